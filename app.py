@@ -1,28 +1,136 @@
 import os
+import re
 import json
-import zipfile
 import tempfile
 import shutil
+import time
 import atexit
+import secrets
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 from werkzeug.utils import secure_filename
-from lyrics_utils import clean_lyrics, get_lyrics_from_file, save_lyrics_to_file, is_audio_file, process_audio_file
+from job_queue import EVENT_FILE, FINISHED_STATES, Job, JobQueue, JobQueueFull, JobStore
+from library_scanner import LibraryScanner
+from lyrics_manifest import LibraryManifest, outcome_from_result
+from lyrics_pipeline import LyricsPipeline
+from run_profile import ProfileLock, RunProfiler
+from run_report import FileTiming, RunReport
+from session_store import DEFAULT_SESSION_TTL, SessionStore
+from upload_store import UploadStore
+from zip_stream import stream_zip
+from lyrics_utils import FILE_SKIPPED, lyrics_processor, clean_lyrics, get_lyrics_from_file, is_audio_file, process_audio_file
 
 app = Flask(__name__)
 # app.config['MAX_CONTENT_LENGTH'] = None  # 不限制上传大小
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['PROCESSED_FOLDER'] = 'processed'
 
+app.config['UPLOAD_STORE'] = os.getenv('MUSIC_CLEANER_UPLOAD_STORE', '').strip() or 'upload_store'
+
 # 确保上传和处理文件夹存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
 
+# 上传的文件按内容保存，重复上传只创建链接，并复用已解析的歌词和清理结果
+upload_store = UploadStore(app.config['UPLOAD_STORE'])
+atexit.register(upload_store.close)
+
+# 歌词清理结果缓存（可通过环境变量指定磁盘缓存文件，重启后复用）
+lyrics_processor.enable_cache(path=os.getenv('MUSIC_CLEANER_CACHE_FILE', '').strip() or None)
+atexit.register(lyrics_processor.cache.close)
+
+# 设置后 backup 选项把备份保存到内容寻址的备份库，而不是原文件旁边的 .backup 文件
+_backup_dir = os.getenv('MUSIC_CLEANER_BACKUP_DIR', '').strip()
+if _backup_dir:
+    atexit.register(lyrics_processor.enable_backup_store(_backup_dir).close)
+
+# 按路径处理文件夹时并发扫描目录的线程数（网络挂载上可调大）
+scan_threads = max(1, int(os.getenv('MUSIC_CLEANER_SCAN_THREADS', '1') or 1))
+
+# 按路径处理文件夹时可选用分阶段流水线（请求中 pipeline 为 true），各阶段的并发数
+pipeline_read_threads = max(1, int(os.getenv('MUSIC_CLEANER_READ_THREADS', '4') or 4))
+pipeline_write_threads = max(1, int(os.getenv('MUSIC_CLEANER_WRITE_THREADS', '2') or 2))
+pipeline_clean_workers = max(0, int(os.getenv('MUSIC_CLEANER_CLEAN_WORKERS', str(os.cpu_count() or 1))))
+
+# 按路径处理时的增量清单（可选）：未变化的文件只需一次 stat 即可跳过
+_manifest_path = os.getenv('MUSIC_CLEANER_MANIFEST', '').strip()
+path_manifest = LibraryManifest(_manifest_path, lyrics_processor.ruleset_version) if _manifest_path else None
+if path_manifest is not None:
+    atexit.register(path_manifest.close)
+
+# 按路径处理时可选的性能分析（请求中 profile 为 true），分析结果保存到该目录；未设置时不允许分析
+# 分析目录中的锁文件保证多个工作进程之间同一时间也只分析一个请求
+profile_dir = os.getenv('MUSIC_CLEANER_PROFILE_DIR', '').strip()
+profile_lock = ProfileLock(os.path.join(profile_dir, '.profile.lock')) if profile_dir else None
+PROFILE_SLOWEST_FILES = 20
+
+# 后台任务队列：请求带 async 参数时，读取和处理歌词放到后台执行，立即返回任务 ID
+# 多进程部署时设置 MUSIC_CLEANER_JOB_DB，任务状态写入共享的数据库，任何工作进程都能查询和取消
+_job_db = os.getenv('MUSIC_CLEANER_JOB_DB', '').strip()
+job_queue = JobQueue(workers=max(1, int(os.getenv('MUSIC_CLEANER_JOB_WORKERS', '2') or 2)),
+                     max_pending=max(0, int(os.getenv('MUSIC_CLEANER_JOB_QUEUE', '32') or 32)),
+                     store=JobStore(_job_db) if _job_db else None)
+atexit.register(job_queue.shutdown)
+if job_queue.store is not None:
+    atexit.register(job_queue.store.close)
+# SSE 连接空闲时发送心跳的间隔（秒），避免被代理断开
+SSE_HEARTBEAT_SECONDS = 15
+# 订阅其他工作进程中的任务时，轮询共享任务状态的间隔（秒）
+JOB_POLL_SECONDS = 0.5
+
 # 临时文件清理列表
 temp_files = []
 
-# 文件名映射表：存储内部文件名到原始文件名的映射
-filename_mapping = {}
+# 文件名映射：内部文件名到原始文件名（含文件夹），按浏览器会话分命名空间保存在 SQLite 中，
+# 重启后不丢失，多个工作进程共享；超过有效期的记录自动删除
+session_store = SessionStore(
+    os.getenv('MUSIC_CLEANER_SESSION_DB', '').strip() or os.path.join(app.config['UPLOAD_STORE'], 'sessions.db'),
+    ttl=float(os.getenv('MUSIC_CLEANER_SESSION_TTL', '') or DEFAULT_SESSION_TTL))
+atexit.register(session_store.close)
+SESSION_COOKIE = 'music_cleaner_session'
+
+
+def _session_namespace():
+    """当前浏览器会话的命名空间（保存在 Cookie 中，没有时新建）"""
+    namespace = getattr(g, 'session_namespace', None)
+    if namespace is None:
+        namespace = request.cookies.get(SESSION_COOKIE, '')
+        if not re.fullmatch(r'[0-9a-f]{32}', namespace):
+            namespace = secrets.token_hex(16)
+        g.session_namespace = namespace
+    return namespace
+
+
+def _flush_shared_stores():
+    """提交磁盘缓存和增量清单中尚未提交的写入，释放写锁，让其他工作进程可以写入"""
+    lyrics_processor.cache.flush()
+    if path_manifest is not None:
+        path_manifest.commit()
+
+
+def _flushing(func):
+    """后台任务结束时（包括出错时）提交共享的数据库"""
+    def run(job, *args):
+        try:
+            return func(job, *args)
+        finally:
+            _flush_shared_stores()
+    return run
+
+
+@app.after_request
+def _flush_after_request(response):
+    _flush_shared_stores()
+    return response
+
+
+@app.after_request
+def _set_session_cookie(response):
+    namespace = getattr(g, 'session_namespace', None)
+    if namespace is not None and request.cookies.get(SESSION_COOKIE) != namespace:
+        response.set_cookie(SESSION_COOKIE, namespace, max_age=int(session_store.ttl),
+                            httponly=True, samesite='Lax')
+    return response
 
 def cleanup_temp_files():
     """清理临时文件"""
@@ -72,6 +180,134 @@ def _normalize_filter_ext(filter_ext_raw):
 
     return sorted(set(normalized)) if normalized else None
 
+
+def _wants_async(data=None):
+    """请求是否要求后台执行（查询参数、表单字段或 JSON 中的 async）"""
+    value = request.args.get('async')
+    if value is None and data is not None:
+        value = data.get('async')
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def _job_links(job):
+    """任务状态及查询、订阅、取消的地址"""
+    links = job.snapshot()
+    links['status_url'] = f"/jobs/{job.id}"
+    links['events_url'] = f"/jobs/{job.id}/events"
+    links['cancel_url'] = f"/jobs/{job.id}/cancel"
+    return links
+
+
+def _run_job(kind, func, *args, run_async=False, total=None):
+    """
+    执行任务函数 func(job, *args)
+
+    run_async 为 True 时提交到后台任务队列并返回 202 和任务 ID，否则在当前请求中执行并直接返回结果。
+    """
+    if not run_async:
+        return jsonify(func(Job(kind, total, keep_events=False), *args))
+    try:
+        job = job_queue.submit(kind, _flushing(func), *args, total=total)
+    except JobQueueFull as e:
+        return jsonify({'error': f'{e}，请稍后再试'}), 503
+    return jsonify(_job_links(job)), 202
+
+
+def _save_upload(file, file_path, internal_filename):
+    """
+    把上传的文件存入上传库并链接到 file_path
+
+    Returns:
+        bool: 内容是否与之前上传过的文件重复（重复时不占用额外磁盘）
+    """
+    key, duplicate = upload_store.save(file.stream, os.path.splitext(internal_filename)[1].lower())
+    upload_store.link(key, file_path, internal_filename)
+    return duplicate
+
+
+def _uploaded_lyrics(filename, file_path):
+    """上传文件的歌词：同样内容已解析过时直接使用上传库中的结果"""
+    key = upload_store.lookup(filename)
+    original_lyrics = upload_store.get_lyrics(key) if key is not None else None
+    if original_lyrics is None:
+        original_lyrics = get_lyrics_from_file(file_path)
+        if key is not None:
+            upload_store.set_lyrics(key, original_lyrics or '')
+    return original_lyrics
+
+
+def _uploaded_clean(filename, original_lyrics):
+    """上传文件的清理结果：同样内容在当前规则下清理过时直接使用上传库中的结果"""
+    key = upload_store.lookup(filename)
+    ruleset_version = lyrics_processor.ruleset_version
+    cached = upload_store.get_cleaned(key, ruleset_version) if key is not None else None
+    if cached is not None:
+        return cached
+    cleaned_lyrics, removed_lines = clean_lyrics(original_lyrics)
+    if key is not None:
+        upload_store.set_cleaned(key, ruleset_version, cleaned_lyrics, removed_lines)
+    return cleaned_lyrics, removed_lines
+
+
+def _read_uploaded_files(job, saved_files, errors, with_folders, duplicates=0):
+    """
+    读取已保存的上传文件中的歌词
+
+    Args:
+        saved_files (list): [(内部文件名, 原始文件名, 文件路径, 原始文件夹)]
+        errors (list): 保存阶段的警告
+        with_folders (bool): 是否按文件夹统计（文件夹上传）
+        duplicates (int): 内容与之前上传过的文件重复的数量
+    """
+    uploaded_files = []
+    folder_structure = {}
+    errors = list(errors)
+
+    for internal_filename, original_name, file_path, folder_path in saved_files:
+        if job.cancelled:
+            break
+        try:
+            # 提取原始歌词（同样内容已解析过时不再读取文件）
+            original_lyrics = _uploaded_lyrics(internal_filename, file_path)
+        except Exception as e:
+            errors.append(f"处理文件 {original_name} 失败: {str(e)}")
+            job.emit(EVENT_FILE, {'state': 'failed', 'filename': internal_filename, 'error': str(e)})
+            continue
+
+        file_info = {
+            'filename': internal_filename,
+            'original_name': original_name,
+            'has_lyrics': bool(original_lyrics),
+            'original_lyrics': original_lyrics
+        }
+        if with_folders:
+            file_info['folder'] = folder_path
+            # 构建文件夹结构统计
+            if folder_path not in folder_structure:
+                folder_structure[folder_path] = {'total': 0, 'with_lyrics': 0}
+            folder_structure[folder_path]['total'] += 1
+            if file_info['has_lyrics']:
+                folder_structure[folder_path]['with_lyrics'] += 1
+
+        uploaded_files.append(file_info)
+        job.emit(EVENT_FILE, {'state': 'uploaded', 'filename': internal_filename,
+                              'original_name': original_name, 'has_lyrics': file_info['has_lyrics']})
+
+    result = {'files': uploaded_files, 'duplicate_count': duplicates, 'upload_stats': upload_store.stats()}
+    if with_folders:
+        result.update({
+            'folder_structure': folder_structure,
+            'total_files': len(uploaded_files),
+            'files_with_lyrics': len([f for f in uploaded_files if f['has_lyrics']])
+        })
+    if errors:
+        result['warnings'] = errors
+    if job.cancelled:
+        result['cancelled'] = True
+    return result
+
 @app.route('/upload', methods=['POST'])
 def upload_files():
     """处理文件上传"""
@@ -83,8 +319,10 @@ def upload_files():
         if not files or all(f.filename == '' for f in files):
             return jsonify({'error': '没有选择文件'}), 400
         
-        uploaded_files = []
+        saved_files = []
         errors = []
+        duplicates = 0
+        original_names = {}
         
         for file in files:
             if file and file.filename and is_audio_file(file.filename):
@@ -98,39 +336,32 @@ def upload_files():
                         errors.append(f"文件名无效: {original_filename}")
                         continue
                     
-                    # 添加时间戳避免文件名冲突
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+                    # 添加时间戳和随机串避免文件名冲突（多个请求同一秒上传同名文件时也不会互相覆盖）
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_') + secrets.token_hex(3) + '_'
                     internal_filename = timestamp + filename
                     file_path = os.path.join(app.config['UPLOAD_FOLDER'], internal_filename)
                     
-                    # 保存文件
-                    file.save(file_path)
+                    # 保存文件（边写入边计算哈希，内容重复时只创建链接）
+                    duplicates += _save_upload(file, file_path, internal_filename)
                     
                     # 保存文件名映射
-                    filename_mapping[internal_filename] = original_filename
-                    
-                    # 提取原始歌词
-                    original_lyrics = get_lyrics_from_file(file_path)
+                    original_names[internal_filename] = original_filename
                     
-                    uploaded_files.append({
-                        'filename': internal_filename,
-                        'original_name': original_filename,
-                        'has_lyrics': bool(original_lyrics),
-                        'original_lyrics': original_lyrics
-                    })
+                    saved_files.append((internal_filename, original_filename, file_path, None))
                     
                 except Exception as e:
                     errors.append(f"处理文件 {file.filename} 失败: {str(e)}")
                     continue
         
-        if not uploaded_files and not errors:
+        if not saved_files and not errors:
             return jsonify({'error': '没有有效的音频文件'}), 400
         
-        result = {'files': uploaded_files}
-        if errors:
-            result['warnings'] = errors
+        _expire_sessions()
+        session_store.set_many(_session_namespace(), original_names)
         
-        return jsonify(result)
+        # 文件已保存，提取歌词可以在后台进行
+        return _run_job('upload', _read_uploaded_files, saved_files, errors, False, duplicates,
+                        run_async=_wants_async(request.form), total=len(saved_files))
         
     except Exception as e:
         print(f"Upload error: {e}")
@@ -149,9 +380,10 @@ def upload_folder():
         if not files or all(f.filename == '' for f in files):
             return jsonify({'error': '没有选择文件'}), 400
         
-        uploaded_files = []
-        folder_structure = {}
+        saved_files = []
         errors = []
+        duplicates = 0
+        original_names = {}
         
         for file in files:
             if file and file.filename and is_audio_file(file.filename):
@@ -167,8 +399,8 @@ def upload_folder():
                         errors.append(f"文件名无效: {original_path}")
                         continue
                     
-                    # 添加时间戳避免文件名冲突
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+                    # 添加时间戳和随机串避免文件名冲突（多个请求同一秒上传同名文件时也不会互相覆盖）
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_') + secrets.token_hex(3) + '_'
                     internal_filename = timestamp + filename
                     
                     # 创建文件夹结构
@@ -197,50 +429,26 @@ def upload_folder():
                         file_path = os.path.join(app.config['UPLOAD_FOLDER'], internal_filename)
                         internal_relative_path = internal_filename
                     
-                    # 保存文件
-                    file.save(file_path)
+                    # 保存文件（边写入边计算哈希，内容重复时只创建链接）
+                    duplicates += _save_upload(file, file_path, internal_relative_path)
                     
                     # 保存文件名映射
-                    filename_mapping[internal_relative_path] = original_path
+                    original_names[internal_relative_path] = original_path
                     
-                    # 提取原始歌词
-                    original_lyrics = get_lyrics_from_file(file_path)
-                    
-                    file_info = {
-                        'filename': internal_relative_path,
-                        'original_name': original_path,
-                        'has_lyrics': bool(original_lyrics),
-                        'original_lyrics': original_lyrics,
-                        'folder': folder_path
-                    }
-                    
-                    uploaded_files.append(file_info)
-                    
-                    # 构建文件夹结构统计
-                    if folder_path not in folder_structure:
-                        folder_structure[folder_path] = {'total': 0, 'with_lyrics': 0}
-                    folder_structure[folder_path]['total'] += 1
-                    if file_info['has_lyrics']:
-                        folder_structure[folder_path]['with_lyrics'] += 1
+                    saved_files.append((internal_relative_path, original_path, file_path, folder_path))
                         
                 except Exception as e:
                     errors.append(f"处理文件 {file.filename} 失败: {str(e)}")
                     continue
         
-        if not uploaded_files and not errors:
+        if not saved_files and not errors:
             return jsonify({'error': '没有有效的音频文件'}), 400
         
-        result = {
-            'files': uploaded_files,
-            'folder_structure': folder_structure,
-            'total_files': len(uploaded_files),
-            'files_with_lyrics': len([f for f in uploaded_files if f['has_lyrics']])
-        }
-        
-        if errors:
-            result['warnings'] = errors
+        _expire_sessions()
+        session_store.set_many(_session_namespace(), original_names)
         
-        return jsonify(result)
+        return _run_job('upload_folder', _read_uploaded_files, saved_files, errors, True, duplicates,
+                        run_async=_wants_async(request.form), total=len(saved_files))
         
     except Exception as e:
         import traceback
@@ -262,11 +470,11 @@ def preview_cleaning():
     if not os.path.exists(file_path):
         return jsonify({'error': '文件不存在'}), 404
     
-    original_lyrics = get_lyrics_from_file(file_path)
+    original_lyrics = _uploaded_lyrics(filename, file_path)
     if not original_lyrics:
         return jsonify({'error': '文件中没有歌词'}), 400
     
-    cleaned_lyrics, removed_lines = clean_lyrics(original_lyrics)
+    cleaned_lyrics, removed_lines = _uploaded_clean(filename, original_lyrics)
     
     return jsonify({
         'original_lyrics': original_lyrics,
@@ -284,24 +492,37 @@ def process_files():
     if not filenames:
         return jsonify({'error': '没有选择要处理的文件'}), 400
     
+    return _run_job('process', _process_uploaded_files, filenames, _session_namespace(),
+                    run_async=_wants_async(data), total=len(filenames))
+
+
+def _process_uploaded_files(job, filenames, namespace):
+    """清理已上传文件的歌词，结果保存到处理文件夹（namespace 为上传时的会话，用于查询原始文件名）"""
+    original_names = session_store.get_many(namespace, filenames)
     processed_files = []
     failed_files = []
     ignored_files = []
+    # 生成处理后文件时实际写入的字节数和使用的方式
+    copy_stats = {'bytes_written': 0, 'bytes_total': 0, 'methods': {}}
     
     for filename in filenames:
+        if job.cancelled:
+            break
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         if not os.path.exists(file_path):
             failed_files.append({'filename': filename, 'error': '文件不存在'})
+            job.emit(EVENT_FILE, {'state': 'failed', **failed_files[-1]})
             continue
         
         try:
-            original_lyrics = get_lyrics_from_file(file_path)
+            original_lyrics = _uploaded_lyrics(filename, file_path)
             if not original_lyrics:
                 # 将没有歌词的文件标记为忽略，而不是失败
                 ignored_files.append({'filename': filename, 'reason': '文件中没有歌词标签'})
+                job.emit(EVENT_FILE, {'state': 'ignored', **ignored_files[-1]})
                 continue
             
-            cleaned_lyrics, removed_lines = clean_lyrics(original_lyrics)
+            cleaned_lyrics, removed_lines = _uploaded_clean(filename, original_lyrics)
             
             # 保持文件夹结构
             relative_path = os.path.relpath(file_path, app.config['UPLOAD_FOLDER'])
@@ -313,36 +534,22 @@ def process_files():
             if processed_dir:
                 os.makedirs(processed_dir, exist_ok=True)
             
-            # 复制文件到处理文件夹
-            shutil.copy2(file_path, processed_path)
+            # 生成写入清理后歌词的文件：尽量共享数据块（硬链接 / reflink），否则只写一遍
+            try:
+                method, bytes_written = lyrics_processor.save_cleaned_copy(
+                    file_path, processed_path, cleaned_lyrics if cleaned_lyrics != original_lyrics else None)
+                saved = True
+            except Exception as e:
+                print(f"保存歌词时出错 {processed_path}: {e}")
+                saved = False
             
-            # 保存清理后的歌词
-            if save_lyrics_to_file(processed_path, cleaned_lyrics):
-                # 从映射表获取原始文件名
-                print(f"Debug: 查找文件名映射 - filename: {filename}")
-                print(f"Debug: 映射表键: {list(filename_mapping.keys())}")
-                
-                if filename in filename_mapping:
-                    original_path = filename_mapping[filename]
-                    display_name = os.path.basename(original_path)
-                    print(f"Debug: 从映射表找到 - original_path: {original_path}, display_name: {display_name}")
-                else:
-                    print(f"Debug: 映射表中未找到，尝试解析文件名")
-                    # 如果映射表中没有，尝试从文件名解析
-                    basename = os.path.basename(filename)
-                    print(f"Debug: basename: {basename}")
-                    if '_' in basename and len(basename.split('_')) >= 3:
-                        parts = basename.split('_', 2)
-                        print(f"Debug: 分割结果: {parts}")
-                        if parts[0].isdigit() and parts[1].isdigit():
-                            display_name = parts[2]
-                            print(f"Debug: 解析成功 - display_name: {display_name}")
-                        else:
-                            display_name = basename
-                            print(f"Debug: 时间戳格式不正确，使用basename: {display_name}")
-                    else:
-                        display_name = basename
-                        print(f"Debug: 无法解析，使用basename: {display_name}")
+            if saved:
+                copy_stats['bytes_written'] += bytes_written
+                copy_stats['bytes_total'] += os.path.getsize(processed_path)
+                copy_stats['methods'][method] = copy_stats['methods'].get(method, 0) + 1
+
+                # 用于显示的原始文件名，没有记录时使用内部文件名
+                display_name = os.path.basename(original_names.get(filename, filename))
                 
                 processed_files.append({
                     'original_filename': filename,
@@ -351,11 +558,14 @@ def process_files():
                     'removed_count': len(removed_lines),
                     'folder': os.path.dirname(relative_path) if os.path.dirname(relative_path) else None
                 })
+                job.emit(EVENT_FILE, {'state': 'processed', **processed_files[-1]})
             else:
                 failed_files.append({'filename': filename, 'error': '保存歌词失败'})
+                job.emit(EVENT_FILE, {'state': 'failed', **failed_files[-1]})
                 
         except Exception as e:
             failed_files.append({'filename': filename, 'error': str(e)})
+            job.emit(EVENT_FILE, {'state': 'failed', **failed_files[-1]})
     
     # 如果有失败文件，自动导出到txt文件
     if failed_files:
@@ -381,16 +591,62 @@ def process_files():
         except Exception as e:
             print(f"❌ 导出失败文件时出错: {e}")
     
-    return jsonify({
+    result = {
         'processed_files': processed_files,
         'failed_files': failed_files,
         'ignored_files': ignored_files,
         'success_count': len(processed_files),
         'failed_count': len(failed_files),
-        'ignored_count': len(ignored_files)
-    })
+        'ignored_count': len(ignored_files),
+        'copy_stats': copy_stats,
+        'cache_stats': lyrics_processor.cache_stats()
+    }
+    if job.cancelled:
+        result['cancelled'] = True
+    return result
 
 
+def _stop_path_profile(profiler, result=None):
+    """停止按路径处理的性能分析，把分析结果附加到响应中"""
+    lyrics_processor.worker_profile_dir = None
+    try:
+        profiler.stop()
+    finally:
+        profile_lock.release()
+    if result is not None:
+        result['profile'] = {
+            'pstats': profiler.pstats_path,
+            'collapsed': profiler.collapsed_path,
+            'top_functions': profiler.top_functions(),
+        }
+    return result
+
+def _paths_overlap(path, folder):
+    """path 与 folder 相同，或其中一个在另一个之内"""
+    try:
+        common = os.path.commonpath([path, folder])
+    except ValueError:
+        return False
+    return common in (path, folder)
+
+
+def _should_process_path(file_path, filter_ext):
+    """是否为可处理的音频文件且在扩展名过滤范围内"""
+    if not is_audio_file(file_path):
+        return False
+    if filter_ext:
+        return os.path.splitext(file_path)[1].lower() in filter_ext
+    return True
+
+
+def _state_label(state):
+    """处理状态对应的事件状态名"""
+    if state == 'unchanged':
+        return 'unchanged'
+    if state is True:
+        return 'processed'
+    return 'ignored' if state is None else 'failed'
+
 @app.route('/process_path', methods=['POST'])
 def process_path():
     """按服务器路径直接处理文件或文件夹"""
@@ -399,11 +655,24 @@ def process_path():
         target_path = str(data.get('path', '')).strip().strip('"')
         dry_run = bool(data.get('dry_run', False))
         backup = bool(data.get('backup', False))
+        use_pipeline = bool(data.get('pipeline', False))
+        profile = bool(data.get('profile', False))
         filter_ext = _normalize_filter_ext(data.get('filter_ext'))
 
         if not target_path:
             return jsonify({'error': '路径不能为空'}), 400
 
+        # 扩展名过滤只保留支持的格式，不支持的扩展名在结果中提示
+        unsupported_ext = None
+        if filter_ext:
+            unsupported_ext = sorted(set(filter_ext) - lyrics_processor.supported_formats) or None
+            filter_ext = sorted(set(filter_ext) & lyrics_processor.supported_formats)
+            if not filter_ext:
+                return jsonify({
+                    'error': '扩展名过滤中没有支持的音频格式',
+                    'supported_formats': sorted(lyrics_processor.supported_formats)
+                }), 400
+
         abs_target_path = os.path.abspath(target_path)
 
         if not os.path.exists(abs_target_path):
@@ -424,12 +693,48 @@ def process_path():
                     'allowed_root': abs_allowed_root
                 }), 403
 
-        def should_process_file(file_path):
-            if not is_audio_file(file_path):
-                return False
-            if filter_ext:
-                return os.path.splitext(file_path)[1].lower() in filter_ext
-            return True
+        # uploads/ 中的文件是上传库对象的硬链接，原地写入会同时改动其他会话上传的同一份内容
+        if not dry_run and any(_paths_overlap(os.path.realpath(abs_target_path), os.path.realpath(folder))
+                               for folder in (app.config['UPLOAD_FOLDER'], app.config['UPLOAD_STORE'])):
+            return jsonify({'error': '不能原地处理上传目录或上传库中的文件，请使用预览模式或上传后处理'}), 400
+
+        if profile:
+            if not profile_dir:
+                return jsonify({'error': '未开启性能分析，请设置环境变量 MUSIC_CLEANER_PROFILE_DIR'}), 400
+            if profile_lock.locked():
+                return jsonify({'error': '已有性能分析正在进行，请稍后再试'}), 409
+
+        if os.path.isfile(abs_target_path) and not _should_process_path(abs_target_path, filter_ext):
+            return jsonify({'error': '该文件不是可处理的音频格式，或不在扩展名过滤范围内'}), 400
+
+        return _run_job('process_path', _process_path, abs_target_path, dry_run, backup, use_pipeline, filter_ext,
+                        profile, unsupported_ext, run_async=_wants_async(data))
+
+    except Exception as e:
+        return jsonify({'error': f'路径处理失败: {str(e)}'}), 500
+
+
+def _process_path(job, abs_target_path, dry_run, backup, use_pipeline, filter_ext, profile, unsupported_ext=None):
+    """处理服务器上的文件或文件夹，每处理完一个文件发出一个事件"""
+    profiler = None
+    if profile:
+        # 工作进程的分析目录设置在共享的处理器上，同一时间只分析一个请求
+        if not profile_lock.acquire():
+            raise RuntimeError('已有性能分析正在进行，请稍后再试')
+        profiler = RunProfiler(os.path.join(profile_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"))
+        lyrics_processor.worker_profile_dir = profiler.start().worker_directory
+
+    try:
+        def run_file(file_path, stat_result=None, timing=None):
+            """处理单个文件；增量模式下未变化的文件返回 ('unchanged', 0)"""
+            if path_manifest is not None and path_manifest.is_unchanged(file_path, stat_result or os.stat(file_path)):
+                return 'unchanged', 0
+            state, removed_lines = process_audio_file(file_path, verbose=False, dry_run=dry_run, backup=backup, probe=True,
+                                                      timing=timing)
+            if path_manifest is not None:
+                path_manifest.record(file_path, os.stat(file_path),
+                                     outcome_from_result(state, removed_lines, dry_run), removed_lines)
+            return state, removed_lines
 
         result = {
             'target_path': abs_target_path,
@@ -440,21 +745,24 @@ def process_path():
             'success_count': 0,
             'failed_count': 0,
             'ignored_count': 0,
+            'unchanged_count': 0,
             'total_removed': 0,
             'processed_files': [],
             'failed_files': [],
             'ignored_files': []
         }
+        if unsupported_ext:
+            # 扩展名过滤中不支持的格式，已忽略
+            result['unsupported_filter_ext'] = unsupported_ext
 
         if os.path.isfile(abs_target_path):
-            if not should_process_file(abs_target_path):
-                return jsonify({'error': '该文件不是可处理的音频格式，或不在扩展名过滤范围内'}), 400
-
             result['total_audio_files'] = 1
-            state, removed_lines = process_audio_file(abs_target_path, verbose=False, dry_run=dry_run, backup=backup)
+            state, removed_lines = run_file(abs_target_path)
             display_name = os.path.basename(abs_target_path)
 
-            if state is True:
+            if state == 'unchanged':
+                result['unchanged_count'] = 1
+            elif state is True:
                 result['success_count'] = 1
                 result['total_removed'] = removed_lines
                 result['processed_files'].append({
@@ -474,45 +782,201 @@ def process_path():
                     'filename': abs_target_path,
                     'error': '处理失败'
                 })
+            job.emit(EVENT_FILE, {'state': _state_label(state), 'filename': abs_target_path,
+                                  'removed_count': removed_lines if state is True else 0})
 
-            return jsonify(result)
+            if path_manifest is not None:
+                path_manifest.commit()
+            result['cache_stats'] = lyrics_processor.cache_stats()
+            if profiler is not None:
+                profiler, result = None, _stop_path_profile(profiler, result)
+            return result
 
-        # 文件夹模式
-        for root, dirs, files in os.walk(abs_target_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if not should_process_file(file_path):
-                    continue
+        def iter_folder_results():
+            """逐个产出 (文件路径, 处理状态, 移除的行数)"""
+            if use_pipeline:
+                # 分阶段流水线：读取、清理、写回分别并发，结果按完成顺序产出
+                def is_unchanged(scanned):
+                    return path_manifest.is_unchanged(scanned.path, scanned.stat())
 
-                result['total_audio_files'] += 1
-                state, removed_lines = process_audio_file(file_path, verbose=False, dry_run=dry_run, backup=backup)
-                rel_path = os.path.relpath(file_path, abs_target_path)
-
-                if state is True:
-                    result['success_count'] += 1
-                    result['total_removed'] += removed_lines
-                    result['processed_files'].append({
-                        'path': file_path,
-                        'display_name': rel_path,
-                        'removed_count': removed_lines
-                    })
-                elif state is None:
-                    result['ignored_count'] += 1
-                    result['ignored_files'].append({
-                        'filename': rel_path,
-                        'reason': '文件中没有歌词标签'
-                    })
-                else:
-                    result['failed_count'] += 1
-                    result['failed_files'].append({
-                        'filename': rel_path,
-                        'error': '处理失败'
-                    })
+                for file_path, state, removed_lines, _ in pipeline.iter_results(
+                        abs_target_path, filter_ext, dry_run=dry_run, backup=backup,
+                        skip=is_unchanged if path_manifest is not None else None, report=run_report):
+                    if job.cancelled:
+                        # 停止扫描新文件，已进入流水线的文件处理完后结束
+                        pipeline.cancel()
+                    if state == FILE_SKIPPED:
+                        yield file_path, 'unchanged', 0
+                        continue
+                    if path_manifest is not None:
+                        path_manifest.record(file_path, os.stat(file_path),
+                                             outcome_from_result(state, removed_lines, dry_run), removed_lines)
+                    yield file_path, state, removed_lines
+                result['pipeline_stats'] = pipeline.stage_stats
+                return
 
-        return jsonify(result)
+            scanned_files = scanner.scan(abs_target_path)
+            while not job.cancelled:
+                wall, cpu = time.perf_counter(), time.thread_time()
+                scanned = next(scanned_files, None)
+                if scanned is None:
+                    run_report.finish_scan(time.perf_counter() - wall, time.thread_time() - cpu)
+                    return
+                run_report.add_scanned(time.perf_counter() - wall, time.thread_time() - cpu)
+                file_path = scanned.path
+                timing = FileTiming()
+                state, removed_lines = run_file(file_path, scanned.stat() if path_manifest is not None else None, timing)
+                run_report.add_file(timing, skipped=state == 'unchanged', file_path=file_path)
+                yield file_path, state, removed_lines
+
+        # 文件夹模式：扩展名过滤在扫描时完成，扫描与处理同时进行
+        pipeline = None
+        if use_pipeline:
+            pipeline = LyricsPipeline(lyrics_processor, read_workers=pipeline_read_threads,
+                                      clean_workers=pipeline_clean_workers,
+                                      write_workers=pipeline_write_threads, scan_threads=scan_threads)
+        scanner = LibraryScanner(filter_ext or lyrics_processor.supported_formats, threads=scan_threads)
+        run_report = RunReport(abs_target_path, slowest=PROFILE_SLOWEST_FILES if profiler is not None else 0)
+        for file_path, state, removed_lines in iter_folder_results():
+            result['total_audio_files'] += 1
+            rel_path = os.path.relpath(file_path, abs_target_path)
+
+            if state == 'unchanged':
+                result['unchanged_count'] += 1
+            elif state is True:
+                result['success_count'] += 1
+                result['total_removed'] += removed_lines
+                result['processed_files'].append({
+                    'path': file_path,
+                    'display_name': rel_path,
+                    'removed_count': removed_lines
+                })
+            elif state is None:
+                result['ignored_count'] += 1
+                result['ignored_files'].append({
+                    'filename': rel_path,
+                    'reason': '文件中没有歌词标签'
+                })
+            else:
+                result['failed_count'] += 1
+                result['failed_files'].append({
+                    'filename': rel_path,
+                    'error': '处理失败'
+                })
+            job.total = run_report.discovered if run_report.scan_done else None
+            job.emit(EVENT_FILE, {'state': _state_label(state), 'filename': rel_path,
+                                  'removed_count': removed_lines if state is True else 0, 'total': job.total})
+        job.total = result['total_audio_files']
+        result['duplicate_count'] = (pipeline.scanner if pipeline is not None else scanner).duplicates
+        run_report.finish()
+        result['timing'] = run_report.summary()
+        if backup:
+            result['backup_stats'] = lyrics_processor.backup_stats()
+
+        if path_manifest is not None:
+            path_manifest.commit()
+        result['cache_stats'] = lyrics_processor.cache_stats()
+        if job.cancelled:
+            result['cancelled'] = True
+        if profiler is not None:
+            profiler, result = None, _stop_path_profile(profiler, result)
+        return result
+
+    finally:
+        if profiler is not None:
+            # 出错时也要停止分析
+            _stop_path_profile(profiler)
+
+@app.route('/jobs')
+def list_jobs():
+    """后台任务列表"""
+    if job_queue.store is not None:
+        return jsonify({'jobs': job_queue.store.snapshots()})
+    return jsonify({'jobs': [job.snapshot() for job in job_queue.jobs()]})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """查询后台任务状态，任务结束后包含结果"""
+    job = job_queue.get(job_id)
+    if job is not None:
+        return jsonify(job.snapshot(include_result=True))
+    # 任务可能在其他工作进程中
+    state = job_queue.store.snapshot(job_id) if job_queue.store is not None else None
+    if state is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(state)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消后台任务：已处理的文件保留，剩余文件不再处理"""
+    job = job_queue.cancel(job_id)
+    if job is not None:
+        return jsonify(job.snapshot())
+    # 任务在其他工作进程中时，由该进程在处理下一个文件前取消
+    if job_queue.store is None or not job_queue.store.request_cancel(job_id):
+        return jsonify({'error': '任务不存在'}), 404
+    state = job_queue.store.snapshot(job_id)
+    state.pop('result', None)
+    return jsonify(state)
+
+
+def _stored_events(job_id, cursor, timeout):
+    """与 Job.wait_events 相同，但轮询共享任务状态中其他工作进程的任务事件"""
+    deadline = time.monotonic() + timeout
+    while True:
+        state = job_queue.store.snapshot(job_id)
+        events = job_queue.store.events(job_id, cursor)
+        if events:
+            return events
+        if state is None or state['status'] in FINISHED_STATES:
+            return None
+        if time.monotonic() >= deadline:
+            return []
+        time.sleep(JOB_POLL_SECONDS)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    以 Server-Sent Events 推送任务事件
+
+    每处理完一个文件推送一个 file 事件，任务结束时推送包含结果的 done 事件后关闭连接。
+    事件 id 为序号，断线重连时浏览器带上 Last-Event-ID，从下一个事件继续。
+    """
+    job = job_queue.get(job_id)
+    if job is not None:
+        wait_events = job.wait_events
+    elif job_queue.store is not None and job_queue.store.snapshot(job_id) is not None:
+        wait_events = lambda position, timeout: _stored_events(job_id, position, timeout)
+    else:
+        return jsonify({'error': '任务不存在'}), 404
+
+    try:
+        cursor = int(request.headers.get('Last-Event-ID', request.args.get('last_event_id', -1))) + 1
+    except ValueError:
+        cursor = 0
+
+    def stream():
+        position = max(0, cursor)
+        yield "retry: 2000\n\n"
+        while True:
+            events = wait_events(position, timeout=SSE_HEARTBEAT_SECONDS)
+            if events is None:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event, data in events:
+                yield f"id: {position}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                position += 1
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/cache_stats')
+def cache_stats():
+    """歌词缓存命中统计"""
+    return jsonify(lyrics_processor.cache_stats() or {})
 
-    except Exception as e:
-        return jsonify({'error': f'路径处理失败: {str(e)}'}), 500
 @app.route('/download/<path:filename>')
 def download_file(filename):
     """下载处理后的文件"""
@@ -524,21 +988,9 @@ def download_file(filename):
     if filename.startswith('cleaned_'):
         internal_filename = filename[8:]  # 移除 'cleaned_' 前缀
         
-        # 从映射表中获取原始文件名
-        if internal_filename in filename_mapping:
-            original_path = filename_mapping[internal_filename]
-            download_name = os.path.basename(original_path)
-        else:
-            # 如果映射表中没有，尝试从文件名解析
-            basename = os.path.basename(internal_filename)
-            if '_' in basename and len(basename.split('_')) >= 3:
-                parts = basename.split('_', 2)
-                if parts[0].isdigit() and parts[1].isdigit():
-                    download_name = parts[2]  # 使用原始文件名部分
-                else:
-                    download_name = basename
-            else:
-                download_name = basename
+        # 从会话存储中获取原始文件名，没有记录时使用内部文件名
+        original_path = session_store.get(_session_namespace(), internal_filename)
+        download_name = os.path.basename(original_path or internal_filename)
     else:
         download_name = os.path.basename(filename)
     
@@ -546,61 +998,38 @@ def download_file(filename):
 
 @app.route('/download_all', methods=['POST'])
 def download_all():
-    """打包下载所有处理后的文件"""
+    """打包下载所有处理后的文件（边读边发送，不生成临时文件）"""
     data = request.get_json()
     filenames = data.get('filenames', [])
     
     if not filenames:
         return jsonify({'error': '没有文件可下载'}), 400
     
-    # 创建临时zip文件
-    temp_dir = tempfile.mkdtemp()
-    temp_files.append(temp_dir)  # 添加到清理列表
-    zip_path = os.path.join(temp_dir, 'cleaned_audio_files.zip')
-    
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            added_files = 0
-            for filename in filenames:
-                file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-                if os.path.exists(file_path):
-                    # 恢复原始文件名和文件夹结构
-                    if filename.startswith('cleaned_'):
-                        internal_filename = filename[8:]  # 移除 'cleaned_' 前缀
-                        
-                        # 从映射表中获取原始文件路径
-                        if internal_filename in filename_mapping:
-                            archive_name = filename_mapping[internal_filename]
-                        else:
-                            # 如果映射表中没有，尝试从文件名解析
-                            path_parts = internal_filename.split(os.sep)
-                            if path_parts:
-                                basename = path_parts[-1]
-                                if '_' in basename and len(basename.split('_')) >= 3:
-                                    parts = basename.split('_', 2)
-                                    if parts[0].isdigit() and parts[1].isdigit():
-                                        path_parts[-1] = parts[2]  # 使用原始文件名部分
-                                        archive_name = os.sep.join(path_parts)
-                                    else:
-                                        archive_name = internal_filename
-                                else:
-                                    archive_name = internal_filename
-                            else:
-                                archive_name = internal_filename
-                    else:
-                        archive_name = filename
+        entries = []
+        original_names = session_store.get_many(
+            _session_namespace(), [filename[8:] for filename in filenames if filename.startswith('cleaned_')])
+        for filename in filenames:
+            file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
+            if os.path.isfile(file_path):
+                # 恢复原始文件名和文件夹结构
+                if filename.startswith('cleaned_'):
+                    internal_filename = filename[8:]  # 移除 'cleaned_' 前缀
                     
-                    zipf.write(file_path, archive_name)
-                    added_files += 1
+                    # 从会话存储中获取原始文件路径，没有记录时使用内部文件名
+                    archive_name = original_names.get(internal_filename, internal_filename)
+                else:
+                    archive_name = filename
+                
+                entries.append((file_path, archive_name))
         
-        if added_files == 0:
+        if not entries:
             return jsonify({'error': '没有找到可下载的文件'}), 404
         
-        return send_file(
-            zip_path, 
-            as_attachment=True, 
-            download_name=f'cleaned_audio_files_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
-        )
+        # 音频按 STORED 存入，第一个文件的数据读出后即开始发送
+        download_name = f'cleaned_audio_files_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+        return Response(stream_zip(entries), mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename={download_name}'})
     
     except Exception as e:
         return jsonify({'error': f'创建压缩包失败: {str(e)}'}), 500
@@ -643,42 +1072,93 @@ def export_failed_files():
     except Exception as e:
         return jsonify({'error': f'导出失败文件时出错: {str(e)}'}), 500
 
+def _remove_session_files(names):
+    """删除一个会话上传的文件及其处理结果，并删除因此变空的文件夹"""
+    for name in names:
+        for folder, relative_path in ((app.config['UPLOAD_FOLDER'], name),
+                                      (app.config['PROCESSED_FOLDER'], f"cleaned_{name}")):
+            file_path = os.path.join(folder, relative_path)
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Failed to remove file {file_path}: {e}")
+                continue
+            # 逐级删除空文件夹（其他会话的文件所在的文件夹不为空，删除失败即停止）
+            directory = os.path.dirname(file_path)
+            while os.path.normpath(directory) != os.path.normpath(folder):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+
+def _expire_sessions():
+    """删除过期会话上传和处理的文件，并回收不再被引用的上传库对象"""
+    names = session_store.expire()
+    if names:
+        _remove_session_files(names)
+        upload_store.forget_names(names)
+    upload_store.collect_garbage()
+
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup_files():
-    """清理临时文件"""
+    """
+    清理当前会话上传和处理的文件
+
+    请求中 all_sessions 为 true 时清理全部会话的文件（管理操作，会删除其他用户正在使用的文件，
+    也会清理文件名映射已过期的遗留文件）；purge_store 为 true 时一并清空上传库（所有会话共享）。
+    """
     try:
-        # 清理上传文件夹
-        for root, dirs, files in os.walk(app.config['UPLOAD_FOLDER'], topdown=False):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Failed to remove file {file_path}: {e}")
-            for dir in dirs:
-                dir_path = os.path.join(root, dir)
-                try:
-                    os.rmdir(dir_path)
-                except Exception as e:
-                    print(f"Failed to remove directory {dir_path}: {e}")
-        
-        # 清理处理文件夹
-        for root, dirs, files in os.walk(app.config['PROCESSED_FOLDER'], topdown=False):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Failed to remove file {file_path}: {e}")
-            for dir in dirs:
-                dir_path = os.path.join(root, dir)
-                try:
-                    os.rmdir(dir_path)
-                except Exception as e:
-                    print(f"Failed to remove directory {dir_path}: {e}")
+        data = request.get_json(silent=True) or {}
+        if data.get('all_sessions'):
+            # 清理上传文件夹
+            for root, dirs, files in os.walk(app.config['UPLOAD_FOLDER'], topdown=False):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    try:
+                        os.remove(file_path)
+                    except Exception as e:
+                        print(f"Failed to remove file {file_path}: {e}")
+                for dir in dirs:
+                    dir_path = os.path.join(root, dir)
+                    try:
+                        os.rmdir(dir_path)
+                    except Exception as e:
+                        print(f"Failed to remove directory {dir_path}: {e}")
         
-        # 清理文件名映射
-        filename_mapping.clear()
+            # 清理处理文件夹
+            for root, dirs, files in os.walk(app.config['PROCESSED_FOLDER'], topdown=False):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    try:
+                        os.remove(file_path)
+                    except Exception as e:
+                        print(f"Failed to remove file {file_path}: {e}")
+                for dir in dirs:
+                    dir_path = os.path.join(root, dir)
+                    try:
+                        os.rmdir(dir_path)
+                    except Exception as e:
+                        print(f"Failed to remove directory {dir_path}: {e}")
+            session_store.clear()
+            upload_store.forget_names()
+        else:
+            # 只清理当前会话：其他会话的文件和文件名映射保留
+            namespace = _session_namespace()
+            names = session_store.names(namespace)
+            _remove_session_files(names)
+            session_store.clear(namespace)
+            upload_store.forget_names(names)
+
+        # 上传库中不再被任何会话引用的内容随之删除；purge_store 为 true 时清空整个上传库
+        if data.get('purge_store'):
+            upload_store.purge()
+        else:
+            upload_store.collect_garbage()
         
         return jsonify({'message': '清理完成'})
     
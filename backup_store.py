@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+整文件备份
+复制文件时依次尝试：reflink 克隆（btrfs / XFS 上的 FICLONE，只共享数据块，不写入数据）、
+copy_file_range（内核内复制，网络文件系统上可由服务器端完成）、普通复制。
+BackupStore 把备份按内容哈希保存在一个目录中，相同内容的文件只保存一份，
+不再在音乐库里到处留下 .backup 文件。
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# 备份方式
+METHOD_REFLINK = 'reflink'
+METHOD_COPY_FILE_RANGE = 'copy_file_range'
+METHOD_COPY = 'copy'
+METHOD_DEDUP = 'dedup'    # 内容已存在于备份库中，没有写入任何数据
+METHOD_HARDLINK = 'hardlink'
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class BackupResult:
+    """
+    一次备份的结果
+
+    Attributes:
+        path (str): 备份文件路径
+        method (str): 备份方式（reflink / copy_file_range / copy / dedup）
+        bytes_written (int): 实际写入的字节数（reflink 和 dedup 为 0）
+        digest (str): 内容哈希（只有备份库中的备份才有）
+    """
+
+    __slots__ = ('path', 'method', 'bytes_written', 'digest')
+
+    def __init__(self, path, method, bytes_written, digest=None):
+        self.path = path
+        self.method = method
+        self.bytes_written = bytes_written
+        self.digest = digest
+
+    def __repr__(self):
+        return f"BackupResult({self.method}, {self.bytes_written} bytes, {self.path!r})"
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def _copy_file_range(src, dst, size):
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is None or size == 0:
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            count = copy_file_range(src.fileno(), dst.fileno(), size - copied)
+            if count == 0:
+                break
+            copied += count
+    except OSError:
+        if copied:
+            # 已经复制了一部分时从头改用普通复制
+            dst.seek(0)
+            dst.truncate()
+        return False
+    return copied == size
+
+
+def clone_file(source_path, dest_path):
+    """
+    复制文件内容：reflink → copy_file_range → 普通复制
+
+    Args:
+        source_path (str): 源文件
+        dest_path (str): 目标文件（已存在时覆盖）
+
+    Returns:
+        BackupResult: 备份方式和写入的字节数
+    """
+    with open(source_path, 'rb') as src, open(dest_path, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        if _reflink(src, dst):
+            return BackupResult(dest_path, METHOD_REFLINK, 0)
+        if _copy_file_range(src, dst, size):
+            return BackupResult(dest_path, METHOD_COPY_FILE_RANGE, size)
+        src.seek(0)
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        return BackupResult(dest_path, METHOD_COPY, size)
+
+
+def reflink_file(source_path, dest_path):
+    """
+    用 reflink 克隆文件（只共享数据块，不写入数据），之后改写目标文件不会影响源文件
+
+    Returns:
+        bool: 是否成功；失败时不留下目标文件
+    """
+    if fcntl is None:
+        return False
+    with open(source_path, 'rb') as src, open(dest_path, 'wb') as dst:
+        if _reflink(src, dst):
+            return True
+    os.remove(dest_path)
+    return False
+
+
+def copy_range(src, dst, offset, size):
+    """
+    把源文件从 offset 开始的 size 个字节追加到目标文件的当前位置：copy_file_range → 普通复制
+
+    Args:
+        src: 源文件（二进制模式）
+        dst: 目标文件（二进制模式，写入位置在末尾）
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    copied = 0
+    if copy_file_range is not None and size:
+        dst.flush()
+        try:
+            while copied < size:
+                count = copy_file_range(src.fileno(), dst.fileno(), size - copied, offset + copied)
+                if count == 0:
+                    break
+                copied += count
+        except OSError:
+            pass
+        dst.seek(0, os.SEEK_END)
+    src.seek(offset + copied)
+    while copied < size:
+        chunk = src.read(min(COPY_BUFFER_SIZE, size - copied))
+        if not chunk:
+            raise OSError("源文件在复制过程中被截断")
+        dst.write(chunk)
+        copied += len(chunk)
+
+
+def file_digest(file_path):
+    """计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+class BackupStore:
+    """
+    内容寻址的备份库
+
+    备份保存在 objects/<哈希前两位>/<哈希> 中，原文件路径到哈希的对应关系
+    追加到 refs.<进程号>.jsonl（每个进程一个文件，并行处理时互不干扰）。
+
+    Args:
+        directory (str): 备份库目录，不存在时自动创建
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._refs = None
+        self._refs_pid = None
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest[2:])
+
+    def backup(self, file_path):
+        """
+        备份文件
+
+        Returns:
+            BackupResult: 备份结果；内容已存在时方式为 dedup，不写入任何数据
+        """
+        digest = file_digest(file_path)
+        object_path = self.object_path(digest)
+        if os.path.exists(object_path):
+            result = BackupResult(object_path, METHOD_DEDUP, 0, digest)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.tmp-{os.getpid()}-{secrets.token_hex(4)}"
+            try:
+                result = clone_file(file_path, temp_path)
+                os.chmod(temp_path, 0o444)
+                os.replace(temp_path, object_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            result.path = object_path
+            result.digest = digest
+
+        self._add_ref(file_path, result)
+        return result
+
+    def _add_ref(self, file_path, result):
+        entry = {
+            'path': os.path.abspath(file_path),
+            'digest': result.digest,
+            'method': result.method,
+            'bytes_written': result.bytes_written,
+            'time': round(time.time(), 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._refs is None or self._refs_pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self._refs = open(os.path.join(self.directory, f"refs.{os.getpid()}.jsonl"), 'a', encoding='utf-8')
+                self._refs_pid = os.getpid()
+            self._refs.write(line)
+            self._refs.flush()
+
+    def find(self, file_path):
+        """
+        查找文件的全部备份
+
+        Returns:
+            list: 备份记录（path / digest / method / bytes_written / time），按时间从新到旧
+        """
+        file_path = os.path.abspath(file_path)
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not (name.startswith('refs.') and name.endswith('.jsonl')):
+                continue
+            with open(os.path.join(self.directory, name), encoding='utf-8') as refs:
+                for line in refs:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['path'] == file_path:
+                        entries.append(entry)
+        entries.sort(key=lambda entry: entry['time'], reverse=True)
+        return entries
+
+    def restore(self, file_path, dest_path=None):
+        """
+        用最近一次备份恢复文件
+
+        Args:
+            file_path (str): 原文件路径
+            dest_path (str): 恢复到的路径，默认覆盖原文件
+
+        Returns:
+            BackupResult: 恢复方式和写入的字节数；没有备份时返回 None
+        """
+        entries = self.find(file_path)
+        if not entries:
+            return None
+        dest_path = dest_path or file_path
+        mode = os.stat(dest_path).st_mode & 0o7777 if os.path.exists(dest_path) else 0o644
+        temp_path = f"{dest_path}.restore-{secrets.token_hex(4)}"
+        try:
+            result = clone_file(self.object_path(entries[0]['digest']), temp_path)
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        result.path = dest_path
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._refs is not None and self._refs_pid == os.getpid():
+                self._refs.close()
+            self._refs = None
@@ -0,0 +1,4 @@
+"""
+歌词清理核心的性能基准
+用法: python -m benchmarks --help
+"""
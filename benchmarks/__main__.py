@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+基准命令行
+
+  python -m benchmarks run -o current.json              # 运行并保存结果
+  python -m benchmarks run --save-baseline main         # 保存为 benchmarks/baselines/main.json
+  python -m benchmarks compare base.json current.json   # 比较两份结果
+  python -m benchmarks check main                       # 运行并与基准比较，回归时返回非零
+"""
+
+import argparse
+import os
+import sys
+
+from benchmarks.runner import (
+    baseline_path, build_report, compare_reports, load_report, print_comparison, print_results, save_report
+)
+from benchmarks.suite import run_suite
+
+
+def _resolve_baseline(name_or_path):
+    """既可以传入 JSON 路径，也可以传入 baselines 目录中的基准名称"""
+    if os.path.exists(name_or_path):
+        return name_or_path
+    return baseline_path(name_or_path)
+
+
+def _run(args):
+    results = run_suite(seed=args.seed, quick=args.quick, name_filter=args.filter)
+    report = build_report(results, args.seed)
+    print()
+    print_results(report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='歌词清理核心的性能基准')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_run_options(sub):
+        sub.add_argument('--seed', type=int, default=0, help='语料随机种子')
+        sub.add_argument('--quick', action='store_true', help='缩小语料和计时时长')
+        sub.add_argument('-k', '--filter', type=str, help='只运行名称包含该字符串的项目')
+
+    run_parser = subparsers.add_parser('run', help='运行基准')
+    add_run_options(run_parser)
+    run_parser.add_argument('-o', '--output', type=str, help='结果 JSON 输出路径')
+    run_parser.add_argument('--save-baseline', type=str, metavar='NAME', help='保存为 benchmarks/baselines/NAME.json')
+
+    compare_parser = subparsers.add_parser('compare', help='比较两份结果')
+    compare_parser.add_argument('baseline', help='基准 JSON 路径或基准名称')
+    compare_parser.add_argument('current', help='当前结果 JSON 路径')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='允许的吞吐量下降比例（默认 0.15）')
+
+    check_parser = subparsers.add_parser('check', help='运行基准并与基准结果比较，回归时返回非零')
+    check_parser.add_argument('baseline', help='基准 JSON 路径或基准名称')
+    check_parser.add_argument('--threshold', type=float, default=0.15, help='允许的吞吐量下降比例（默认 0.15）')
+    check_parser.add_argument('-o', '--output', type=str, help='同时保存当前结果')
+    add_run_options(check_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = _run(args)
+        for path in filter(None, [args.output, args.save_baseline and baseline_path(args.save_baseline)]):
+            save_report(report, path)
+            print(f"💾 已保存: {path}")
+        return 0
+
+    if args.command == 'compare':
+        rows = compare_reports(load_report(_resolve_baseline(args.baseline)), load_report(args.current),
+                               args.threshold)
+        print_comparison(rows, args.threshold)
+        return 1 if any(row[4] for row in rows) else 0
+
+    baseline = load_report(_resolve_baseline(args.baseline))
+    report = _run(args)
+    if args.output:
+        save_report(report, args.output)
+    print()
+    rows = compare_reports(baseline, report, args.threshold)
+    print_comparison(rows, args.threshold)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+确定性的合成歌词语料
+同一个种子总是生成完全相同的语料，便于不同版本之间对比吞吐量
+"""
+
+import random
+
+CHINESE_WORDS = ['爱', '你', '我', '心', '梦', '风', '雨', '夜', '走', '远方', '回忆', '时光', '城市', '温柔', '告别']
+ENGLISH_WORDS = ['love', 'night', 'rain', 'baby', 'the', 'heart', 'dream', 'forever', 'light', 'home', 'stay']
+
+CHINESE_CREDITS = [
+    '作词：{name}', '作曲：{name}', '编曲：{name}', '制作人：{name}', '录音师：{name}', '混音：{name}',
+    '母带工程师：{name}', '和声：{name}', '出品：{name}唱片', '发行：{name}文化', '未经许可，不得翻唱或使用',
+    '詞：{name}', '編曲：{name}', 'OP：{name}', 'SP：{name}',
+]
+ENGLISH_CREDITS = [
+    'Lyrics by {name}', 'Composed by {name}', 'Produced by {name}', 'Mixed by {name}', 'Mastered by {name}',
+    'Vocals recorded by {name}', 'Background Vocal: {name}', '© {year} {name} Records', 'ISRC CN-A01-{year}-00001',
+]
+NAMES = ['张三', '李四', '王五', '陈某', 'Alex Chen', 'J. Smith', 'Studio 8']
+HEADER_TAGS = ['ti', 'ar', 'al', 'by', 'offset', 're', 've', 'length']
+
+
+def _timestamp(rnd, minute=None, second=None):
+    minute = rnd.randint(0, 5) if minute is None else minute
+    second = rnd.randint(0, 59) if second is None else second
+    style = rnd.random()
+    if style < 0.6:
+        return f'[{minute:02d}:{second:02d}.{rnd.randint(0, 99):02d}]'
+    if style < 0.9:
+        return f'[{minute:02d}:{second:02d}.{rnd.randint(0, 999):03d}]'
+    return f'[{minute:02d}:{second:02d}]'
+
+
+def _lyric_text(rnd):
+    words = CHINESE_WORDS if rnd.random() < 0.6 else ENGLISH_WORDS
+    joiner = '' if words is CHINESE_WORDS else ' '
+    return joiner.join(rnd.choice(words) for _ in range(rnd.randint(3, 9)))
+
+
+def generate_lyrics(rnd, lines=40):
+    """生成一首歌的歌词：头部标签、标题行、制作信息和正文"""
+    name = rnd.choice(NAMES)
+    out = []
+    bom = rnd.random() < 0.2
+    for tag in rnd.sample(HEADER_TAGS, rnd.randint(0, 4)):
+        out.append(f'[{tag}:{name}]')
+    if rnd.random() < 0.7:
+        out.append(f'{_timestamp(rnd, 0, 0)}{_lyric_text(rnd)} - {name}')
+
+    credits = CHINESE_CREDITS if rnd.random() < 0.6 else ENGLISH_CREDITS
+    for credit in rnd.sample(credits, rnd.randint(2, 6)):
+        out.append(_timestamp(rnd, 0, rnd.randint(0, 20)) + credit.format(name=name, year=rnd.randint(1990, 2024)))
+
+    for _ in range(lines):
+        kind = rnd.random()
+        if kind < 0.75:
+            out.append(_timestamp(rnd) + _lyric_text(rnd))
+        elif kind < 0.85:
+            # 多时间戳的重复段落
+            out.append(''.join(_timestamp(rnd) for _ in range(rnd.randint(2, 4))) + _lyric_text(rnd))
+        elif kind < 0.93:
+            out.append(_lyric_text(rnd))
+        else:
+            out.append('')
+
+    if bom:
+        out[0] = '\ufeff' + out[0]
+    return rnd.choice(['\n', '\r\n']).join(out)
+
+
+def generate_karaoke_lyrics(rnd, target_chars):
+    """生成逐字时间戳的超大歌词标签（含拼接的翻译）"""
+    out = []
+    size = 0
+    centiseconds = 0
+    while size < target_chars:
+        words = []
+        for _ in range(rnd.randint(4, 10)):
+            centiseconds += rnd.randint(10, 60)
+            words.append(f'<{centiseconds // 6000:02d}:{centiseconds // 100 % 60:02d}.{centiseconds % 100:02d}>'
+                         f'{rnd.choice(CHINESE_WORDS + ENGLISH_WORDS)}')
+        line = f'[{centiseconds // 6000:02d}:{centiseconds // 100 % 60:02d}.{centiseconds % 100:02d}]' + ''.join(words)
+        out.append(line)
+        out.append(f'[{centiseconds // 6000:02d}:{centiseconds // 100 % 60:02d}.{centiseconds % 100:02d}]'
+                   f'{_lyric_text(rnd)}')
+        size += len(line) + len(out[-1]) + 2
+    return '\n'.join(out)
+
+
+def generate_corpus(seed=0, songs=300, huge_tags=2, huge_chars=1024 * 1024):
+    """
+    生成歌词语料
+
+    Args:
+        seed (int): 随机种子
+        songs (int): 普通歌词的数量
+        huge_tags (int): 超大逐字歌词的数量
+        huge_chars (int): 每个超大歌词的字符数
+
+    Returns:
+        list: 歌词文本列表
+    """
+    rnd = random.Random(seed)
+    corpus = [generate_lyrics(rnd, rnd.randint(20, 60)) for _ in range(songs)]
+    corpus.extend(generate_karaoke_lyrics(rnd, huge_chars) for _ in range(huge_tags))
+    return corpus
+
+
+def generate_filenames(seed=0, count=5000):
+    """生成 is_audio_file 用的文件名（音频、封面、歌词、说明文件混合）"""
+    rnd = random.Random(seed)
+    extensions = ['.mp3', '.flac', '.m4a', '.MP3', '.FLAC', '.jpg', '.png', '.lrc', '.txt', '.cue', '.log', '']
+    return [
+        f'{rnd.randint(1, 20):02d} {_lyric_text(rnd)}{rnd.choice(extensions)}'
+        for _ in range(count)
+    ]
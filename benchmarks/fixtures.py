@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+基准测试用的最小音频文件
+只包含解析标签所需的结构，不依赖外部样本文件
+"""
+
+import os
+import struct
+
+from mutagen.flac import FLAC
+from mutagen.id3 import ID3, USLT
+from mutagen.mp4 import MP4
+
+
+def _atom(name, payload):
+    return struct.pack('>I', 8 + len(payload)) + name + payload
+
+
+def write_flac(path, lyrics, audio_bytes=64 * 1024):
+    """写入只有 STREAMINFO 和一段伪音频数据的 FLAC 文件"""
+    streaminfo = (
+        struct.pack('>HH', 4096, 4096) + b'\0\0\0\0\0\0'
+        + bytes([0x0A, 0xC4, 0x42, 0xF0]) + b'\0' * 4 + b'\0' * 16
+    )
+    with open(path, 'wb') as f:
+        f.write(b'fLaC' + bytes([0x80]) + struct.pack('>I', len(streaminfo))[1:] + streaminfo)
+        f.write(b'\xff\xf8' + os.urandom(audio_bytes))
+    audio = FLAC(path)
+    audio['lyrics'] = [lyrics]
+    audio.save()
+
+
+def write_mp3(path, lyrics, audio_bytes=64 * 1024):
+    """写入带 ID3v2 USLT 帧和一段伪 MPEG 数据的 MP3 文件"""
+    with open(path, 'wb') as f:
+        f.write(os.urandom(audio_bytes))
+    tags = ID3()
+    tags['USLT'] = USLT(encoding=3, lang='chi', desc='', text=lyrics)
+    tags.save(path)
+
+
+def write_m4a(path, lyrics, audio_bytes=64 * 1024):
+    """写入只有一条音频轨道声明和伪 mdat 数据的 M4A 文件"""
+    hdlr = _atom(b'hdlr', b'\0' * 8 + b'soun' + b'\0' * 13)
+    mdhd = _atom(b'mdhd', b'\0' * 12 + struct.pack('>II', 44100, 44100 * 60) + b'\0' * 4)
+    trak = _atom(b'trak', _atom(b'mdia', mdhd + hdlr))
+    with open(path, 'wb') as f:
+        f.write(_atom(b'ftyp', b'M4A \0\0\0\0M4A mp42isom'))
+        f.write(_atom(b'moov', trak))
+        f.write(_atom(b'mdat', os.urandom(audio_bytes)))
+    audio = MP4(path)
+    audio['©lyr'] = [lyrics]
+    audio.save()
+
+
+WRITERS = {
+    '.flac': write_flac,
+    '.mp3': write_mp3,
+    '.m4a': write_m4a,
+}
+
+
+def create_audio_files(directory, lyrics, audio_bytes=64 * 1024):
+    """
+    在 directory 下为每种支持的格式创建一个带歌词的文件
+
+    Returns:
+        dict: 扩展名 -> 文件路径
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for ext, writer in WRITERS.items():
+        path = os.path.join(directory, f'fixture{ext}')
+        writer(path, lyrics, audio_bytes)
+        paths[ext] = path
+    return paths
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+基准计时、结果保存与回归比较
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+RESULT_FORMAT_VERSION = 1
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def measure(batch, ops, nbytes, min_time=0.5, repeat=5):
+    """
+    反复执行 batch，取最快一轮的吞吐量
+
+    Args:
+        batch (callable): 执行一批操作的函数
+        ops (int): 每批的操作数
+        nbytes (int): 每批处理的字节数
+        min_time (float): 每轮至少运行的秒数
+        repeat (int): 轮数
+
+    Returns:
+        dict: ops_per_sec / bytes_per_sec 等结果
+    """
+    batch()  # 预热
+
+    best = None
+    for _ in range(repeat):
+        batches = 0
+        started = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time or batches == 0:
+            batch()
+            batches += 1
+            elapsed = time.perf_counter() - started
+        per_batch = elapsed / batches
+        if best is None or per_batch < best:
+            best = per_batch
+
+    return {
+        'ops': ops,
+        'bytes': nbytes,
+        'seconds_per_batch': best,
+        'ops_per_sec': ops / best if best else 0.0,
+        'bytes_per_sec': nbytes / best if best else 0.0,
+    }
+
+
+def build_report(results, seed):
+    """把各项结果组装成可保存的报告"""
+    return {
+        'version': RESULT_FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+def save_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get('version') != RESULT_FORMAT_VERSION:
+        raise ValueError(f"不支持的基准结果格式: {path}")
+    return report
+
+
+def baseline_path(name):
+    """基准名称对应的保存路径（benchmarks/baselines/<name>.json）"""
+    return os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def compare_reports(baseline, current, threshold=0.15):
+    """
+    比较两份报告的吞吐量
+
+    Args:
+        baseline (dict): 基准报告
+        current (dict): 当前报告
+        threshold (float): 允许的吞吐量下降比例，超过即视为回归
+
+    Returns:
+        list: 每项 (名称, 基准 ops/s, 当前 ops/s, 变化比例, 是否回归)；
+              只存在于一方的项目变化比例为 None
+    """
+    rows = []
+    base_results = baseline['results']
+    current_results = current['results']
+    for name in sorted(set(base_results) | set(current_results)):
+        base = base_results.get(name)
+        cur = current_results.get(name)
+        if base is None or cur is None:
+            rows.append((name, base and base['ops_per_sec'], cur and cur['ops_per_sec'], None, False))
+            continue
+        change = (cur['ops_per_sec'] - base['ops_per_sec']) / base['ops_per_sec'] if base['ops_per_sec'] else 0.0
+        rows.append((name, base['ops_per_sec'], cur['ops_per_sec'], change, change < -threshold))
+    return rows
+
+
+def print_results(report):
+    print(f"{'项目':<30} {'ops/s':>14} {'MB/s':>10}")
+    print("-" * 58)
+    for name, result in sorted(report['results'].items()):
+        print(f"{name:<32} {result['ops_per_sec']:>14,.1f} {result['bytes_per_sec'] / 1e6:>10.2f}")
+
+
+def print_comparison(rows, threshold):
+    print(f"{'项目':<30} {'基准 ops/s':>12} {'当前 ops/s':>12} {'变化':>7}")
+    print("-" * 72)
+    for name, base, cur, change, regressed in rows:
+        base_text = f"{base:,.1f}" if base is not None else "-"
+        cur_text = f"{cur:,.1f}" if cur is not None else "-"
+        change_text = f"{change:+.1%}" if change is not None else "新增/移除"
+        mark = "  ❌ 回归" if regressed else ""
+        print(f"{name:<32} {base_text:>14} {cur_text:>14} {change_text:>9}{mark}")
+    regressions = [row for row in rows if row[4]]
+    print("-" * 72)
+    if regressions:
+        print(f"❌ {len(regressions)} 项吞吐量下降超过 {threshold:.0%}")
+    else:
+        print(f"✅ 没有超过 {threshold:.0%} 的吞吐量下降")
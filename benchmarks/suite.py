@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+基准项目：clean_lyrics、is_audio_file 和 lyrics_utils 中的标签读写函数
+"""
+
+import os
+import shutil
+import tempfile
+
+from lyrics_probe import probe_lyrics
+from lyrics_utils import LyricsProcessor
+
+from benchmarks.corpus import generate_corpus, generate_filenames, generate_lyrics
+from benchmarks.fixtures import create_audio_files
+from benchmarks.runner import measure
+
+
+def _text_bytes(texts):
+    return sum(len(text.encode('utf-8')) for text in texts)
+
+
+def _clean_cases(processor, seed, quick):
+    songs = generate_corpus(seed, songs=100 if quick else 300, huge_tags=0)
+    huge = generate_corpus(seed, songs=0, huge_tags=1 if quick else 2,
+                           huge_chars=256 * 1024 if quick else 1024 * 1024)
+    clean = processor.clean_lyrics
+    iter_clean = processor.iter_clean_lyrics
+
+    def clean_songs():
+        for text in songs:
+            clean(text)
+
+    def clean_huge():
+        for text in huge:
+            clean(text)
+
+    def stream_huge():
+        for text in huge:
+            for _ in iter_clean(text):
+                pass
+
+    yield 'clean_lyrics', clean_songs, len(songs), _text_bytes(songs)
+    yield 'clean_lyrics.huge', clean_huge, len(huge), _text_bytes(huge)
+    yield 'iter_clean_lyrics.huge', stream_huge, len(huge), _text_bytes(huge)
+
+
+def _filename_cases(processor, seed, quick):
+    filenames = generate_filenames(seed, 1000 if quick else 5000)
+    is_audio_file = processor.is_audio_file
+
+    def check_names():
+        for filename in filenames:
+            is_audio_file(filename)
+
+    yield 'is_audio_file', check_names, len(filenames), _text_bytes(filenames)
+
+
+def _tag_cases(processor, seed, directory):
+    import random
+    lyrics = generate_lyrics(random.Random(seed), 60)
+    paths = create_audio_files(directory, lyrics)
+
+    for ext, path in sorted(paths.items()):
+        size = os.path.getsize(path)
+
+        def read(path=path):
+            processor.get_lyrics_from_file(path)
+
+        def write(path=path):
+            processor.save_lyrics_to_file(path, lyrics)
+
+        def probe(path=path):
+            probe_lyrics(path)
+
+        yield f'probe_lyrics{ext}', probe, 1, size
+        yield f'get_lyrics_from_file{ext}', read, 1, size
+        yield f'save_lyrics_to_file{ext}', write, 1, size
+
+
+def run_suite(seed=0, quick=False, name_filter=None, progress=print):
+    """
+    运行全部基准项目
+
+    Args:
+        seed (int): 语料随机种子
+        quick (bool): 缩小语料和计时时长，用于快速检查
+        name_filter (str): 只运行名称包含该字符串的项目
+        progress (callable): 输出进度的函数
+
+    Returns:
+        dict: 项目名称 -> 测量结果
+    """
+    processor = LyricsProcessor()
+    min_time = 0.2 if quick else 0.5
+    repeat = 3 if quick else 5
+    results = {}
+
+    directory = tempfile.mkdtemp(prefix='mmc-bench-')
+    try:
+        cases = []
+        cases.extend(_clean_cases(processor, seed, quick))
+        cases.extend(_filename_cases(processor, seed, quick))
+        cases.extend(_tag_cases(processor, seed, directory))
+
+        for name, batch, ops, nbytes in cases:
+            if name_filter and name_filter not in name:
+                continue
+            progress(f"⏱️  {name} ...")
+            results[name] = measure(batch, ops, nbytes, min_time=min_time, repeat=repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return results
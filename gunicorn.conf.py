@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+生产环境的 Web 服务配置（gunicorn）
+启动: gunicorn --config gunicorn.conf.py    或    python serve.py
+
+并发模型:
+- master 进程预先导入歌词处理器和 mutagen，之后 fork 出多个工作进程，这部分内存写时复制共享
+- app 在每个工作进程中各自导入：数据库连接、后台任务线程都属于该进程，不跨 fork 共享
+- 每个工作进程用一组线程处理请求（上传、下载、SSE 长连接各占一个线程），另有后台任务线程读取和清理歌词
+- 进程之间通过 SQLite（WAL 模式）共享状态：会话中的文件名映射、上传库、任务状态和事件，
+  以及设置后的磁盘缓存（MUSIC_CLEANER_CACHE_FILE）和增量清单（MUSIC_CLEANER_MANIFEST）；
+  写入在内存中积累后批量提交，每个请求和后台任务结束时也会提交，写锁只被短暂占用
+
+平滑重启（kill -HUP master）或停止（SIGTERM）时，旧的工作进程不再接受新连接，
+等待进行中的请求和后台任务在 MUSIC_CLEANER_DRAIN_TIMEOUT 秒内完成，超时后取消剩下的任务。
+"""
+
+import gc
+import os
+import signal
+import sys
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
+
+# 在 fork 之前导入，工作进程直接使用（写时复制）
+import mutagen.flac  # noqa: E402,F401
+import mutagen.id3  # noqa: E402,F401
+import mutagen.mp3  # noqa: E402,F401
+import mutagen.mp4  # noqa: E402,F401
+import lyrics_utils  # noqa: E402
+
+# 构建关键词匹配器和规则版本
+lyrics_utils.lyrics_processor.ruleset_version
+
+# 任务状态写入共享的数据库，任何工作进程都能查询、订阅和取消任务
+os.environ.setdefault(
+    'MUSIC_CLEANER_JOB_DB',
+    os.path.join(_here, os.getenv('MUSIC_CLEANER_UPLOAD_STORE', '').strip() or 'upload_store', 'jobs.db'))
+
+chdir = _here
+wsgi_app = 'app:app'
+bind = os.getenv('MUSIC_CLEANER_BIND', '').strip() or '0.0.0.0:5000'
+
+workers = max(1, int(os.getenv('MUSIC_CLEANER_WEB_WORKERS', '') or max(2, os.cpu_count() or 1)))
+worker_class = 'gthread'
+threads = max(1, int(os.getenv('MUSIC_CLEANER_WEB_THREADS', '8') or 8))
+
+# 停止或重启时等待进行中的请求和后台任务的时间（秒）
+graceful_timeout = max(1, int(os.getenv('MUSIC_CLEANER_DRAIN_TIMEOUT', '60') or 60))
+# 退出过程中工作进程不再发送心跳，超时必须大于等待时间，否则会被提前结束
+timeout = graceful_timeout + 30
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # 预先导入的对象不再被垃圾回收扫描，避免工作进程中共享的内存页被改写
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """收到 SIGTERM 时记录等待后台任务的截止时间（master 在 graceful_timeout 后强制结束工作进程）"""
+    handle_exit = worker.handle_exit
+
+    def handle_exit_with_deadline(sig, frame):
+        worker.drain_deadline = time.monotonic() + graceful_timeout - 1
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit_with_deadline)
+
+
+def worker_exit(server, worker):
+    """工作进程退出前等待后台任务完成；快速退出（SIGINT / SIGQUIT）时直接取消"""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+    deadline = getattr(worker, 'drain_deadline', None)
+    remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else 0.0
+    pending = sum(1 for job in app_module.job_queue.jobs() if not job.finished)
+    if pending:
+        worker.log.info("等待 %d 个后台任务完成（最多 %.0f 秒）", pending, remaining)
+    if not app_module.job_queue.drain(remaining):
+        worker.log.warning("后台任务未在等待时间内完成，已取消")
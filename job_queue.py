@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+后台任务队列
+Web 界面把上传后的歌词读取和处理放到后台线程池中执行：提交后立即返回任务 ID，
+客户端轮询任务状态，或订阅 Server-Sent Events 逐个接收已完成文件的结果；任务可以中途取消。
+多进程部署时任务状态和事件同时写入 JobStore，任何一个工作进程都能查询、订阅和取消任务。
+"""
+
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# 事件类型
+EVENT_FILE = 'file'  # 一个文件处理完成
+EVENT_DONE = 'done'  # 任务结束（最后一个事件）
+
+
+# 运行中的任务检查其他进程发来的取消请求的最短间隔（秒）
+CANCEL_POLL_SECONDS = 0.5
+
+
+class JobQueueFull(Exception):
+    """排队的任务已达上限，或任务队列正在关闭"""
+
+
+class JobStore:
+    """
+    多个工作进程共享的任务状态（SQLite，WAL 模式）
+
+    任务所在的进程写入状态快照和事件；其他进程据此返回任务状态、回放事件，
+    并通过 cancel 标记把取消请求转交给任务所在的进程。
+
+    Args:
+        path (str): 数据库文件路径，所在目录不存在时自动创建
+        keep_seconds (float): 已结束的任务保留多久（秒）
+    """
+
+    def __init__(self, path, keep_seconds=24 * 3600):
+        self.path = path
+        self.keep_seconds = keep_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, finished INTEGER NOT NULL DEFAULT 0, '
+            'cancel INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS job_events ('
+            'job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL, '
+            'PRIMARY KEY (job_id, seq))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)')
+        self._db.commit()
+
+    def _write_snapshot(self, job):
+        self._db.execute(
+            'INSERT INTO jobs (id, snapshot, finished, updated) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET snapshot = excluded.snapshot, finished = excluded.finished, '
+            'updated = excluded.updated',
+            (job.id, json.dumps(job.snapshot(include_result=True), ensure_ascii=False), int(job.finished), time.time())
+        )
+
+    def add(self, job):
+        """记录新提交的任务，并删除过期的已结束任务"""
+        expired_before = time.time() - self.keep_seconds
+        with self._lock:
+            self._db.execute('DELETE FROM job_events WHERE job_id IN '
+                             '(SELECT id FROM jobs WHERE finished = 1 AND updated < ?)', (expired_before,))
+            self._db.execute('DELETE FROM jobs WHERE finished = 1 AND updated < ?', (expired_before,))
+            self._write_snapshot(job)
+            self._db.commit()
+
+    def update(self, job, seq=None, event=None, data=None):
+        """更新任务的状态快照；给出 seq 时同时记录该序号的事件"""
+        with self._lock:
+            if seq is not None:
+                self._db.execute('INSERT OR REPLACE INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)',
+                                 (job.id, seq, event, json.dumps(data, ensure_ascii=False)))
+            self._write_snapshot(job)
+            self._db.commit()
+
+    def snapshot(self, job_id):
+        """任务状态（含 cancel_requested），不存在时返回 None"""
+        with self._lock:
+            row = self._db.execute('SELECT snapshot, cancel FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        state = json.loads(row[0])
+        state['cancel_requested'] = state['cancel_requested'] or bool(row[1])
+        return state
+
+    def snapshots(self, limit=100):
+        """最近提交的任务状态（不含结果），按提交顺序"""
+        with self._lock:
+            rows = self._db.execute('SELECT snapshot FROM jobs ORDER BY updated DESC LIMIT ?', (limit,)).fetchall()
+        states = [json.loads(row[0]) for row in rows]
+        for state in states:
+            state.pop('result', None)
+        return sorted(states, key=lambda state: state['created_at'])
+
+    def events(self, job_id, cursor):
+        """序号 cursor 之后的事件 [(类型, 数据)]"""
+        with self._lock:
+            rows = self._db.execute('SELECT event, data FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq',
+                                    (job_id, cursor)).fetchall()
+        return [(event, json.loads(data)) for event, data in rows]
+
+    def request_cancel(self, job_id):
+        """
+        标记任务需要取消（由任务所在的进程执行）
+
+        Returns:
+            bool: 任务是否存在
+        """
+        with self._lock:
+            updated = self._db.execute('UPDATE jobs SET cancel = 1 WHERE id = ?', (job_id,)).rowcount
+            self._db.commit()
+        return updated > 0
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._db.execute('SELECT cancel FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class Job:
+    """
+    后台任务
+
+    任务函数的签名为 func(job, *args)，返回结果字典；每处理完一个文件调用 job.emit(EVENT_FILE, 数据)，
+    并在文件之间检查 job.cancelled，取消后尽快返回已完成部分的结果。
+
+    Args:
+        kind (str): 任务类型，如 'upload' / 'process' / 'process_path'
+        total (int): 文件总数，未知时为 None
+        keep_events (bool): 是否保存事件供轮询和 SSE 回放（在请求中同步执行时不需要）
+        store (JobStore): 多进程共享的任务状态，为 None 时只保存在当前进程中
+    """
+
+    def __init__(self, kind, total=None, keep_events=True, store=None):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.status = JOB_QUEUED
+        self.total = total
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.keep_events = keep_events
+        self.store = store
+        self._cancel = threading.Event()
+        self._condition = threading.Condition()
+        self._cancel_checked = 0.0
+
+    @property
+    def cancelled(self):
+        if not self._cancel.is_set() and self.store is not None and not self.finished:
+            # 取消请求可能由其他进程写入共享的任务状态
+            now = time.monotonic()
+            if now - self._cancel_checked >= CANCEL_POLL_SECONDS:
+                self._cancel_checked = now
+                if self.store.cancel_requested(self.id):
+                    self._cancel.set()
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def cancel(self):
+        """请求取消：排队中的任务不会开始，运行中的任务在处理完当前文件后停止"""
+        self._cancel.set()
+
+    def emit(self, event, data):
+        """记录一个事件并唤醒等待中的订阅者"""
+        with self._condition:
+            if event == EVENT_FILE:
+                self.done += 1
+            if self.keep_events:
+                self.events.append((event, data))
+                if self.store is not None:
+                    self.store.update(self, len(self.events) - 1, event, data)
+            self._condition.notify_all()
+
+    def run(self, func, *args):
+        """在当前线程中执行任务函数，记录结果或错误，最后发出 EVENT_DONE"""
+        if self.cancelled:
+            self.status = JOB_CANCELLED
+        else:
+            self.status = JOB_RUNNING
+            self.started_at = time.time()
+            if self.store is not None:
+                self.store.update(self)
+            try:
+                self.result = func(self, *args)
+                self.status = JOB_CANCELLED if self.cancelled else JOB_SUCCEEDED
+            except Exception as e:
+                self.error = str(e)
+                self.status = JOB_FAILED
+        self.finished_at = time.time()
+        self.emit(EVENT_DONE, self.snapshot(include_result=True))
+
+    def wait_events(self, cursor, timeout=None):
+        """
+        等待序号 cursor 之后的事件
+
+        Returns:
+            list: 新事件 [(类型, 数据)]；超时时为空列表。任务已结束且没有更多事件时返回 None
+        """
+        with self._condition:
+            if len(self.events) <= cursor and not self.finished:
+                self._condition.wait(timeout)
+            if len(self.events) <= cursor and self.finished:
+                return None
+            return self.events[cursor:]
+
+    def wait(self, timeout=None):
+        """等待任务结束，返回是否已结束"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.finished, timeout)
+
+    def snapshot(self, include_result=False):
+        """返回任务状态（可序列化为 JSON）"""
+        state = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'total': self.total,
+            'done': self.done,
+            'cancel_requested': self._cancel.is_set(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.error is not None:
+            state['error'] = self.error
+        if include_result and self.finished:
+            state['result'] = self.result
+        return state
+
+
+class JobQueue:
+    """
+    有界的后台任务队列
+
+    工作线程在第一次提交任务时才启动，并且是守护线程：进程退出时 shutdown() 先取消所有任务，
+    再等待运行中的任务处理完当前文件。
+
+    Args:
+        workers (int): 同时运行的任务数
+        max_pending (int): 最多排队（尚未开始）的任务数，超过时 submit 抛出 JobQueueFull
+        keep_finished (int): 保留多少个已结束的任务供查询，更早的任务会被丢弃
+        store (JobStore): 多进程共享的任务状态（可选）
+    """
+
+    def __init__(self, workers=2, max_pending=32, keep_finished=100, store=None):
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.keep_finished = max(1, keep_finished)
+        self.store = store
+        self._pending = queue.Queue()
+        self._threads = []
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start_workers(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'lyrics-job-{index + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            job, func, args = item
+            job.run(func, *args)
+
+    def submit(self, kind, func, *args, total=None):
+        """
+        提交任务
+
+        Returns:
+            Job: 已排队的任务
+        """
+        with self._lock:
+            if self._closed:
+                raise JobQueueFull("服务正在重启，暂不接受新任务")
+            queued = sum(1 for job in self._jobs.values() if job.status == JOB_QUEUED)
+            if queued >= self.max_pending:
+                raise JobQueueFull(f"排队的任务已达上限 ({self.max_pending})")
+            if not self._threads:
+                self._start_workers()
+            job = Job(kind, total, store=self.store)
+            if self.store is not None:
+                self.store.add(job)
+            self._jobs[job.id] = job
+            self._evict()
+            self._pending.put((job, func, args))
+        return job
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """全部任务，按提交顺序"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        取消任务
+
+        Returns:
+            Job: 任务；不存在时返回 None
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def drain(self, timeout=None):
+        """
+        不再接受新任务，等待排队和运行中的任务完成，超时后取消剩下的任务（用于平滑重启）
+
+        Returns:
+            bool: 是否所有任务都已完成
+        """
+        with self._lock:
+            self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in self.jobs():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            job.wait(remaining)
+        drained = all(job.finished for job in self.jobs())
+        self.shutdown(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return drained
+
+    def shutdown(self, timeout=None):
+        """取消所有任务，等待工作线程退出（运行中的任务会先处理完当前文件）"""
+        for job in self.jobs():
+            job.cancel()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._pending.put(None)
+        for thread in threads:
+            thread.join(timeout)
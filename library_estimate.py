@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+音乐库抽样估计
+完整扫描一次目录（只列目录，不解析标签），按「文件夹 × 格式」分层随机抽样，
+只对样本读取和清理歌词（不写回），估计整个库中有歌词的文件数、需要清理的文件数、
+移除行数和处理耗时，并给出置信区间。
+"""
+
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from collections import Counter
+
+from library_scanner import LibraryScanner
+from lyrics_probe import probe_lyrics
+
+# 95% 置信区间对应的正态分位数
+Z_95 = 1.959964
+
+# 每个分层至少抽取的样本数（至少 2 个才能估计层内方差）
+MIN_STRATUM_SAMPLE = 2
+
+# 合并小分层后得到的分层键
+POOLED_STRATUM = ('*', '*')
+
+
+class StratumSample:
+    """一个分层（文件夹 × 格式）的总体数量和样本"""
+
+    __slots__ = ('population', 'reservoir', 'results')
+
+    def __init__(self):
+        self.population = 0
+        self.reservoir = []
+        self.results = []
+
+
+def _stratum_key(file_path, root, ext, depth):
+    """分层键：相对 root 的前 depth 级文件夹 + 扩展名"""
+    relative_dir = os.path.relpath(os.path.dirname(file_path), root)
+    if relative_dir == os.curdir:
+        return os.curdir, ext
+    parts = relative_dir.split(os.sep)
+    return os.sep.join(parts[:depth]), ext
+
+
+def _pool_small_strata(strata, sample_size, rng):
+    """
+    把按比例分不到 MIN_STRATUM_SAMPLE 个样本的小分层合并成一个分层，
+    分层数不超过 sample_size // MIN_STRATUM_SAMPLE，避免每层保底的样本数远超目标样本数
+
+    合并后的候选是从各小分层的总体中不放回随机抽取的（先按总体位置抽取，再从对应分层的候选中取），
+    仍是合并总体的简单随机样本。
+
+    Returns:
+        dict: 合并后的分层
+    """
+    total = sum(stratum.population for stratum in strata.values())
+    limit = max(1, sample_size // MIN_STRATUM_SAMPLE)
+    ordered = sorted(strata.items(), key=lambda item: item[1].population, reverse=True)
+    kept = [(key, stratum) for key, stratum in ordered
+            if sample_size * stratum.population / total >= MIN_STRATUM_SAMPLE][:limit]
+    small = [stratum for key, stratum in ordered[len(kept):]]
+    if small and len(kept) == limit:
+        # 给合并的分层留出位置
+        small.insert(0, kept.pop()[1])
+    if len(small) < 2:
+        return strata
+
+    pooled = StratumSample()
+    pooled.population = sum(stratum.population for stratum in small)
+    offsets = list(itertools.accumulate(stratum.population for stratum in small))
+    draws = min(pooled.population, sample_size)
+    counts = Counter(bisect.bisect_right(offsets, position)
+                     for position in rng.sample(range(pooled.population), draws))
+    for index, count in counts.items():
+        pooled.reservoir.extend(rng.sample(small[index].reservoir, count))
+
+    merged = dict(kept)
+    merged[POOLED_STRATUM] = pooled
+    return merged
+
+
+def _allocate(strata, sample_size):
+    """
+    按总体数量比例分配样本数（最大余数法，总数等于 sample_size），
+    每层至少 MIN_STRATUM_SAMPLE 个、不超过该层的文件数
+    """
+    total = sum(stratum.population for stratum in strata.values())
+    shares = {key: sample_size * stratum.population / total for key, stratum in strata.items()}
+    allocation = {key: int(share) for key, share in shares.items()}
+    remainder = sample_size - sum(allocation.values())
+    for key in sorted(shares, key=lambda key: shares[key] - allocation[key], reverse=True)[:remainder]:
+        allocation[key] += 1
+    for key, stratum in strata.items():
+        allocation[key] = min(stratum.population, max(MIN_STRATUM_SAMPLE, allocation[key]))
+    return allocation
+
+
+def measure_file(processor, file_path):
+    """
+    读取并清理一个文件的歌词（不写回），记录结果和耗时
+
+    Returns:
+        dict: failed / has_lyrics / removed（移除行数）/ seconds
+    """
+    started = time.perf_counter()
+    result = {'failed': False, 'has_lyrics': False, 'removed': 0}
+    probe_result = probe_lyrics(file_path)
+    if not probe_result.valid:
+        result['failed'] = True
+    elif probe_result.has_lyrics is not False:
+        try:
+            lyrics = processor.open_audio_file(file_path).read_lyrics()
+        except Exception:
+            lyrics = ""
+        if lyrics:
+            result['has_lyrics'] = True
+            _, removed_lines = processor.clean_lyrics(lyrics)
+            result['removed'] = len(removed_lines)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _stratified_estimate(strata, value):
+    """
+    分层估计总体均值及其标准误（含有限总体校正）
+
+    只抽到 1 个样本（且没有抽完）的分层无法估计层内方差，这些分层两两合并，
+    按合并分层法（collapsed strata）用层间差异估计方差；只有一个这样的分层时，
+    借用其他分层合并的层内方差
+
+    Args:
+        strata (iterable): 已抽样的分层
+        value (callable): 从单个样本结果中取值
+
+    Returns:
+        tuple: (均值, 标准误)
+    """
+    total = sum(stratum.population for stratum in strata)
+    mean = 0.0
+    variance = 0.0
+    # 层内方差的合并估计：(离差平方和, 自由度)
+    pooled_squares, pooled_freedom = 0.0, 0
+    # 只有 1 个样本的分层：(权重, 样本值)
+    singles = []
+    for stratum in strata:
+        values = [value(result) for result in stratum.results]
+        sampled = len(values)
+        if not sampled:
+            continue
+        weight = stratum.population / total
+        stratum_mean = sum(values) / sampled
+        mean += weight * stratum_mean
+        if sampled > 1:
+            squares = sum((v - stratum_mean) ** 2 for v in values)
+            pooled_squares += squares
+            pooled_freedom += sampled - 1
+            fpc = 1 - sampled / stratum.population
+            variance += weight ** 2 * squares / (sampled - 1) / sampled * fpc
+        elif stratum.population > 1:
+            singles.append((weight, stratum_mean))
+
+    if len(singles) == 1 and pooled_freedom:
+        weight, _ = singles[0]
+        variance += weight ** 2 * pooled_squares / pooled_freedom
+    elif len(singles) > 1:
+        # 两两成组，数量为奇数时最后一组 3 个
+        groups = [singles[i:i + 2] for i in range(0, len(singles) - len(singles) % 2, 2)]
+        if len(singles) % 2:
+            groups[-1].append(singles[-1])
+        for group in groups:
+            group_weight = sum(weight for weight, _ in group)
+            group_total = sum(weight * stratum_mean for weight, stratum_mean in group)
+            deviations = sum((weight * stratum_mean - weight / group_weight * group_total) ** 2
+                             for weight, stratum_mean in group)
+            variance += len(group) / (len(group) - 1) * deviations
+    return mean, math.sqrt(variance)
+
+
+def estimate_library(processor, root, sample_size=400, extensions=None, depth=1, jobs=1,
+                     scan_threads=1, seed=None):
+    """
+    抽样估计处理整个文件夹的工作量
+
+    Args:
+        processor (LyricsProcessor): 歌词处理器
+        root (str): 文件夹路径
+        sample_size (int): 目标样本数（小分层会合并，每个分层至少抽 2 个，实际样本数最多多出几个）
+        extensions (iterable): 只统计这些扩展名，默认为处理器支持的全部格式
+        depth (int): 按前几级子文件夹分层
+        jobs (int): 预计处理时使用的进程数，用于估算总耗时
+        scan_threads (int): 扫描目录的线程数
+        seed (int): 随机种子，指定后结果可复现
+
+    Returns:
+        dict: files / sampled / strata / scan_seconds / sample_seconds，以及
+              has_lyrics、needs_cleaning、removed_lines、seconds_per_file、projected_seconds
+              的估计（estimate / low / high，区间为 95% 置信区间）
+    """
+    rng = random.Random(seed)
+    scanner = LibraryScanner(extensions or processor.supported_formats, threads=scan_threads)
+    strata = {}
+
+    # 扫描时按分层做蓄水池抽样，每层最多保留 sample_size 个候选，内存不随文件数增长
+    scan_started = time.perf_counter()
+    for scanned in scanner.scan(root):
+        key = _stratum_key(scanned.path, root, scanned.ext, depth)
+        stratum = strata.get(key)
+        if stratum is None:
+            stratum = strata[key] = StratumSample()
+        stratum.population += 1
+        if len(stratum.reservoir) < sample_size:
+            stratum.reservoir.append(scanned.path)
+        else:
+            index = rng.randrange(stratum.population)
+            if index < sample_size:
+                stratum.reservoir[index] = scanned.path
+    scan_seconds = time.perf_counter() - scan_started
+
+    if strata:
+        strata = _pool_small_strata(strata, sample_size, rng)
+
+    sample_started = time.perf_counter()
+    for key, count in _allocate(strata, sample_size).items():
+        stratum = strata[key]
+        for file_path in rng.sample(stratum.reservoir, min(count, len(stratum.reservoir))):
+            stratum.results.append(measure_file(processor, file_path))
+        stratum.reservoir = []
+    sample_seconds = time.perf_counter() - sample_started
+
+    files = sum(stratum.population for stratum in strata.values())
+    sampled = sum(len(stratum.results) for stratum in strata.values())
+
+    def interval(mean, standard_error, scale=1.0):
+        half_width = Z_95 * standard_error
+        return {
+            'estimate': mean * scale,
+            'low': max(0.0, mean - half_width) * scale,
+            'high': (mean + half_width) * scale,
+        }
+
+    report = {
+        'files': files,
+        'sampled': sampled,
+        'strata': len(strata),
+        'scan_seconds': scan_seconds,
+        'sample_seconds': sample_seconds,
+        'jobs': jobs,
+    }
+    if not sampled:
+        return report
+
+    sampled_strata = list(strata.values())
+    report['has_lyrics'] = interval(*_stratified_estimate(sampled_strata, lambda r: r['has_lyrics']), files)
+    report['needs_cleaning'] = interval(*_stratified_estimate(sampled_strata, lambda r: r['removed'] > 0), files)
+    report['failed'] = interval(*_stratified_estimate(sampled_strata, lambda r: r['failed']), files)
+    report['removed_lines'] = interval(*_stratified_estimate(sampled_strata, lambda r: r['removed']), files)
+    latency = _stratified_estimate(sampled_strata, lambda r: r['seconds'])
+    report['seconds_per_file'] = interval(*latency)
+    # 处理时间按读取 + 清理的实测耗时估算（不含写回），除以进程数，再加上扫描时间
+    projected = interval(*latency, files / max(1, jobs))
+    for bound in ('estimate', 'low', 'high'):
+        projected[bound] += scan_seconds
+    report['projected_seconds'] = projected
+    return report
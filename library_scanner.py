@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+音乐库扫描
+基于 os.scandir 遍历目录：扩展名过滤在遍历时完成，复用 DirEntry 自带的类型和 inode 信息，
+按 (设备号, inode) 去掉硬链接和符号链接造成的重复，并可以用多个线程并发列出兄弟目录，
+在高延迟的网络挂载上缩短扫描时间。找到文件后立即产出，处理可以与扫描同时进行。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from run_profile import thread_initializer
+
+
+class ScannedFile:
+    """
+    扫描到的文件
+
+    Attributes:
+        path (str): 文件路径
+        ext (str): 小写扩展名（如 '.flac'）
+    """
+
+    __slots__ = ('path', 'ext', '_entry')
+
+    def __init__(self, path, ext, entry):
+        self.path = path
+        self.ext = ext
+        self._entry = entry
+
+    def stat(self):
+        """文件的 stat 结果（由 DirEntry 缓存，多次调用不会重复访问磁盘）"""
+        return self._entry.stat()
+
+    def __repr__(self):
+        return f"ScannedFile({self.path!r})"
+
+
+def _file_ext(name):
+    """与 os.path.splitext 相同的扩展名规则（以点开头的文件名没有扩展名），返回小写形式"""
+    index = name.rfind('.')
+    if index <= 0 or name[:index].strip('.') == '':
+        return ''
+    return name[index:].lower()
+
+
+class LibraryScanner:
+    """
+    目录扫描器
+
+    Args:
+        extensions (iterable): 只产出这些扩展名的文件（小写，带点）；为 None 时产出所有文件
+        threads (int): 并发列出目录的线程数，为 1 时在当前线程中逐个列出
+        follow_symlinks (bool): 是否进入指向目录的符号链接（已访问过的目录不会重复进入）
+
+    扫描完成后可以读取统计：dirs / files（遇到的文件总数）/ matched / duplicates /
+    extension_counts（扩展名 -> 文件数）/ errors（无法列出的目录）
+    """
+
+    def __init__(self, extensions=None, threads=1, follow_symlinks=False):
+        self.extensions = frozenset(extensions) if extensions is not None else None
+        self.threads = max(1, threads)
+        self.follow_symlinks = follow_symlinks
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.dirs = 0
+        self.files = 0
+        self.matched = 0
+        self.duplicates = 0
+        self.extension_counts = {}
+        self.errors = []
+
+    @staticmethod
+    def _list_dir(path):
+        """列出目录，返回 (DirEntry 列表, 错误信息)"""
+        try:
+            with os.scandir(path) as it:
+                return list(it), None
+        except OSError as e:
+            return [], str(e)
+
+    def scan(self, root):
+        """
+        扫描文件夹，按与 os.walk 相同的顺序（先当前目录的文件，再依次进入子目录）产出文件
+
+        线程数大于 1 时，进入一个目录就会提交它所有子目录的列出任务，
+        同时在途的任务数量受当前路径上的兄弟目录数限制。
+
+        Args:
+            root (str): 文件夹路径
+
+        Yields:
+            ScannedFile: 扩展名匹配的文件
+        """
+        try:
+            root_stat = os.stat(root)
+        except OSError as e:
+            self.errors.append(f"{root}: {e}")
+            return
+
+        executor = None
+        if self.threads > 1:
+            executor = ThreadPoolExecutor(max_workers=self.threads, initializer=thread_initializer())
+        try:
+            yield from self._scan(root, root_stat, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scan(self, root, root_stat, executor):
+        extensions = self.extensions
+        extension_counts = self.extension_counts
+        follow_symlinks = self.follow_symlinks
+        list_dir = self._list_dir
+        seen_files = set()
+        seen_dirs = {(root_stat.st_dev, root_stat.st_ino)}
+
+        def submit(path):
+            if executor is None:
+                return path
+            return executor.submit(list_dir, path)
+
+        # 栈中每一项为 (目录路径, 设备号, 列出任务)，按深度优先顺序处理
+        stack = [(root, root_stat.st_dev, submit(root))]
+        while stack:
+            dir_path, dev, listing = stack.pop()
+            entries, error = list_dir(listing) if executor is None else listing.result()
+            if error is not None:
+                self.errors.append(f"{dir_path}: {error}")
+                continue
+            self.dirs += 1
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subdirs.append(entry)
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                self.files += 1
+                ext = _file_ext(entry.name)
+                extension_counts[ext] = extension_counts.get(ext, 0) + 1
+                if extensions is not None and ext not in extensions:
+                    continue
+
+                # 普通文件的设备号与所在目录相同，inode 来自目录项本身，不需要额外的 stat；
+                # 符号链接按目标文件去重
+                try:
+                    if entry.is_symlink():
+                        st = entry.stat()
+                        key = (st.st_dev, st.st_ino)
+                    else:
+                        key = (dev, entry.inode())
+                except OSError:
+                    continue
+                if key in seen_files:
+                    self.duplicates += 1
+                    continue
+                seen_files.add(key)
+                self.matched += 1
+                yield ScannedFile(entry.path, ext, entry)
+
+            # 子目录：记录 (设备号, inode) 防止符号链接循环，并提前提交列出任务
+            children = []
+            for entry in subdirs:
+                try:
+                    st = entry.stat(follow_symlinks=follow_symlinks)
+                except OSError as e:
+                    self.errors.append(f"{entry.path}: {e}")
+                    continue
+                key = (st.st_dev, st.st_ino)
+                if key in seen_dirs:
+                    self.duplicates += 1
+                    continue
+                seen_dirs.add(key)
+                children.append((entry.path, st.st_dev, submit(entry.path)))
+            # 倒序压栈，出栈顺序与 os.walk 一致
+            stack.extend(reversed(children))
+
+
+def scan_library(root, extensions=None, threads=1, follow_symlinks=False):
+    """
+    扫描文件夹的便捷函数，产出扩展名匹配的文件路径
+
+    Args:
+        root (str): 文件夹路径
+        extensions (iterable): 只产出这些扩展名的文件
+        threads (int): 并发列出目录的线程数
+        follow_symlinks (bool): 是否进入指向目录的符号链接
+
+    Yields:
+        str: 文件路径
+    """
+    scanner = LibraryScanner(extensions, threads, follow_symlinks)
+    for scanned in scanner.scan(root):
+        yield scanned.path
@@ -1,12 +1,26 @@
 import os
 import sys
+import time
 import argparse
 from pathlib import Path
-from lyrics_utils import LyricsProcessor
+from lyrics_utils import FILE_SKIPPED, LyricsProcessor
+from library_scanner import LibraryScanner
+from lyrics_pipeline import LyricsPipeline
+from library_estimate import estimate_library
+from run_profile import RunProfiler
+from run_report import FILE_STAGES, STAGE_SCAN, ProgressLine, RunReport
+from lyrics_journal import (
+    DEFAULT_JOURNAL_DIR_NAME, RESTORE_CONFLICT, RESTORE_FAILED, RESTORE_RESTORED, RESTORE_UNCHANGED,
+    list_runs, restore_run
+)
+from lyrics_manifest import (
+    DEFAULT_MANIFEST_NAME, OUTCOME_LABELS, LibraryManifest, outcome_from_result
+)
 from datetime import datetime
 
-# 创建歌词处理器实例
+# 创建歌词处理器实例（命令行下开启规则计时，便于在汇总中查看每条规则的开销）
 processor = LyricsProcessor()
+processor.rule_timing = True
 
 def export_failed_files_to_txt(error_files, output_path="failed_files.txt"):
     """
@@ -40,13 +54,42 @@ def export_failed_files_to_txt(error_files, output_path="failed_files.txt"):
         print(f"❌ 导出失败文件时出错: {e}")
         return False
 
-def batch_process_folder(folder_path, verbose=False, dry_run=False, backup=False, filter_ext=None):
-    """批量处理文件夹中的所有音频文件"""
+def supported_extensions(filter_ext):
+    """
+    扩展名过滤与支持的格式取交集，并提示被忽略的不支持的扩展名
+
+    Returns:
+        set: 要处理的扩展名；未指定过滤时为全部支持的格式
+    """
+    if not filter_ext:
+        return set(processor.supported_formats)
+    unsupported = sorted(set(filter_ext) - processor.supported_formats)
+    if unsupported:
+        print(f"⚠️  不支持的文件类型，已忽略: {', '.join(unsupported)}")
+    return set(filter_ext) & processor.supported_formats
+
+
+def batch_process_folder(folder_path, verbose=False, dry_run=False, backup=False, filter_ext=None, manifest=None, jobs=1,
+                         scan_threads=1, pipeline=None, report=None, progress=False):
+    """
+    批量处理文件夹中的所有音频文件
+
+    传入 manifest（LibraryManifest）时，自上次处理后没有变化的文件只需一次 stat 即可跳过，
+    处理结果会写回清单。jobs 大于 1 时由多个工作进程并行处理，输出和失败文件列表
+    仍按扫描顺序排列。扫描与处理同时进行，scan_threads 大于 1 时并发列出兄弟目录。
+
+    传入 pipeline（LyricsPipeline）时改用分阶段流水线处理，结果按完成顺序输出，
+    失败文件列表在结束后排序。
+
+    扫描、读取、清理、备份、写回各阶段的耗时记录到 report（RunReport，未传入时内部创建），
+    汇总中显示吞吐量和单文件耗时分位数；progress 为 True 时在标准错误上显示带预计剩余时间的进度行。
+    """
     processed_count = 0
     total_removed = 0
     total_files = 0
     skipped_files = 0
     ignored_count = 0
+    unchanged_count = 0
     error_files = []
     
     print(f"{'🔍 预览' if dry_run else '🎵 处理'}文件夹: {folder_path}")
@@ -54,44 +97,123 @@ def batch_process_folder(folder_path, verbose=False, dry_run=False, backup=False
         print("📦 备份模式已启用")
     if filter_ext:
         print(f"📁 只处理文件类型: {', '.join(filter_ext)}")
+    if manifest is not None:
+        print(f"🗂️  增量模式: {manifest.path}")
+    if pipeline is not None:
+        print(f"🏭 流水线模式: 读取 {pipeline.read_workers} 线程 / 清理 {pipeline.clean_workers} 进程 / "
+              f"写回 {pipeline.write_workers} 线程")
+    elif jobs > 1:
+        print(f"⚡ 并行处理: {jobs} 个进程")
     print("-" * 60)
     
-    for root, dirs, files in os.walk(folder_path):
-        # 显示当前处理的文件夹
-        relative_path = os.path.relpath(root, folder_path)
-        if relative_path != ".":
-            if verbose:
-                print(f"\n📂 处理文件夹: {relative_path}")
-        
-        for file in files:
-            if processor.is_audio_file(file):
-                # 如果指定了文件类型过滤
-                if filter_ext:
-                    file_ext = os.path.splitext(file)[1].lower()
-                    if file_ext not in filter_ext:
-                        skipped_files += 1
-                        continue
-                
-                file_path = os.path.join(root, file)
-                total_files += 1
-                
+    extensions = supported_extensions(filter_ext)
+    if not extensions:
+        return 0, 0, []
+    
+    if report is None:
+        report = RunReport(folder_path)
+    progress_line = ProgressLine(report) if progress else None
+    
+    # 扩展名过滤在扫描时完成，不匹配的文件不会产出
+    scanner = LibraryScanner(extensions, threads=scan_threads)
+    scanned_stats = {}
+    
+    def iter_audio_files():
+        scanned_files = scanner.scan(folder_path)
+        while True:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            scanned = next(scanned_files, None)
+            if scanned is None:
+                report.finish_scan(time.perf_counter() - wall, time.thread_time() - cpu)
+                return
+            report.add_scanned(time.perf_counter() - wall, time.thread_time() - cpu)
+            if manifest is not None:
+                # 复用扫描时得到的 stat，增量判断不再单独访问文件
                 try:
-                    result, removed_lines = processor.process_audio_file(file_path, verbose, dry_run, backup)
-                    if result is True:  # 成功
-                        processed_count += 1
-                        total_removed += removed_lines
-                        if not verbose and not dry_run:
-                            print(f"✅ {os.path.relpath(file_path, folder_path)}")
-                    elif result is None:  # 忽略（无歌词标签）
-                        ignored_count += 1
-                        if verbose:
-                            print(f"⏭️  忽略（无歌词标签）: {os.path.relpath(file_path, folder_path)}")
-                    else:  # 失败
-                        error_files.append(file_path)
-                except Exception as e:
-                    error_files.append(f"{file_path}: {str(e)}")
+                    scanned_stats[scanned.path] = scanned.stat()
+                except OSError:
+                    pass
+            yield scanned.path
+    
+    def is_unchanged(file_path):
+        stat_result = scanned_stats.pop(file_path, None)
+        return stat_result is not None and manifest.is_unchanged(file_path, stat_result)
+    
+    def is_scanned_unchanged(scanned):
+        try:
+            return manifest.is_unchanged(scanned.path, scanned.stat())
+        except OSError:
+            return False
+    
+    if pipeline is not None:
+        results = pipeline.iter_results(folder_path, extensions, dry_run=dry_run, backup=backup,
+                                        skip=is_scanned_unchanged if manifest is not None else None,
+                                        report=report)
+    else:
+        results = processor.process_audio_files(
+            iter_audio_files(), jobs=jobs, verbose=verbose, dry_run=dry_run, backup=backup,
+            skip=is_unchanged if manifest is not None else None, report=report
+        )
+    current_dir = "."
+    try:
+        for file_path, result, removed_lines, output in results:
+            total_files += 1
+            if progress_line is not None:
+                progress_line.clear()
+            # 显示当前处理的文件夹（按结果顺序输出，并行时也不会错位；流水线按完成顺序输出，不显示）
+            relative_path = os.path.relpath(os.path.dirname(file_path), folder_path)
+            if relative_path != current_dir and pipeline is None:
+                current_dir = relative_path
+                if verbose and relative_path != ".":
+                    print(f"\n📂 处理文件夹: {relative_path}")
+            # 工作进程捕获的输出整体写出，不同文件的行不会交错
+            if output:
+                sys.stdout.write(output)
+            
+            try:
+                if result == FILE_SKIPPED:
+                    unchanged_count += 1
+                    if verbose:
+                        print(f"⏩ 未变化，跳过: {os.path.relpath(file_path, folder_path)}")
+                    continue
+                
+                if manifest is not None:
+                    manifest.record(file_path, os.stat(file_path),
+                                    outcome_from_result(result, removed_lines, dry_run), removed_lines)
+                if result is True:  # 成功
+                    processed_count += 1
+                    total_removed += removed_lines
+                    if not verbose and not dry_run:
+                        print(f"✅ {os.path.relpath(file_path, folder_path)}")
+                elif result is None:  # 忽略（无歌词标签）
+                    ignored_count += 1
                     if verbose:
-                        print(f"❌ 处理失败: {file_path} - {str(e)}")
+                        print(f"⏭️  忽略（无歌词标签）: {os.path.relpath(file_path, folder_path)}")
+                else:  # 失败
+                    error_files.append(file_path)
+            except Exception as e:
+                error_files.append(f"{file_path}: {str(e)}")
+                if verbose:
+                    print(f"❌ 处理失败: {file_path} - {str(e)}")
+            finally:
+                if progress_line is not None:
+                    progress_line.update()
+    finally:
+        results.close()
+        report.finish()
+        if progress_line is not None:
+            progress_line.clear()
+    
+    if pipeline is not None:
+        scanner = pipeline.scanner
+        error_files.sort()
+    if filter_ext:
+        skipped_files = sum(count for ext, count in scanner.extension_counts.items()
+                            if ext in processor.supported_formats and ext not in filter_ext)
+    if scanner.duplicates:
+        print(f"\n🔗 跳过重复的硬链接/符号链接: {scanner.duplicates}")
+    for scan_error in scanner.errors:
+        print(f"⚠️  无法读取: {scan_error}")
     
     # 显示详细统计
     print("\n" + "="*60)
@@ -100,11 +222,42 @@ def batch_process_folder(folder_path, verbose=False, dry_run=False, backup=False
     print(f"   ✅ {'预览' if dry_run else '处理'}成功: {processed_count}")
     if ignored_count > 0:
         print(f"   ⏭️  忽略文件（无歌词标签）: {ignored_count}")
+    if unchanged_count > 0:
+        print(f"   ⏩ 未变化跳过（增量）: {unchanged_count}")
     if skipped_files > 0:
         print(f"   ⏭️  跳过文件: {skipped_files}")
     if error_files:
         print(f"   ❌ 失败文件: {len(error_files)}")
     print(f"   🧹 总移除行数: {total_removed}")
+    cache_stats = processor.cache_stats()
+    if cache_stats:
+        print(f"   🗃️  歌词缓存: 命中 {cache_stats['hits']} (磁盘 {cache_stats['disk_hits']}) / 未命中 {cache_stats['misses']}")
+    write_stats = processor.write_stats()
+    if write_stats['in_place'] or write_stats['rewritten']:
+        print(f"   ✍️  写回: 原地更新 {write_stats['in_place']} / 重写整个文件 {write_stats['rewritten']}")
+    print_backup_stats()
+    print_rule_stats()
+    if pipeline is not None:
+        print_stage_stats(pipeline.stage_stats)
+    print_timing_report(report)
+    
+    report.extra.update({
+        'counts': {
+            'total': total_files,
+            'processed': processed_count,
+            'ignored': ignored_count,
+            'unchanged': unchanged_count,
+            'failed': len(error_files),
+            'removed_lines': total_removed,
+        },
+        'failed_files': error_files,
+        'write_stats': processor.write_stats(),
+        'backup_stats': processor.backup_stats(),
+        'cache_stats': cache_stats,
+        'rule_stats': processor.rule_stats(),
+    })
+    if pipeline is not None:
+        report.extra['pipeline_stats'] = pipeline.stage_stats
     
     if error_files and verbose:
         print(f"\n❌ 失败文件列表:")
@@ -121,6 +274,171 @@ def batch_process_folder(folder_path, verbose=False, dry_run=False, backup=False
     
     return processed_count, total_removed, error_files
 
+def print_timing_report(report):
+    """显示各阶段耗时、吞吐量和单文件耗时分位数"""
+    summary = report.summary()
+    if not summary['files']:
+        return
+    if summary['skipped'] == summary['files']:
+        print(f"\n⏱️  耗时: {summary['elapsed_seconds']:.2f}s，{summary['files']} 个文件未变化，没有处理任何文件")
+        return
+    print(f"\n⏱️  耗时: {summary['elapsed_seconds']:.2f}s，{summary['files_per_second']:.1f} 文件/秒，"
+          f"{summary['mb_per_second']:.1f} MB/秒")
+    stages = summary['stages']
+    for stage in (STAGE_SCAN,) + FILE_STAGES:
+        if not stages[stage]['seconds']:
+            continue
+        print(f"   {stage:<8} 累计 {stages[stage]['seconds']:>9.3f}s  CPU {stages[stage]['cpu_seconds']:>9.3f}s "
+              f"({stages[stage]['cpu_ratio']:.0%})")
+    latency = summary['latency_seconds']
+    print(f"   单文件耗时: p50 {latency['p50'] * 1000:.1f}ms / p95 {latency['p95'] * 1000:.1f}ms / "
+          f"p99 {latency['p99'] * 1000:.1f}ms / 最大 {latency['max'] * 1000:.1f}ms")
+    if summary['bound'] == 'disk':
+        print("   💡 读写阶段大部分时间在等待磁盘：瓶颈是 I/O，增加并发或换更快的存储更有效")
+    elif summary['bound'] == 'cpu':
+        print("   💡 各阶段主要在使用 CPU：瓶颈是计算，增加 --jobs 更有效")
+
+def print_profile_report(profiler, report=None, slowest=20):
+    """显示性能分析结果：耗时最长的文件和函数"""
+    print(f"\n🔬 性能分析结果:")
+    print(f"   📄 pstats: {profiler.pstats_path}（python -m pstats / snakeviz 查看）")
+    print(f"   🔥 折叠栈: {profiler.collapsed_path}（flamegraph.pl / speedscope 生成火焰图）")
+    slowest_files = report.slowest_files() if report is not None else []
+    if slowest_files:
+        print(f"   🐢 最慢的 {min(slowest, len(slowest_files))} 个文件:")
+        for entry in slowest_files[:slowest]:
+            stages = ' '.join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in entry['stages'].items())
+            print(f"      {entry['seconds'] * 1000:>9.1f}ms  {entry['size'] / 1024 / 1024:>7.1f} MB  "
+                  f"{entry['format'] or '-':<5} {entry['path']}")
+            print(f"      {'':>11}  {stages}")
+    print(f"   ⚙️  自身耗时最多的函数:")
+    for row in profiler.top_functions(10):
+        print(f"      {row['own_seconds']:>9.3f}s  累计 {row['cumulative_seconds']:>9.3f}s  "
+              f"调用 {row['calls']:>8}  {row['function']}")
+
+def print_backup_stats():
+    """显示备份方式和实际写入的数据量"""
+    backup_stats = processor.backup_stats()
+    if not backup_stats['backups']:
+        return
+    methods = ', '.join(f"{method} {count}" for method, count in sorted(backup_stats['methods'].items()))
+    print(f"   📦 备份: {backup_stats['backups']} 个文件 ({methods})，"
+          f"实际写入 {backup_stats['bytes_written'] / 1024 / 1024:.1f} MB")
+
+def print_rule_stats():
+    """显示每条清理规则的命中次数和耗时"""
+    rule_stats = processor.rule_stats()
+    if not any(rule['evaluations'] or rule['hits'] for rule in rule_stats):
+        return
+    print("   📐 规则统计:")
+    for rule in rule_stats:
+        status = "" if rule['enabled'] else " (已禁用)"
+        print(f"      {rule['name']:<18} 命中 {rule['hits']:>7}  判断 {rule['evaluations']:>8}  "
+              f"耗时 {rule['seconds'] * 1000:.1f}ms{status}")
+
+def print_stage_stats(stage_stats):
+    """显示流水线每个阶段的繁忙程度和输入队列深度"""
+    print("   🏭 流水线阶段:")
+    for stage in stage_stats:
+        queue_text = ""
+        if stage['queue_capacity']:
+            queue_text = (f"  队列 平均 {stage['queue_avg']:.1f} / 最大 {stage['queue_max']} / 容量 {stage['queue_capacity']}"
+                          f"  上游等待 {stage['blocked_seconds']:.2f}s")
+        print(f"      {stage['name']:<6} x{stage['workers']:<3} 文件 {stage['items']:>7}  "
+              f"繁忙 {stage['utilization'] * 100:5.1f}%{queue_text}")
+
+def list_runs_entries(journal_dir, run_id):
+    """返回指定运行在撤销日志中的记录数"""
+    return dict(list_runs(journal_dir)).get(run_id, 0) if os.path.isdir(journal_dir) else 0
+
+def undo_run(journal_dir, run_id, jobs, force=False):
+    """按撤销日志并行恢复一次运行修改过的歌词"""
+    if not list_runs_entries(journal_dir, run_id):
+        print(f"❌ 错误: 撤销日志中没有运行 {run_id} - {journal_dir}")
+        runs = list_runs(journal_dir) if os.path.isdir(journal_dir) else []
+        if runs:
+            print("💡 可撤销的运行:")
+            for known_run_id, count in runs[-10:]:
+                print(f"   {known_run_id}  ({count} 个文件)")
+        sys.exit(1)
+    
+    print(f"↩️  撤销运行: {run_id}")
+    print("-" * 60)
+    counts = {}
+    for file_path, outcome, message in restore_run(journal_dir, run_id, jobs=jobs, force=force):
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if outcome == RESTORE_RESTORED:
+            print(f"↩️  {file_path}")
+        elif outcome == RESTORE_CONFLICT:
+            print(f"⚠️  跳过（{message}）: {file_path}")
+        elif outcome == RESTORE_FAILED:
+            print(f"❌ 恢复失败 {file_path}: {message}")
+    
+    print("\n" + "="*60)
+    print(f"📊 撤销统计:")
+    print(f"   ↩️  已恢复: {counts.get(RESTORE_RESTORED, 0)}")
+    if counts.get(RESTORE_CONFLICT):
+        print(f"   ⚠️  清理后又被修改、未恢复: {counts[RESTORE_CONFLICT]}（可加 --force 强制恢复）")
+    if counts.get(RESTORE_UNCHANGED):
+        print(f"   ✨ 已是原始歌词: {counts[RESTORE_UNCHANGED]}")
+    if counts.get(RESTORE_FAILED):
+        print(f"   ❌ 失败: {counts[RESTORE_FAILED]}")
+        sys.exit(1)
+
+def print_manifest_stats(manifest, folder_path):
+    """根据增量清单显示统计信息"""
+    stats = manifest.stats(folder_path if os.path.isdir(folder_path) else None)
+    print(f"📊 清单统计: {folder_path}")
+    print(f"   🗂️  清单文件: {manifest.path}")
+    print(f"   🎵 已记录的音频文件: {stats['total']}")
+    for outcome, label in OUTCOME_LABELS.items():
+        count = stats['outcomes'].get(outcome, 0)
+        if count:
+            print(f"   - {label}: {count}")
+    print(f"   🧹 已移除行数: {stats['removed']}")
+    if stats['pending_removed']:
+        print(f"   🔍 待移除行数（预览）: {stats['pending_removed']}")
+    if stats['stale_ruleset']:
+        print(f"   ⚠️  规则已变化、下次会重新检查: {stats['stale_ruleset']}")
+    if stats['last_updated']:
+        print(f"   🕒 最近更新: {datetime.fromtimestamp(stats['last_updated']).strftime('%Y-%m-%d %H:%M:%S')}")
+
+def format_seconds(seconds):
+    """把秒数格式化为易读的时长"""
+    if seconds < 60:
+        return f"{seconds:.1f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+def print_library_estimate(folder_path, sample_size, filter_ext=None, jobs=1, scan_threads=1, seed=None):
+    """抽样估计整个文件夹的处理结果和耗时"""
+    extensions = supported_extensions(filter_ext)
+    if not extensions:
+        print(f"📊 抽样估计: {folder_path}")
+        print("   🎵 音频文件: 0")
+        return
+    report = estimate_library(processor, folder_path, sample_size, extensions, jobs=jobs,
+                              scan_threads=scan_threads, seed=seed)
+    print(f"📊 抽样估计: {folder_path}")
+    print(f"   🎵 音频文件: {report['files']}（扫描耗时 {format_seconds(report['scan_seconds'])}）")
+    if not report['sampled']:
+        return
+    print(f"   🎲 抽样: {report['sampled']} 个文件，{report['strata']} 个分层（文件夹 × 格式），"
+          f"耗时 {format_seconds(report['sample_seconds'])}")
+    files = report['files']
+    for key, label in (('has_lyrics', '🎤 有歌词'), ('needs_cleaning', '🧹 需要清理'), ('failed', '❌ 无法读取')):
+        estimate = report[key]
+        print(f"   {label}: 约 {estimate['estimate']:.0f} 个 ({estimate['estimate'] / files:.1%})，"
+              f"95% 置信区间 {estimate['low']:.0f} ~ {min(files, estimate['high']):.0f}")
+    removed = report['removed_lines']
+    print(f"   ✂️  移除行数: 约 {removed['estimate']:.0f}，95% 置信区间 {removed['low']:.0f} ~ {removed['high']:.0f}")
+    latency = report['seconds_per_file']
+    projected = report['projected_seconds']
+    print(f"   ⏱️  单文件读取 + 清理: 平均 {latency['estimate'] * 1000:.1f}ms")
+    print(f"   🕒 预计耗时（{report['jobs']} 个进程，不含写回）: 约 {format_seconds(projected['estimate'])}，"
+          f"95% 置信区间 {format_seconds(projected['low'])} ~ {format_seconds(projected['high'])}")
+
 def interactive_mode():
     """交互式命令行界面"""
     print("🎵 歌词清理工具 - 交互模式")
@@ -218,7 +536,8 @@ def interactive_mode():
             try:
                 print("🌐 启动Web界面...")
                 print("📱 请在浏览器中访问: http://localhost:5000")
-                os.system("python app.py")
+                from serve import run_server
+                run_server()
             except KeyboardInterrupt:
                 print("\n🌐 Web界面已关闭")
             except Exception as e:
@@ -277,6 +596,8 @@ def main():
   python ly.py "song.mp3" --dry-run         # 预览单个文件
   python ly.py "D:\\Music" --backup -v      # 备份模式处理
   python ly.py "D:\\Music" --filter-ext .flac,.mp3  # 只处理指定格式
+  python ly.py "D:\\Music" --jobs 8               # 8 个进程并行处理
+  python ly.py "D:\\Music" --stats --sample       # 抽样估计需要清理的文件数和耗时
   python ly.py --web                        # 启动Web界面
 
 💡 建议: 首次使用请先用 --dry-run 预览效果
@@ -290,6 +611,35 @@ def main():
     parser.add_argument('-w', '--web', action='store_true', help='启动Web界面')
     parser.add_argument('--filter-ext', type=str, help='只处理指定文件类型，如: .mp3,.flac,.m4a')
     parser.add_argument('--stats', action='store_true', help='只显示统计信息，不处理文件')
+    parser.add_argument('--sample', nargs='?', type=int, const=400, metavar='N',
+                        help='与 --stats 一起使用：分层抽样 N 个文件（默认: 400）估计有歌词和需要清理的文件数及处理耗时')
+    parser.add_argument('--seed', type=int, help='抽样的随机种子，指定后估计结果可复现')
+    parser.add_argument('--disable-rule', type=str, help='禁用指定的清理规则，如: title_line,timestamp_keyword')
+    parser.add_argument('--manifest', nargs='?', const='', metavar='PATH',
+                        help=f'增量模式：记录处理结果，再次运行时跳过未变化的文件（默认清单: <文件夹>/{DEFAULT_MANIFEST_NAME}）')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='并行处理的进程数（默认: CPU 核数，1 表示单进程）')
+    parser.add_argument('--scan-threads', type=int, default=1,
+                        help='并发扫描目录的线程数（网络挂载上可调大，默认: 1）')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='分阶段流水线模式：读取、清理、写回分别并发，--jobs 为清理进程数')
+    parser.add_argument('--read-threads', type=int, default=4, help='流水线模式下读取标签的线程数（默认: 4）')
+    parser.add_argument('--write-threads', type=int, default=2, help='流水线模式下写回标签的线程数（默认: 2）')
+    parser.add_argument('--backup-dir', type=str, metavar='DIR',
+                        help='把备份保存到内容寻址的备份库（相同内容只保存一份，隐含 --backup）')
+    parser.add_argument('--journal', nargs='?', const='', metavar='DIR',
+                        help=f'撤销日志：只记录原始歌词标签，代替整文件备份（默认目录: <文件夹>/{DEFAULT_JOURNAL_DIR_NAME}）')
+    parser.add_argument('--undo', type=str, metavar='RUN_ID', help='按撤销日志恢复指定运行修改过的歌词')
+    parser.add_argument('--force', action='store_true', help='撤销时即使歌词在清理后又被修改过也强制恢复')
+    parser.add_argument('--report', nargs='?', const='', metavar='PATH',
+                        help='批量处理结束后导出 JSON 运行报告（默认: run_report_<时间>.json）')
+    parser.add_argument('--profile', nargs='?', const='', metavar='PREFIX',
+                        help='用 cProfile 分析本次运行，输出 <PREFIX>.pstats 和火焰图用的 <PREFIX>.collapsed（默认: profile_<时间>）')
+    parser.add_argument('--slowest', type=int, default=20, metavar='N',
+                        help='性能分析时列出耗时最长的 N 个文件（默认: 20）')
+    parser.add_argument('--no-progress', action='store_true', help='不显示进度行（默认在终端中显示）')
+    parser.add_argument('--cache', action='store_true', help='缓存相同歌词的清理结果')
+    parser.add_argument('--cache-file', type=str, help='磁盘缓存文件路径，多次运行之间复用清理结果（隐含 --cache）')
     parser.add_argument('--version', action='version', version='歌词清理工具 v2.0')
     
     args = parser.parse_args()
@@ -302,12 +652,33 @@ def main():
             print("❌ 错误: 文件扩展名必须以点开头，如: .mp3,.flac")
             sys.exit(1)
     
+    if args.disable_rule:
+        for rule_name in args.disable_rule.split(','):
+            try:
+                processor.set_rule_enabled(rule_name.strip(), False)
+            except KeyError:
+                print(f"❌ 错误: 未知的规则 - {rule_name.strip()}")
+                print(f"💡 可用的规则: {', '.join(rule['name'] for rule in processor.rule_stats())}")
+                sys.exit(1)
+    
+    if min(args.jobs, args.scan_threads, args.read_threads, args.write_threads, args.slowest) < 1:
+        print("❌ 错误: --jobs、--scan-threads、--read-threads、--write-threads 和 --slowest 必须大于等于 1")
+        sys.exit(1)
+    
+    if args.cache or args.cache_file:
+        processor.enable_cache(path=args.cache_file)
+    
+    if args.backup_dir:
+        args.backup = True
+        processor.enable_backup_store(args.backup_dir)
+    
     if args.web:
         try:
             print("🌐 启动Web界面...")
             print("📱 请在浏览器中访问: http://localhost:5000")
             print("💡 提示: 复杂目录结构建议使用命令行模式")
-            os.system("python app.py")
+            from serve import run_server
+            run_server()
         except KeyboardInterrupt:
             print("\n🌐 Web界面已关闭")
         return
@@ -328,22 +699,52 @@ def main():
         mode_text += "🔍 预览模式"
     if args.backup:
         mode_text += " 📦 备份模式" if mode_text else "📦 备份模式"
+    if args.journal is not None and not args.undo:
+        mode_text += " 📝 撤销日志" if mode_text else "📝 撤销日志"
     if filter_ext:
         mode_text += f" 🎯 过滤: {','.join(filter_ext)}" if mode_text else f"🎯 过滤: {','.join(filter_ext)}"
     
     print(f"🎵 音频歌词清理工具 {mode_text}")
     print("="*80)
     
+    journal_dir = args.journal or os.path.join(str(path if path.is_dir() else path.parent), DEFAULT_JOURNAL_DIR_NAME)
+    if args.undo:
+        undo_run(journal_dir, args.undo, args.jobs, args.force)
+        return
+    if args.journal is not None and not args.dry_run:
+        processor.enable_journal(journal_dir)
+    
+    manifest = None
+    if args.manifest is not None:
+        manifest_path = args.manifest or os.path.join(str(path if path.is_dir() else path.parent), DEFAULT_MANIFEST_NAME)
+        if args.stats and not os.path.exists(manifest_path):
+            print(f"❌ 错误: 清单不存在 - {manifest_path}")
+            sys.exit(1)
+        manifest = LibraryManifest(manifest_path, processor.ruleset_version)
+    
+    if args.stats and manifest is not None:
+        # 直接从清单统计，不访问任何音频文件
+        print_manifest_stats(manifest, str(path))
+        manifest.close()
+        return
+    
+    if args.stats and args.sample is not None and path.is_dir():
+        if args.sample < 1:
+            print("❌ 错误: --sample 必须大于等于 1")
+            sys.exit(1)
+        print_library_estimate(str(path), args.sample, filter_ext, args.jobs, args.scan_threads, args.seed)
+        return
+    
     if args.stats:
         # 只显示统计信息
         if path.is_dir():
-            total_files = 0
-            audio_files = 0
-            for root, dirs, files in os.walk(path):
-                for file in files:
-                    total_files += 1
-                    if processor.is_audio_file(file):
-                        audio_files += 1
+            # 只统计扩展名，不需要产出任何文件
+            scanner = LibraryScanner(extensions=(), threads=args.scan_threads)
+            for _ in scanner.scan(str(path)):
+                pass
+            total_files = scanner.files
+            audio_files = sum(count for ext, count in scanner.extension_counts.items()
+                              if ext in processor.supported_formats)
             print(f"📊 目录统计: {path}")
             print(f"   📁 总文件数: {total_files}")
             print(f"   🎵 音频文件: {audio_files}")
@@ -353,38 +754,93 @@ def main():
             print(f"   🎵 音频文件: {'是' if processor.is_audio_file(str(path)) else '否'}")
         return
     
-    if path.is_file():
-        if processor.is_audio_file(str(path)):
-            success, removed = processor.process_audio_file(str(path), args.verbose, args.dry_run, args.backup)
-            if not success and not args.dry_run:
-                print("❌ 处理失败")
-                sys.exit(1)
+    profiler = None
+    if args.profile is not None:
+        profiler = RunProfiler(args.profile or f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        processor.worker_profile_dir = profiler.start().worker_directory
+        print(f"🔬 性能分析已开启，结束后输出到: {profiler.pstats_path}")
+    
+    report = None
+    try:
+        if path.is_file():
+            if processor.is_audio_file(str(path)):
+                success, removed = processor.process_audio_file(str(path), args.verbose, args.dry_run, args.backup)
+                if not success and not args.dry_run:
+                    print("❌ 处理失败")
+                    sys.exit(1)
+                else:
+                    print(f"\n✅ {'预览' if args.dry_run else '处理'}完成!")
             else:
-                print(f"\n✅ {'预览' if args.dry_run else '处理'}完成!")
-        else:
-            print(f"❌ 错误: 不支持的文件格式 - {path.suffix}")
-            print("💡 支持的格式: .mp3, .flac, .m4a")
-            sys.exit(1)
+                print(f"❌ 错误: 不支持的文件格式 - {path.suffix}")
+                print("💡 支持的格式: .mp3, .flac, .m4a")
+                sys.exit(1)
     
-    elif path.is_dir():
-        processed, total_removed, errors = batch_process_folder(
-            str(path), args.verbose, args.dry_run, args.backup, filter_ext
-        )
+        elif path.is_dir():
+            pipeline = None
+            if args.pipeline:
+                pipeline = LyricsPipeline(processor, read_workers=args.read_threads, clean_workers=args.jobs,
+                                          write_workers=args.write_threads, scan_threads=args.scan_threads)
+            report = RunReport(str(path), {
+                'dry_run': args.dry_run, 'backup': args.backup, 'filter_ext': filter_ext, 'jobs': args.jobs,
+                'scan_threads': args.scan_threads, 'pipeline': args.pipeline, 'manifest': manifest is not None,
+            }, slowest=args.slowest if profiler is not None else 0)
+            processed, total_removed, errors = batch_process_folder(
+                str(path), args.verbose, args.dry_run, args.backup, filter_ext, manifest, args.jobs,
+                args.scan_threads, pipeline, report, progress=not args.no_progress and sys.stderr.isatty()
+            )
+            if manifest is not None:
+                manifest.close()
+            if args.report is not None:
+                report_path = args.report or f"run_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                try:
+                    report.write_json(report_path)
+                    print(f"📈 运行报告已导出到: {report_path}")
+                except OSError as e:
+                    print(f"❌ 导出运行报告失败: {e}")
         
-        if processed == 0:
-            print("⚠️  没有找到可处理的音频文件")
-            if filter_ext:
-                print(f"💡 当前过滤器: {','.join(filter_ext)}")
-            sys.exit(1)
-        else:
-            print(f"\n🎉 {'预览' if args.dry_run else '处理'}完成!")
-            if args.dry_run:
-                print("💡 如果效果满意，去掉 --dry-run 参数即可正式处理")
-            if errors:
-                print(f"⚠️  注意: 有 {len(errors)} 个文件处理失败")
+            # 扩展名过滤中没有支持的格式时不会扫描，也没有计数
+            unchanged = report.extra.get('counts', {}).get('unchanged', 0)
+            if processed == 0 and errors:
+                # 没有成功的文件是因为失败（增量模式下其余文件可能都没有变化），而不是没有找到文件
+                print(f"\n❌ 没有文件{'预览' if args.dry_run else '处理'}成功: {len(errors)} 个文件处理失败")
+                if unchanged:
+                    print(f"⏩ 其余 {unchanged} 个文件自上次处理后没有变化，已跳过")
+                sys.exit(1)
+            elif processed == 0 and manifest is not None:
+                print(f"\n✨ 没有新增或变化的文件需要处理（{unchanged} 个文件未变化）")
+            elif processed == 0:
+                print("⚠️  没有找到可处理的音频文件")
+                if filter_ext:
+                    print(f"💡 当前过滤器: {','.join(filter_ext)}")
+                sys.exit(1)
+            else:
+                print(f"\n🎉 {'预览' if args.dry_run else '处理'}完成!")
+                if args.dry_run:
+                    print("💡 如果效果满意，去掉 --dry-run 参数即可正式处理")
+                if errors:
+                    print(f"⚠️  注意: 有 {len(errors)} 个文件处理失败")
+    finally:
+        if profiler is not None:
+            processor.worker_profile_dir = None
+            profiler.stop()
+            print_profile_report(profiler, report, args.slowest)
     
     if args.backup and not args.dry_run:
-        print("📦 备份文件已创建，原文件已更新")
+        if processor.backup_store is not None:
+            processor.backup_store.close()
+            print(f"📦 备份已保存到备份库: {args.backup_dir}，原文件已更新")
+        else:
+            print("📦 备份文件已创建，原文件已更新")
+    
+    if processor.journal is not None:
+        processor.journal.close()
+        if list_runs_entries(journal_dir, processor.journal.run_id):
+            print(f"📝 撤销日志: {journal_dir}  运行 ID: {processor.journal.run_id}")
+            print(f"💡 恢复原始歌词: python ly.py \"{path}\" --undo {processor.journal.run_id}"
+                  + (f" --journal \"{args.journal}\"" if args.journal else ""))
+    
+    if processor.cache is not None:
+        processor.cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
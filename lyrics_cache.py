@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+歌词清理结果缓存
+按歌词内容哈希 + 规则版本缓存 clean_lyrics 的结果，内存中按 LRU 淘汰，
+可选的 SQLite 磁盘层在多次运行之间保留结果
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# 磁盘写入先在内存中积累，最多积累多久（秒）后一次写入
+COMMIT_INTERVAL = 1.0
+
+
+def lyrics_digest(lyrics_text):
+    """计算歌词文本的内容哈希"""
+    data = lyrics_text.encode('utf-8', 'surrogatepass')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class LyricsCache:
+    """
+    歌词清理结果缓存
+
+    Args:
+        max_entries (int): 内存中最多缓存的条目数
+        max_bytes (int): 内存中缓存内容的字节预算（按 Python 字符串对象大小估算）
+        path (str): 磁盘缓存文件路径，为 None 时只使用内存缓存
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        # 尚未写入磁盘的条目 {键: (清理后的歌词, 被移除的行 JSON)}
+        self._pending = {}
+        self._pending_since = 0.0
+        if path:
+            # 多个进程共享同一个缓存文件时，等待其他进程提交而不是立即报错
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS lyrics_cache ('
+                'key TEXT PRIMARY KEY, cleaned TEXT NOT NULL, removed TEXT NOT NULL)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(lyrics_text, ruleset_version):
+        """缓存键：规则版本 + 内容哈希"""
+        return f"{ruleset_version}:{lyrics_digest(lyrics_text)}"
+
+    def get(self, lyrics_text, ruleset_version):
+        """
+        查询缓存
+
+        Returns:
+            tuple: (清理后的歌词, 被移除的行元组)，未命中时返回 None
+        """
+        key = self.make_key(lyrics_text, ruleset_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+
+            if self._db is not None:
+                # 尚未写入磁盘的条目（已被内存层淘汰时）直接从待写入列表中取
+                row = self._pending.get(key) or self._db.execute(
+                    'SELECT cleaned, removed FROM lyrics_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    cleaned, removed = row[0], tuple(json.loads(row[1]))
+                    self._store(key, cleaned, removed)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return cleaned, removed
+
+            self.misses += 1
+            return None
+
+    def put(self, lyrics_text, ruleset_version, cleaned, removed_lines):
+        """写入缓存"""
+        key = self.make_key(lyrics_text, ruleset_version)
+        removed = tuple(removed_lines)
+        with self._lock:
+            self._store(key, cleaned, removed)
+            if self._db is not None:
+                # 先在内存中积累再批量写入，避免每条记录都触发一次磁盘同步；
+                # 写事务只在批量写入时打开，多个进程共享缓存文件时不会长时间占用写锁
+                if not self._pending:
+                    self._pending_since = time.monotonic()
+                self._pending[key] = (cleaned, json.dumps(removed, ensure_ascii=False))
+                if len(self._pending) >= 500 or time.monotonic() - self._pending_since >= COMMIT_INTERVAL:
+                    self._write_pending()
+
+    def _write_pending(self):
+        """把积累的条目写入磁盘（调用方持有锁）"""
+        if self._pending:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO lyrics_cache (key, cleaned, removed) VALUES (?, ?, ?)',
+                                     [(key, cleaned, removed) for key, (cleaned, removed) in self._pending.items()])
+            self._pending = {}
+
+    def _store(self, key, cleaned, removed):
+        """写入内存层并按 LRU 淘汰超出预算的条目（调用方持有锁）"""
+        size = sys.getsizeof(cleaned) + sum(sys.getsizeof(line) for line in removed)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (cleaned, removed, size)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[2]
+            self.evictions += 1
+
+    def add_lookups(self, hits=0, disk_hits=0, misses=0):
+        """累加在其他进程中发生的命中统计（并行处理时由工作进程汇总回来）"""
+        with self._lock:
+            self.hits += hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'disk': self.path,
+            }
+
+    def clear(self):
+        """清空内存层（磁盘层保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def flush(self):
+        """把尚未提交的磁盘写入落盘"""
+        with self._lock:
+            if self._db is not None:
+                self._write_pending()
+
+    def close(self):
+        """落盘并关闭磁盘缓存"""
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+歌词撤销日志
+写回清理结果之前，只记录原始歌词标签（而不是复制整个音频文件），每次运行一个运行 ID。
+每个进程写自己的分片文件 <运行ID>.<进程号>.jsonl，并行处理时不需要跨进程加锁；
+撤销时读取该运行的全部分片，并行把歌词恢复为原始值。
+"""
+
+import glob
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from lyrics_cache import lyrics_digest
+
+# 默认日志目录名（放在处理的文件夹下）
+DEFAULT_JOURNAL_DIR_NAME = '.lyrics_journal'
+
+# 撤销结果
+RESTORE_RESTORED = 'restored'    # 已恢复
+RESTORE_UNCHANGED = 'unchanged'  # 当前歌词已经是原始值（例如写回失败），无需恢复
+RESTORE_CONFLICT = 'conflict'    # 清理之后歌词又被修改过，未恢复
+RESTORE_FAILED = 'failed'        # 恢复失败
+
+
+def new_run_id():
+    """生成运行 ID：时间 + 随机后缀，按字典序即按时间排序"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{secrets.token_hex(3)}"
+
+
+class UndoJournal:
+    """
+    撤销日志（当前进程的分片）
+
+    Args:
+        directory (str): 日志目录，不存在时自动创建
+        run_id (str): 运行 ID，为 None 时生成新的运行 ID
+    """
+
+    def __init__(self, directory, run_id=None):
+        self.directory = directory
+        self.run_id = run_id or new_run_id()
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    @property
+    def part_path(self):
+        return os.path.join(self.directory, f"{self.run_id}.{os.getpid()}.jsonl")
+
+    def _open(self):
+        """按需打开当前进程的分片（fork 出的工作进程会打开自己的分片）"""
+        if self._file is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.part_path, 'a', encoding='utf-8')
+            self._pid = os.getpid()
+        return self._file
+
+    def record(self, file_path, original_lyrics, cleaned_lyrics):
+        """
+        在写回之前记录原始歌词
+
+        记录写入并刷新到操作系统后才返回，写回过程中进程被中断也能撤销。
+        """
+        entry = {
+            'path': os.path.abspath(file_path),
+            'original': original_lyrics,
+            'cleaned': lyrics_digest(cleaned_lyrics),
+            'time': round(time.time(), 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            journal_file = self._open()
+            journal_file.write(line)
+            journal_file.flush()
+            self.entries += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                os.fsync(self._file.fileno())
+                self._file.close()
+            self._file = None
+
+
+def list_runs(directory):
+    """
+    列出日志目录中的运行
+
+    Returns:
+        list: [(运行 ID, 记录数)]，按时间排序
+    """
+    runs = {}
+    for part_path in glob.glob(os.path.join(glob.escape(directory), '*.jsonl')):
+        run_id = os.path.basename(part_path).split('.', 1)[0]
+        with open(part_path, encoding='utf-8') as part:
+            runs[run_id] = runs.get(run_id, 0) + sum(1 for _ in part)
+    return sorted(runs.items())
+
+
+def load_run(directory, run_id):
+    """
+    读取一次运行的全部记录
+
+    同一文件出现多次时保留最早的记录（即最初的原始歌词）。
+
+    Returns:
+        list: 记录列表，按路径排序
+    """
+    entries = {}
+    pattern = os.path.join(glob.escape(directory), f"{glob.escape(run_id)}.*.jsonl")
+    for part_path in sorted(glob.glob(pattern)):
+        with open(part_path, encoding='utf-8') as part:
+            for line in part:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 进程中断时最后一行可能不完整
+                current = entries.get(entry['path'])
+                if current is None or entry['time'] < current['time']:
+                    entries[entry['path']] = entry
+    return [entries[path] for path in sorted(entries)]
+
+
+def restore_entry(entry, force=False):
+    """
+    把一个文件的歌词恢复为原始值
+
+    只有当前歌词仍是当次清理的结果时才恢复；force 为 True 时无条件恢复。
+
+    Returns:
+        tuple: (文件路径, 撤销结果, 说明)
+    """
+    from lyrics_utils import AudioLyricsFile  # lyrics_utils 也导入本模块，在这里导入避免循环
+
+    file_path = entry['path']
+    try:
+        audio_file = AudioLyricsFile(file_path)
+        current = audio_file.read_lyrics()
+        if current == entry['original']:
+            return file_path, RESTORE_UNCHANGED, ''
+        if not force and lyrics_digest(current) != entry['cleaned']:
+            return file_path, RESTORE_CONFLICT, '清理之后歌词又被修改过'
+        audio_file.write_lyrics(entry['original'])
+        return file_path, RESTORE_RESTORED, ''
+    except Exception as e:
+        return file_path, RESTORE_FAILED, str(e)
+
+
+def restore_run(directory, run_id, jobs=None, force=False):
+    """
+    撤销一次运行：并行恢复全部文件的原始歌词
+
+    Args:
+        directory (str): 日志目录
+        run_id (str): 运行 ID
+        jobs (int): 工作进程数，默认为 CPU 核数；为 1 时在当前进程中恢复
+        force (bool): 歌词在清理后又被修改过时也强制恢复
+
+    Yields:
+        tuple: (文件路径, 撤销结果, 说明)，按路径顺序
+    """
+    entries = load_run(directory, run_id)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(entries) <= 1:
+        for entry in entries:
+            yield restore_entry(entry, force)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, min(64, len(entries) // (jobs * 4)))
+        yield from executor.map(restore_entry, entries, [force] * len(entries), chunksize=chunksize)
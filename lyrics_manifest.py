@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+增量处理清单
+用 SQLite 记录每个文件上次处理时的 (大小, 修改时间, inode) 和处理结果，
+再次运行时只需一次 stat 就能跳过没有变化的文件
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+# 处理结果
+OUTCOME_CLEANED = 'cleaned'    # 已清理并写回
+OUTCOME_CLEAN = 'clean'        # 歌词无需清理
+OUTCOME_IGNORED = 'ignored'    # 没有歌词标签
+OUTCOME_PENDING = 'pending'    # 预览模式下发现需要清理，文件未修改
+OUTCOME_FAILED = 'failed'      # 处理失败
+
+# 文件没有变化时可以直接跳过的结果；失败和待清理的文件每次都重新处理
+SKIPPABLE_OUTCOMES = (OUTCOME_CLEANED, OUTCOME_CLEAN, OUTCOME_IGNORED)
+
+OUTCOME_LABELS = {
+    OUTCOME_CLEANED: '已清理',
+    OUTCOME_CLEAN: '无需清理',
+    OUTCOME_IGNORED: '无歌词标签',
+    OUTCOME_PENDING: '待清理（预览）',
+    OUTCOME_FAILED: '失败',
+}
+
+# 默认清单文件名（放在处理的文件夹下）
+DEFAULT_MANIFEST_NAME = '.lyrics_manifest.db'
+
+# 处理结果先在内存中积累，最多积累多久（秒）后一次写入
+COMMIT_INTERVAL = 1.0
+
+
+def outcome_from_result(state, removed_count, dry_run=False):
+    """把 process_audio_file 的返回值转换为清单中的处理结果"""
+    if state is None:
+        return OUTCOME_IGNORED
+    if state is False:
+        return OUTCOME_FAILED
+    if removed_count == 0:
+        return OUTCOME_CLEAN
+    return OUTCOME_PENDING if dry_run else OUTCOME_CLEANED
+
+
+class LibraryManifest:
+    """
+    文件处理清单
+
+    Args:
+        path (str): SQLite 数据库路径
+        ruleset_version (str): 当前清理规则版本；规则变化后，之前判定为
+                               已清理/无需清理的文件会重新处理
+    """
+
+    def __init__(self, path, ruleset_version=None):
+        self.path = path
+        self.ruleset_version = ruleset_version
+        self._lock = threading.Lock()
+        # 尚未写入的处理结果 {路径: 记录}
+        self._pending = {}
+        self._pending_since = 0.0
+
+        # 多个进程共享同一个清单时，等待其他进程提交而不是立即报错
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, '
+            'outcome TEXT NOT NULL, removed INTEGER NOT NULL, ruleset TEXT, updated_at REAL NOT NULL)'
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def is_unchanged(self, file_path, stat_result):
+        """
+        文件自上次处理后没有变化，且上次的结果可以直接沿用时返回 True
+
+        Args:
+            file_path (str): 文件路径
+            stat_result (os.stat_result): 文件当前的 stat 结果
+        """
+        with self._lock:
+            if self._key(file_path) in self._pending:
+                self._write_pending()
+            row = self._db.execute(
+                'SELECT size, mtime_ns, inode, outcome, ruleset FROM files WHERE path = ?',
+                (self._key(file_path),)
+            ).fetchone()
+        if row is None:
+            return False
+
+        size, mtime_ns, inode, outcome, ruleset = row
+        if (size, mtime_ns, inode) != (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino):
+            return False
+        if outcome not in SKIPPABLE_OUTCOMES:
+            return False
+        # 没有歌词的文件与规则无关；其余结果只在规则未变化时沿用
+        return outcome == OUTCOME_IGNORED or ruleset == self.ruleset_version
+
+    def record(self, file_path, stat_result, outcome, removed_count=0):
+        """记录文件的处理结果（stat_result 应为处理之后的状态）"""
+        key = self._key(file_path)
+        with self._lock:
+            # 先在内存中积累再批量写入；写事务只在批量写入时打开，
+            # 多个进程共享同一个清单时不会长时间占用写锁
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending[key] = (key, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino,
+                                  outcome, removed_count, self.ruleset_version, time.time())
+            if len(self._pending) >= 200 or time.monotonic() - self._pending_since >= COMMIT_INTERVAL:
+                self._write_pending()
+
+    def _write_pending(self):
+        """把积累的处理结果写入数据库（调用方持有锁）"""
+        if self._pending:
+            with self._db:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, outcome, removed, ruleset, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', list(self._pending.values())
+                )
+            self._pending = {}
+
+    def stats(self, root=None):
+        """
+        按处理结果汇总清单中的记录，不访问任何音频文件
+
+        Args:
+            root (str): 只统计该文件夹下的文件
+
+        Returns:
+            dict: total / outcomes（结果 -> 文件数）/ removed / stale_ruleset / last_updated
+        """
+        where, params = '', ()
+        if root:
+            prefix = os.path.join(os.path.abspath(root), '')
+            where, params = 'WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)
+
+        with self._lock:
+            self._write_pending()
+            rows = self._db.execute(
+                f'SELECT outcome, COUNT(*), SUM(removed) FROM files {where} GROUP BY outcome', params
+            ).fetchall()
+            stale, last_updated = self._db.execute(
+                f'SELECT SUM(CASE WHEN ruleset IS NOT ? THEN 1 ELSE 0 END), MAX(updated_at) FROM files {where}',
+                (self.ruleset_version,) + params
+            ).fetchone()
+
+        outcomes = {outcome: count for outcome, count, _ in rows}
+        return {
+            'total': sum(outcomes.values()),
+            'outcomes': outcomes,
+            'removed': sum(removed or 0 for outcome, _, removed in rows if outcome == OUTCOME_CLEANED),
+            'pending_removed': sum(removed or 0 for outcome, _, removed in rows if outcome == OUTCOME_PENDING),
+            'stale_ruleset': stale or 0,
+            'last_updated': last_updated,
+        }
+
+    def commit(self):
+        with self._lock:
+            self._write_pending()
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+分阶段歌词处理流水线
+扫描、读取标签、清理歌词、写回标签四个阶段通过有界 asyncio 队列连接：
+阻塞的 Mutagen 读写在线程池中执行，CPU 密集的清理在进程池中执行，每个阶段有独立的并发上限。
+下游处理不过来时上游会在队列上等待（背压），内存占用不会随文件数增长；
+每个阶段的队列深度和繁忙程度会被统计下来，用于判断瓶颈在磁盘还是 CPU。
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from library_scanner import LibraryScanner
+from lyrics_probe import probe_lyrics
+from lyrics_utils import FILE_SKIPPED, _clean_text, _init_file_worker
+from run_profile import thread_initializer
+from run_report import STAGE_BACKUP, STAGE_CLEAN, STAGE_READ, STAGE_WRITE, FileTiming
+
+
+class PipelineItem:
+    """在各阶段之间传递的单个文件"""
+
+    __slots__ = ('path', 'audio_file', 'lyrics', 'cleaned', 'removed_lines', 'removed_count', 'state',
+                 'output', 'done', 'timing')
+
+    def __init__(self, path):
+        self.path = path
+        self.timing = FileTiming()
+        self.audio_file = None
+        self.lyrics = None
+        self.cleaned = None
+        self.removed_lines = None
+        self.removed_count = 0
+        self.state = None
+        self.output = ''
+        self.done = False
+
+    def finish(self, state, removed_count=0, output=''):
+        """结束处理并释放标签和歌词占用的内存"""
+        self.state = state
+        self.removed_count = removed_count
+        self.output += output
+        self.done = True
+        self.audio_file = self.lyrics = self.cleaned = self.removed_lines = None
+
+
+class StageStats:
+    """
+    单个阶段的统计
+
+    queue_* 描述该阶段的输入队列：深度在每次入队后采样，blocked_seconds 是上游因为
+    队列已满而等待的总时间。队列经常是满的、上游等待时间长的阶段就是瓶颈。
+    """
+
+    __slots__ = ('name', 'workers', 'capacity', 'items', 'busy_seconds', 'blocked_seconds',
+                 'depth_sum', 'depth_samples', 'max_depth')
+
+    def __init__(self, name, workers, capacity):
+        self.name = name
+        self.workers = workers
+        self.capacity = capacity
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def record_depth(self, depth):
+        self.depth_sum += depth
+        self.depth_samples += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stats(self, elapsed):
+        capacity = self.workers * elapsed
+        return {
+            'name': self.name,
+            'workers': self.workers,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 4),
+            'utilization': round(self.busy_seconds / capacity, 4) if capacity else 0.0,
+            'queue_capacity': self.capacity,
+            'queue_max': self.max_depth,
+            'queue_avg': round(self.depth_sum / self.depth_samples, 2) if self.depth_samples else 0.0,
+            'blocked_seconds': round(self.blocked_seconds, 4),
+        }
+
+
+class LyricsPipeline:
+    """
+    分阶段处理流水线
+
+    Args:
+        processor (LyricsProcessor): 提供关键词、规则、缓存和备份的处理器
+        read_workers (int): 读取标签的线程数
+        clean_workers (int): 清理歌词的进程数，默认为 CPU 核数；为 0 时在事件循环线程中清理
+        write_workers (int): 写回标签（含备份）的线程数
+        queue_size (int): 每个阶段输入队列的容量
+        scan_threads (int): 扫描目录时并发列出兄弟目录的线程数
+    """
+
+    def __init__(self, processor, read_workers=4, clean_workers=None, write_workers=2, queue_size=64,
+                 scan_threads=1):
+        self.processor = processor
+        self.read_workers = max(1, read_workers)
+        self.clean_workers = (os.cpu_count() or 1) if clean_workers is None else max(0, clean_workers)
+        self.write_workers = max(1, write_workers)
+        self.queue_size = max(1, queue_size)
+        self.scan_threads = scan_threads
+        self.stage_stats = []
+        self.scanner = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """停止扫描新文件，已经进入流水线的文件会处理完"""
+        self._cancelled.set()
+
+    async def run(self, root, on_result, extensions=None, skip=None, dry_run=False, backup=False, report=None):
+        """
+        处理文件夹中的所有音频文件
+
+        Args:
+            root (str): 文件夹路径
+            on_result (callable): 每个文件处理完成后在事件循环线程中调用，
+                                  参数为 (文件路径, 处理状态, 移除的行数, 输出文本)；
+                                  结果按完成顺序产生，不保证与扫描顺序一致
+            extensions (iterable): 只处理这些扩展名，默认为处理器支持的全部格式
+            skip (callable): 在扫描线程中对每个 ScannedFile 调用，返回 True 时不处理，
+                             处理状态为 FILE_SKIPPED
+            dry_run (bool): 预览模式，不写回
+            backup (bool): 写回前创建备份
+            report (RunReport): 传入时记录扫描耗时和每个文件的分阶段耗时
+
+        Returns:
+            list: 每个阶段的统计（见 StageStats.stats）
+        """
+        processor = self.processor
+        loop = asyncio.get_running_loop()
+        perf_counter = time.perf_counter
+        started = perf_counter()
+
+        read_queue = asyncio.Queue(self.queue_size)
+        clean_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        scan_stats = StageStats('scan', 1, 0)
+        read_stats = StageStats('read', self.read_workers, self.queue_size)
+        clean_stats = StageStats('clean', max(1, self.clean_workers), self.queue_size)
+        write_stats = StageStats('write', self.write_workers, self.queue_size)
+        stages = (scan_stats, read_stats, clean_stats, write_stats)
+
+        self.scanner = LibraryScanner(extensions or processor.supported_formats, threads=self.scan_threads)
+        # 性能分析时池中的线程也被分析（run_profile.thread_initializer）
+        profile_thread = thread_initializer()
+        scan_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lyrics-scan', initializer=profile_thread)
+        read_pool = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix='lyrics-read',
+                                       initializer=profile_thread)
+        write_pool = ThreadPoolExecutor(max_workers=self.write_workers, thread_name_prefix='lyrics-write',
+                                        initializer=profile_thread)
+        clean_pool = None
+        if self.clean_workers > 0:
+            clean_pool = ProcessPoolExecutor(
+                max_workers=self.clean_workers,
+                initializer=_init_file_worker,
+                initargs=(type(processor), list(processor.header_keywords),
+                          [rule.name for rule in processor.rules if not rule.enabled],
+                          processor.rule_timing, None, None, None, processor.worker_profile_dir)
+            )
+
+        async def put(target_queue, target_stats, item):
+            if target_queue.full():
+                waited = perf_counter()
+                await target_queue.put(item)
+                target_stats.blocked_seconds += perf_counter() - waited
+            else:
+                target_queue.put_nowait(item)
+            target_stats.record_depth(target_queue.qsize())
+
+        def complete(item):
+            if report is not None:
+                report.add_file(item.timing, skipped=item.state == FILE_SKIPPED, file_path=item.path)
+            on_result(item.path, item.state, item.removed_count, item.output)
+
+        def scan_files():
+            # 在扫描线程中运行，入队时等待事件循环，队列满时自然阻塞
+            scan_started = perf_counter()
+            scanned_files = self.scanner.scan(root)
+            while not self._cancelled.is_set():
+                wall, cpu = perf_counter(), time.thread_time()
+                scanned = next(scanned_files, None)
+                if report is not None:
+                    report.add_scanned(perf_counter() - wall, time.thread_time() - cpu, scanned is not None)
+                if scanned is None:
+                    break
+                item = PipelineItem(scanned.path)
+                if skip is not None and skip(scanned):
+                    item.finish(FILE_SKIPPED)
+                scan_stats.items += 1
+                asyncio.run_coroutine_threadsafe(put(read_queue, read_stats, item), loop).result()
+            scanned_files.close()
+            scan_stats.busy_seconds = perf_counter() - scan_started - read_stats.blocked_seconds
+            if report is not None:
+                report.finish_scan()
+
+        async def scan_stage():
+            try:
+                await loop.run_in_executor(scan_pool, scan_files)
+            finally:
+                for _ in range(self.read_workers):
+                    await read_queue.put(None)
+
+        async def read_worker():
+            while True:
+                item = await read_queue.get()
+                if item is None:
+                    return
+                if not item.done:
+                    begun = perf_counter()
+                    await loop.run_in_executor(read_pool, self._read, item)
+                    read_stats.busy_seconds += perf_counter() - begun
+                    read_stats.items += 1
+                if item.done:
+                    complete(item)
+                else:
+                    await put(clean_queue, clean_stats, item)
+
+        async def clean_worker():
+            while True:
+                item = await clean_queue.get()
+                if item is None:
+                    return
+                begun = perf_counter()
+                try:
+                    await self._clean(item, loop, clean_pool)
+                except Exception as e:
+                    item.finish(False, output=f"❌ 处理文件时出错 {item.path}: {e}\n")
+                clean_stats.busy_seconds += perf_counter() - begun
+                clean_stats.items += 1
+                if item.done:
+                    complete(item)
+                elif dry_run:
+                    removed_count = len(item.removed_lines)
+                    item.finish(True, removed_count,
+                                f"🔍 {os.path.basename(item.path)} (将移除 {removed_count} 行)\n")
+                    complete(item)
+                else:
+                    await put(write_queue, write_stats, item)
+
+        async def write_worker():
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+                begun = perf_counter()
+                await loop.run_in_executor(write_pool, self._write, item, backup)
+                write_stats.busy_seconds += perf_counter() - begun
+                write_stats.items += 1
+                complete(item)
+
+        async def stage(workers, next_queue=None, next_count=0):
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for _ in range(next_count):
+                    await next_queue.put(None)
+
+        try:
+            await asyncio.gather(
+                scan_stage(),
+                stage([read_worker() for _ in range(self.read_workers)], clean_queue, clean_stats.workers),
+                stage([clean_worker() for _ in range(clean_stats.workers)], write_queue, self.write_workers),
+                stage([write_worker() for _ in range(self.write_workers)]),
+            )
+        finally:
+            scan_pool.shutdown(wait=True)
+            read_pool.shutdown(wait=True)
+            write_pool.shutdown(wait=True)
+            if clean_pool is not None:
+                clean_pool.shutdown(wait=True)
+
+        elapsed = perf_counter() - started
+        self.stage_stats = [stage_stats.stats(elapsed) for stage_stats in stages]
+        return self.stage_stats
+
+    def _read(self, item):
+        """读取阶段：探测歌词帧，解析标签并读取歌词（在读取线程中执行）"""
+        item.timing.enter(STAGE_READ)
+        try:
+            item.timing.size = os.path.getsize(item.path)
+            probe_result = probe_lyrics(item.path)
+            if not probe_result.valid:
+                item.finish(False, output=f"❌ 无效的音频文件 {item.path}: {probe_result.error}\n")
+                return
+            if probe_result.has_lyrics is False:
+                item.finish(None)
+                return
+            try:
+                item.audio_file = self.processor.open_audio_file(item.path)
+                item.lyrics = item.audio_file.read_lyrics()
+            except Exception as e:
+                item.finish(None, output=f"读取歌词时出错 {item.path}: {e}\n")
+                return
+            if not item.lyrics:
+                item.finish(None)
+        except Exception as e:
+            item.finish(False, output=f"❌ 处理文件时出错 {item.path}: {e}\n")
+        finally:
+            item.timing.finish()
+
+    async def _clean(self, item, loop, clean_pool):
+        """清理阶段：命中缓存时直接使用结果，否则交给清理进程"""
+        processor = self.processor
+        if clean_pool is None:
+            item.timing.enter(STAGE_CLEAN)
+            item.cleaned, removed_lines = processor.clean_lyrics(item.lyrics)
+            item.timing.finish()
+        else:
+            cached = None
+            if processor.cache is not None:
+                cached = processor.cache.get(item.lyrics, processor.ruleset_version)
+            if cached is not None:
+                item.cleaned, removed_lines = cached
+            else:
+                # 耗时在清理进程中测量，不含进程间传递歌词的开销
+                item.cleaned, removed_lines, rule_deltas, (wall, cpu) = await loop.run_in_executor(
+                    clean_pool, _clean_text, item.lyrics
+                )
+                item.timing.add(STAGE_CLEAN, wall, cpu)
+                processor._merge_worker_stats(rule_deltas, None)
+                if processor.cache is not None:
+                    processor.cache.put(item.lyrics, processor.ruleset_version, item.cleaned, removed_lines)
+
+        if not removed_lines:
+            item.finish(True, 0)
+        else:
+            item.removed_lines = removed_lines
+
+    def _write(self, item, backup):
+        """写回阶段：按需备份并写回清理后的歌词（在写入线程中执行）"""
+        removed_count = len(item.removed_lines)
+        item.timing.enter(STAGE_BACKUP)
+        try:
+            if backup and not self.processor.create_backup(item.path):
+                item.finish(False, output=f"❌ 备份失败: {item.path}\n")
+                return
+            if self.processor.journal is not None:
+                self.processor.journal.record(item.path, item.lyrics, item.cleaned)
+            item.timing.enter(STAGE_WRITE)
+            item.audio_file.write_lyrics(item.cleaned)
+        except Exception as e:
+            item.finish(False, output=f"保存歌词时出错 {item.path}: {e}\n")
+            return
+        finally:
+            item.timing.finish()
+        self.processor._count_write(item.audio_file)
+        item.finish(True, removed_count, f"✅ {os.path.basename(item.path)} (移除 {removed_count} 行)\n")
+
+    def iter_results(self, root, extensions=None, skip=None, dry_run=False, backup=False, report=None):
+        """
+        在后台线程中运行流水线，按完成顺序产出结果
+
+        参数同 run；产出 (文件路径, 处理状态, 移除的行数, 输出文本)。
+        调用方提前停止迭代时会停止扫描，并等待已经进入流水线的文件处理完。
+        """
+        results = queue.Queue()
+        finished = object()
+        profile_thread = thread_initializer()
+
+        def run_pipeline():
+            if profile_thread is not None:
+                profile_thread()
+            try:
+                asyncio.run(self.run(root, lambda *result: results.put(result),
+                                     extensions, skip, dry_run, backup, report))
+            except BaseException as e:
+                results.put(e)
+            finally:
+                results.put(finished)
+
+        self._cancelled.clear()
+        thread = threading.Thread(target=run_pipeline, name='lyrics-pipeline', daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            self.cancel()
+            thread.join()
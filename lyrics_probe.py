@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+歌词标签快速探测
+只读取 ID3v2 头和帧目录、FLAC 元数据块头、MP4 moov/udta/meta/ilst 原子路径，
+不解码任何标签内容，就能判断文件里有没有歌词帧以及它的位置和大小。
+用于在批量处理时跳过没有歌词的文件，并在 mutagen 抛出异常之前拒绝损坏的文件。
+"""
+
+import os
+import struct
+
+# 没有 ID3 头的 MP3 至少要在开头这么多字节内出现 MPEG 帧头
+MPEG_SYNC_SEARCH_BYTES = 8192
+# 最长的 MPEG 帧（MPEG-2 Layer II 160 kbps / 8 kHz 为 2881 字节），用于读取紧随其后的第二个帧头
+MPEG_MAX_FRAME_BYTES = 2881
+
+# MPEG 比特率表（kbps），按 (是否 MPEG-1, 层) 索引，下标为帧头中的比特率索引 1~14
+_MPEG_BITRATES = {
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# 采样率表（Hz），按帧头中的版本位索引：0 = MPEG-2.5，2 = MPEG-2，3 = MPEG-1
+_MPEG_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+class LyricsProbe:
+    """
+    探测结果
+
+    Attributes:
+        format (str): 文件格式（扩展名，如 '.flac'）
+        valid (bool): 文件结构是否有效；为 False 时 error 说明原因
+        has_lyrics (bool): 是否有歌词帧；None 表示无法确定（需要完整解析）
+        offset (int): 歌词帧/条目/原子在文件中的偏移
+        size (int): 歌词帧/条目/原子的大小（字节）
+        error (str): 无效时的原因
+    """
+
+    __slots__ = ('format', 'valid', 'has_lyrics', 'offset', 'size', 'error')
+
+    def __init__(self, file_format, valid=True, has_lyrics=None, offset=None, size=None, error=None):
+        self.format = file_format
+        self.valid = valid
+        self.has_lyrics = has_lyrics
+        self.offset = offset
+        self.size = size
+        self.error = error
+
+    def __repr__(self):
+        if not self.valid:
+            return f"LyricsProbe({self.format!r}, invalid: {self.error})"
+        return f"LyricsProbe({self.format!r}, has_lyrics={self.has_lyrics}, offset={self.offset}, size={self.size})"
+
+
+class _Invalid(Exception):
+    """文件结构无效"""
+
+
+class _Unknown(Exception):
+    """结构超出探测器的处理范围，需要完整解析"""
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise _Invalid("文件被截断")
+    return data
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_tag_size(header):
+    """解析 10 字节 ID3v2 头，返回 (主版本号, 标志, 标签体大小)"""
+    major, flags = header[3], header[5]
+    if major not in (2, 3, 4) or any(b & 0x80 for b in header[6:10]):
+        raise _Invalid("ID3v2 头无效")
+    return major, flags, _syncsafe(header[6:10])
+
+
+def _mpeg_frame(data, index):
+    """
+    解析 data[index:] 处的 MPEG 音频帧头
+
+    Returns:
+        tuple: ((版本, 层, 采样率), 帧长度)；不是有效帧头时返回 None
+    """
+    if index + 4 > len(data) or data[index] != 0xFF or data[index + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[index + 1], data[index + 2], data[index + 3]
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    # 保留的版本、层和采样率，自由格式（0）和无效（15）的比特率，保留的加重方式
+    if version == 1 or layer == 4 or not 0 < bitrate_index < 15 or sample_rate_index == 3 or b3 & 0x03 == 2:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MPEG_BITRATES[mpeg1, layer][bitrate_index - 1] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        length = 144 * bitrate // sample_rate + padding
+    return (version, layer, sample_rate), length
+
+
+def _find_mpeg_audio(head, file_size):
+    """在文件开头的数据中查找有效的 MPEG 帧头，并确认帧结束处是同类的下一个帧头（或文件结尾）"""
+    index = head.find(b'\xff')
+    while 0 <= index < MPEG_SYNC_SEARCH_BYTES:
+        frame = _mpeg_frame(head, index)
+        if frame is not None:
+            stream, length = frame
+            next_index = index + length
+            if next_index == file_size or head[next_index:next_index + 3] == b'TAG':
+                return True  # 只有一帧，后面是文件结尾或 ID3v1 标签
+            following = _mpeg_frame(head, next_index)
+            if following is not None and following[0] == stream:
+                return True
+        index = head.find(b'\xff', index + 1)
+    return False
+
+
+def _probe_id3(f, file_size):
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        # 没有 ID3v2 标签：不可能有歌词帧，但要确认确实是 MPEG 音频（两个连续的有效帧头），
+        # 否则交给 mutagen 完整解析
+        f.seek(0)
+        head = header + f.read(MPEG_SYNC_SEARCH_BYTES + MPEG_MAX_FRAME_BYTES + 4)
+        if _find_mpeg_audio(head, file_size):
+            return LyricsProbe('.mp3', has_lyrics=False)
+        raise _Unknown()
+
+    major, flags, tag_size = _id3_tag_size(header)
+    if flags & 0x80 and major < 4:
+        # 整个标签经过反同步处理，帧头也可能被改写
+        raise _Unknown()
+
+    position = 10
+    end = min(10 + tag_size, file_size)
+    if flags & 0x40:
+        # 扩展头
+        ext = _read_exact(f, 4)
+        if major == 4:
+            position += _syncsafe(ext)
+        else:
+            position += 4 + struct.unpack('>I', ext)[0]
+
+    if major == 2:
+        header_size, lyrics_ids = 6, (b'ULT',)
+    else:
+        header_size, lyrics_ids = 10, (b'USLT',)
+
+    while position + header_size <= end:
+        f.seek(position)
+        frame_header = _read_exact(f, header_size)
+        if frame_header[0] == 0:
+            break  # 填充区
+        if major == 2:
+            frame_id = frame_header[:3]
+            frame_size = int.from_bytes(frame_header[3:6], 'big')
+        else:
+            frame_id = frame_header[:4]
+            frame_size = (_syncsafe(frame_header[4:8]) if major == 4
+                          else struct.unpack('>I', frame_header[4:8])[0])
+        if not all(48 <= b <= 57 or 65 <= b <= 90 for b in frame_id):
+            # 帧 ID 只能是大写字母和数字，否则帧目录已经错位
+            raise _Unknown()
+        if frame_id in lyrics_ids:
+            return LyricsProbe('.mp3', has_lyrics=True, offset=position, size=header_size + frame_size)
+        position += header_size + frame_size
+
+    return LyricsProbe('.mp3', has_lyrics=False)
+
+
+def _probe_flac(f, file_size):
+    magic = _read_exact(f, 4)
+    position = 0
+    if magic[:3] == b'ID3':
+        # 部分 FLAC 文件前面带有 ID3 标签
+        major, flags, tag_size = _id3_tag_size(magic + _read_exact(f, 6))
+        position = 10 + tag_size + (10 if flags & 0x10 else 0)
+        f.seek(position)
+        magic = _read_exact(f, 4)
+    if magic != b'fLaC':
+        raise _Invalid("不是有效的 FLAC 文件")
+    position += 4
+
+    while True:
+        block_header = _read_exact(f, 4)
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7F
+        block_size = int.from_bytes(block_header[1:4], 'big')
+        if block_type == 127:
+            raise _Invalid("FLAC 元数据块类型无效")
+        if block_type == 4:
+            # VORBIS_COMMENT：只读取每个条目的长度和键名
+            entry = _find_vorbis_lyrics(f, position + 4, position + 4 + block_size)
+            if entry is None:
+                return LyricsProbe('.flac', has_lyrics=False)
+            return LyricsProbe('.flac', has_lyrics=True, offset=entry[0], size=entry[1])
+        position += 4 + block_size
+        if is_last or position >= file_size:
+            return LyricsProbe('.flac', has_lyrics=False)
+        f.seek(position)
+
+
+def _find_vorbis_lyrics(f, start, end):
+    """在 Vorbis 注释块中查找 LYRICS= 条目，返回 (偏移, 大小)"""
+    f.seek(start)
+    vendor_length = struct.unpack('<I', _read_exact(f, 4))[0]
+    position = start + 4 + vendor_length
+    f.seek(position)
+    count = struct.unpack('<I', _read_exact(f, 4))[0]
+    position += 4
+
+    for _ in range(count):
+        if position + 4 > end:
+            raise _Unknown()
+        length = struct.unpack('<I', _read_exact(f, 4))[0]
+        key = f.read(min(length, 7))
+        if key.upper() == b'LYRICS=':
+            return position, 4 + length
+        position += 4 + length
+        f.seek(position)
+    return None
+
+
+def _iter_atoms(f, start, end):
+    """遍历 [start, end) 范围内的 MP4 原子，产出 (类型, 数据起点, 原子起点, 原子终点)"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, atom_type = struct.unpack('>I4s', _read_exact(f, 8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', _read_exact(f, 8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            raise _Invalid("MP4 原子大小无效")
+        yield atom_type, position + header_size, position, min(position + size, end)
+        position += size
+
+
+def _find_atom(f, start, end, atom_type):
+    for found_type, data_start, atom_start, atom_end in _iter_atoms(f, start, end):
+        if found_type == atom_type:
+            return data_start, atom_start, atom_end
+    return None
+
+
+def _probe_mp4(f, file_size):
+    moov = _find_atom(f, 0, file_size, b'moov')
+    if moov is None:
+        raise _Invalid("不是有效的 MP4 文件")
+
+    udta = _find_atom(f, moov[0], moov[2], b'udta')
+    if udta is None:
+        return LyricsProbe('.m4a', has_lyrics=False)
+    meta = _find_atom(f, udta[0], udta[2], b'meta')
+    if meta is None:
+        return LyricsProbe('.m4a', has_lyrics=False)
+    # meta 是完整原子（4 字节版本和标志）
+    ilst = _find_atom(f, meta[0] + 4, meta[2], b'ilst')
+    if ilst is None:
+        return LyricsProbe('.m4a', has_lyrics=False)
+    lyrics = _find_atom(f, ilst[0], ilst[2], b'\xa9lyr')
+    if lyrics is None:
+        return LyricsProbe('.m4a', has_lyrics=False)
+    return LyricsProbe('.m4a', has_lyrics=True, offset=lyrics[1], size=lyrics[2] - lyrics[1])
+
+
+PROBES = {
+    '.mp3': _probe_id3,
+    '.flac': _probe_flac,
+    '.m4a': _probe_mp4,
+}
+
+
+def probe_lyrics(file_path):
+    """
+    探测音频文件中是否有歌词帧
+
+    Args:
+        file_path (str): 音频文件路径
+
+    Returns:
+        LyricsProbe: 探测结果；has_lyrics 为 None 时需要完整解析才能确定
+    """
+    file_format = os.path.splitext(file_path)[1].lower()
+    probe = PROBES.get(file_format)
+    if probe is None:
+        return LyricsProbe(file_format, valid=False, error="不支持的文件类型")
+
+    try:
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size == 0:
+                return LyricsProbe(file_format, valid=False, error="空文件")
+            return probe(f, file_size)
+    except _Invalid as e:
+        return LyricsProbe(file_format, valid=False, error=str(e))
+    except _Unknown:
+        return LyricsProbe(file_format)
+    except OSError as e:
+        return LyricsProbe(file_format, valid=False, error=str(e))
+
+
+def _is_flac_frame_sync(data):
+    return len(data) >= 2 and data[0] == 0xFF and data[1] & 0xFE == 0xF8
+
+
+def tag_block_size(f, file_format):
+    """
+    文件开头标签区域的大小：MP3 为 ID3v2 标签，FLAC 为可选的 ID3 前缀、fLaC 标记和全部元数据块。
+    其后全部是音频数据，改写歌词不会影响它们。
+
+    Args:
+        f: 以二进制模式打开的文件
+        file_format (str): 扩展名，如 '.flac'
+
+    Returns:
+        int: 字节数；MP4（元数据可能在音频数据之后）或结构无法识别时返回 None
+    """
+    try:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(0)
+        if file_format == '.mp3':
+            header = _read_exact(f, 10)
+            if header[:3] != b'ID3':
+                return None
+            _, flags, tag_size = _id3_tag_size(header)
+            size = 10 + tag_size + (10 if flags & 0x10 else 0)
+            return size if size <= file_size else None
+
+        if file_format != '.flac':
+            return None
+        magic = _read_exact(f, 4)
+        position = 0
+        if magic[:3] == b'ID3':
+            _, flags, tag_size = _id3_tag_size(magic + _read_exact(f, 6))
+            position = 10 + tag_size + (10 if flags & 0x10 else 0)
+            f.seek(position)
+            magic = _read_exact(f, 4)
+        if magic != b'fLaC':
+            return None
+        position += 4
+        while True:
+            block_header = _read_exact(f, 4)
+            position += 4 + int.from_bytes(block_header[1:4], 'big')
+            if block_header[0] & 0x80:
+                break
+            f.seek(position)
+        # 元数据块之后必须是音频帧的同步码，否则块大小不可信（超大的注释或封面块）
+        f.seek(position)
+        if position == file_size or _is_flac_frame_sync(f.read(2)):
+            return position
+        return None
+    except _Invalid:
+        return None
+
+
+def metadata_size(file_path):
+    """
+    改写歌词时需要重写的元数据大小：MP3 / FLAC 为开头的标签区域，MP4 为 moov 原子
+
+    Returns:
+        int: 字节数；无法识别时返回 None
+    """
+    file_format = os.path.splitext(file_path)[1].lower()
+    try:
+        with open(file_path, 'rb') as f:
+            if file_format != '.m4a':
+                return tag_block_size(f, file_format)
+            moov = _find_atom(f, 0, os.fstat(f.fileno()).st_size, b'moov')
+            return moov[2] - moov[1] if moov is not None else None
+    except (OSError, _Invalid):
+        return None
@@ -4,12 +4,416 @@
 提供歌词清理和音频文件处理的公共函数
 """
 
+import contextlib
+import hashlib
+import io
+import multiprocessing.util
 import os
 import re
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from mutagen import PaddingInfo
 from mutagen.flac import FLAC
 from mutagen.id3 import ID3, USLT
 from mutagen.mp3 import MP3
 from mutagen.mp4 import MP4
+from backup_store import METHOD_COPY, METHOD_HARDLINK, METHOD_REFLINK, BackupStore, clone_file, copy_range, reflink_file
+from lyrics_cache import LyricsCache
+from lyrics_journal import UndoJournal
+from lyrics_probe import metadata_size, probe_lyrics, tag_block_size
+from run_profile import start_worker_profile
+from run_report import STAGE_BACKUP, STAGE_CLEAN, STAGE_READ, STAGE_WRITE, FileTiming
+
+# 清理规则版本，修改移除规则的逻辑后需要递增，使旧的缓存结果失效
+RULESET_VERSION = 1
+
+# LRC 头部标签，如 [ti:] [ar:] [al:] [by:] [offset:]
+LRC_HEADER_TAG_RE = re.compile(
+    r'^\s*\[(ti|ar|al|by|offset|re|ve|kana|language|length|id):.*\]\s*$', re.IGNORECASE
+)
+# 一个或多个前置时间戳（可带前导空白），第 1 组为第一个时间戳
+TIMESTAMP_PREFIX_RE = re.compile(
+    r'(\s*\[(\d{1,2}):(\d{1,2})(?:[.:](\d{1,3}))?\])(?:\s*\[\d{1,2}:\d{1,2}(?:[.:]\d{1,3})?\])*'
+)
+# 行内任意位置的时间戳 [xx:xx.xx] / [xx:xx]
+TIMESTAMP_RE = re.compile(r'\[(\d{1,2}):(\d{1,2})(?:[.:](\d{1,3}))?\]')
+# 标题 - 歌手 形式的内容
+TITLE_ARTIST_RE = re.compile(r'.+\s*[-—–－]\s*.+')
+# 与 str.splitlines() 相同的换行符集合
+LINE_BREAK_RE = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+# process_audio_files 中被 skip 跳过的文件的处理状态
+FILE_SKIPPED = 'skipped'
+
+# save_cleaned_copy 的方式：重新生成的标签和原音频数据一次写出
+METHOD_SINGLE_PASS = 'single_pass'
+
+
+class LrcLine:
+    """
+    单行歌词的解析结果
+
+    Attributes:
+        raw (str): 原始行
+        text (str): 去掉行首 BOM 后的行
+        bom (bool): 行首是否带 BOM
+        tag (str): LRC 头部标签名（小写），不是头部标签时为 None
+        content (str): 去掉全部前置时间戳后的内容（已去除首尾空白）
+        first_time (tuple): 第一个前置时间戳的 (分, 秒)，没有时为 None
+        first_end (int): 第一个前置时间戳在 text 中的结束位置
+        prefix_end (int): 全部前置时间戳在 text 中的结束位置
+        has_bracket (bool): 行内是否出现过 '['
+    """
+
+    __slots__ = ('raw', 'text', 'bom', 'tag', 'content', 'first_time', 'first_end', 'prefix_end', 'has_bracket')
+
+    def __init__(self, raw, text, bom, tag, content, first_time, first_end, prefix_end, has_bracket):
+        self.raw = raw
+        self.text = text
+        self.bom = bom
+        self.tag = tag
+        self.content = content
+        self.first_time = first_time
+        self.first_end = first_end
+        self.prefix_end = prefix_end
+        self.has_bracket = has_bracket
+
+    @property
+    def timestamps(self):
+        """全部前置时间戳 [(分, 秒, 小数部分字符串或 None), ...]"""
+        return [
+            (int(minute), int(second), fraction or None)
+            for minute, second, fraction in TIMESTAMP_RE.findall(self.text, 0, self.prefix_end)
+        ]
+
+    def __repr__(self):
+        return f"LrcLine({self.raw!r})"
+
+
+def tokenize_lrc_line(line):
+    """
+    一次扫描把一行歌词解析为 LrcLine
+
+    不含 '[' 的行不会有时间戳或头部标签，直接跳过所有正则匹配。
+    """
+    text = line.lstrip('\ufeff')  # 兼容部分歌词开头 BOM
+    bom = len(text) != len(line)
+
+    if '[' not in text:
+        return LrcLine(line, text, bom, None, text.strip(), None, 0, 0, False)
+
+    match = TIMESTAMP_PREFIX_RE.match(text)
+    if match is None:
+        # 头部标签和时间戳互斥：前者方括号后是字母，后者是数字
+        tag_match = LRC_HEADER_TAG_RE.match(text)
+        tag = tag_match.group(1).lower() if tag_match else None
+        return LrcLine(line, text, bom, tag, text.strip(), None, 0, 0, True)
+
+    prefix_end = match.end()
+    return LrcLine(
+        line, text, bom, None, text[prefix_end:].strip(),
+        (int(match.group(2)), int(match.group(3))), match.end(1), prefix_end, True
+    )
+
+
+def iter_lyrics_lines(source):
+    """
+    逐行读取歌词，换行规则与 str.splitlines() 一致
+
+    Args:
+        source: 歌词字符串，或按块产出字符串的可迭代对象（如文本文件对象）
+
+    Yields:
+        str: 不含换行符的一行
+    """
+    if isinstance(source, str):
+        source = (source,)
+
+    pending = ''
+    for chunk in source:
+        if not chunk:
+            continue
+        data = pending + chunk if pending else chunk
+        start = 0
+        end = len(data)
+        for match in LINE_BREAK_RE.finditer(data):
+            if match.end() == end and match.group() == '\r':
+                # 末尾的 \r 可能与下一块开头的 \n 组成 \r\n，留到下一块再处理
+                break
+            yield data[start:match.start()]
+            start = match.end()
+        pending = data[start:]
+
+    if pending:
+        yield pending[:-1] if pending.endswith('\r') else pending
+
+
+def rule_lrc_header_tag(lrc_line, keyword_matcher):
+    """LRC 头部标签，如 [ti:] [ar:] [al:] [by:] [offset:]"""
+    return lrc_line.tag is not None
+
+
+def rule_title_line(lrc_line, keyword_matcher):
+    """00:00 的标题元信息行，例如 [00:00.10]不如这样 - 陈奕迅"""
+    if lrc_line.first_time != (0, 0):
+        return False
+    if lrc_line.first_end == lrc_line.prefix_end:
+        content = lrc_line.content
+    else:
+        content = lrc_line.text[lrc_line.first_end:].strip()
+    return content == "" or TITLE_ARTIST_RE.search(content) is not None
+
+
+def rule_timestamp_keyword(lrc_line, keyword_matcher):
+    """带时间戳且以杂项关键词开头的行（英文大小写不敏感）"""
+    if not keyword_matcher.matches(lrc_line.content.lower()):
+        return False
+    return lrc_line.first_time is not None or TIMESTAMP_RE.search(lrc_line.text) is not None
+
+
+# 默认清理规则：(名称, 相对开销, 判断函数, 是否只作用于含 '[' 的行)
+DEFAULT_RULES = (
+    ('lrc_header_tag', 1, rule_lrc_header_tag, True),
+    ('title_line', 2, rule_title_line, True),
+    ('timestamp_keyword', 3, rule_timestamp_keyword, True),
+)
+
+
+class LyricsRule:
+    """
+    一条歌词移除规则
+
+    Attributes:
+        name (str): 规则名称
+        cost (int): 相对开销，编译后按开销从小到大依次判断
+        check (callable): check(lrc_line, keyword_matcher) -> bool
+        needs_bracket (bool): 是否只作用于含 '[' 的行
+        enabled (bool): 是否启用
+        hits (int): 命中次数
+        evaluations (int): 判断次数（开启计时后统计）
+        seconds (float): 累计耗时（开启计时后统计）
+    """
+
+    __slots__ = ('name', 'cost', 'check', 'needs_bracket', 'enabled', 'hits', 'evaluations', 'seconds')
+
+    def __init__(self, name, cost, check, needs_bracket=True, enabled=True):
+        self.name = name
+        self.cost = cost
+        self.check = check
+        self.needs_bracket = needs_bracket
+        self.enabled = enabled
+        self.hits = 0
+        self.evaluations = 0
+        self.seconds = 0.0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.evaluations = 0
+        self.seconds = 0.0
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'enabled': self.enabled,
+            'cost': self.cost,
+            'hits': self.hits,
+            'evaluations': self.evaluations,
+            'seconds': self.seconds,
+        }
+
+    def __repr__(self):
+        return f"LyricsRule({self.name!r}, cost={self.cost}, enabled={self.enabled})"
+
+
+class LyricsCleanStream:
+    """
+    流式清理结果
+
+    迭代得到保留的歌词行；迭代过程中累计被移除的行数，
+    只有 keep_removed=True 时才保存被移除的行。
+    """
+
+    def __init__(self, processor, source, keep_removed=False, verbose=False):
+        self._processor = processor
+        self._source = source
+        self._verbose = verbose
+        self.removed_count = 0
+        self.removed_lines = [] if keep_removed else None
+
+    def __iter__(self):
+        is_header_line = self._processor._is_header_line
+        keyword_matcher = self._processor._get_keyword_matcher()
+        removed_lines = self.removed_lines
+        verbose = self._verbose
+
+        for line in iter_lyrics_lines(self._source):
+            if is_header_line(tokenize_lrc_line(line), keyword_matcher):
+                self.removed_count += 1
+                if removed_lines is not None:
+                    removed_lines.append(line)
+                if verbose:
+                    print(f"移除行: {line}")
+                continue
+            yield line
+
+
+class KeywordMatcher:
+    """
+    关键词前缀匹配器（前缀树）
+
+    构建一次后，判断文本是否以任一关键词开头只需沿树走几个字符，
+    不再逐个关键词调用 startswith。只关心"是否命中"，因此某个关键词
+    若以另一个更短的关键词为前缀（如 '作词：' 与 '作词'），会被合并掉。
+    """
+
+    def __init__(self, keywords=()):
+        self._root = {}
+        self._match_all = False
+        for keyword in keywords:
+            self.add(keyword)
+
+    def add(self, keyword):
+        """添加一个（已转换为小写的）关键词"""
+        if not keyword:
+            # 空关键词对任何文本都成立，与 str.startswith('') 一致
+            self._match_all = True
+            return
+
+        node = self._root
+        for ch in keyword[:-1]:
+            child = node.get(ch)
+            if child is True:
+                # 已有更短的关键词覆盖了它
+                return
+            if child is None:
+                child = node[ch] = {}
+            node = child
+        # 叶子直接标记为命中，丢弃以它为前缀的更长关键词
+        node[keyword[-1]] = True
+
+    def matches(self, text):
+        """判断 text 是否以任一关键词开头"""
+        if self._match_all:
+            return True
+        node = self._root
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                return False
+            if node is True:
+                return True
+        return False
+
+
+class AudioLyricsFile:
+    """
+    音频文件歌词句柄
+
+    打开时只解析一次标签（FLAC / ID3 / MP4），之后的读取和写回都复用
+    同一个解析结果，不会重复打开和解析文件。
+
+    写回后 in_place 表示是否原地更新（标签总大小不变，只改写文件头部）。
+    """
+
+    def __init__(self, file_path):
+        self.path = file_path
+        self.ext = os.path.splitext(file_path)[1].lower()
+        self.in_place = None
+
+        if self.ext == '.flac':
+            self.tags = FLAC(file_path)
+        elif self.ext == '.mp3':
+            self.tags = ID3(file_path)
+        elif self.ext == '.m4a':
+            self.tags = MP4(file_path)
+        else:
+            raise ValueError(f"不支持的文件类型: {self.ext}")
+
+    def read_lyrics(self):
+        """
+        读取歌词
+
+        Returns:
+            str: 歌词文本，如果没有歌词则返回空字符串
+        """
+        if self.ext == '.flac':
+            return self.tags.get('lyrics', [''])[0] if 'lyrics' in self.tags else ""
+
+        if self.ext == '.mp3':
+            # ID3 的 USLT 帧键名带描述和语言（如 USLT::chi），需要按帧类型查找
+            frames = self.tags.getall('USLT')
+            return frames[0].text if frames else ""
+
+        return self.tags.get('©lyr', [''])[0] if '©lyr' in self.tags else ""
+
+    def _set_lyrics(self, lyrics_text):
+        if self.ext == '.flac':
+            self.tags['lyrics'] = [lyrics_text]
+
+        elif self.ext == '.mp3':
+            frames = self.tags.getall('USLT')
+            if frames:
+                frames[0].text = lyrics_text
+            else:
+                self.tags.add(USLT(encoding=3, lang='chi', desc='', text=lyrics_text))
+
+        else:
+            self.tags['©lyr'] = [lyrics_text]
+
+    def write_lyrics(self, lyrics_text):
+        """写入歌词并保存文件（失败时抛出异常）"""
+        self._set_lyrics(lyrics_text)
+        self.in_place = False
+        self.tags.save(padding=self._keep_tag_size)
+
+    def write_lyrics_to(self, dest_path, lyrics_text):
+        """
+        写入歌词后保存到另一个文件，原文件不变
+
+        只在内存中重新生成开头的标签区域，再把原文件的音频数据接在后面，目标文件只写一遍。
+
+        Returns:
+            int: 写入的字节数；标签不在文件开头（MP4）或结构无法识别时返回 None，不创建目标文件
+        """
+        with open(self.path, 'rb') as src:
+            head_size = tag_block_size(src, self.ext)
+            if head_size is None:
+                return None
+            src.seek(0)
+            head = io.BytesIO(src.read(head_size))
+            audio_start = src.read(2)
+            audio_size = os.fstat(src.fileno()).st_size - head_size
+
+            self._set_lyrics(lyrics_text)
+            self.in_place = False
+            # 内存中只有标签区域，填充策略仍按整个文件的大小计算，与保存到原文件时一致
+            self.tags.save(head, padding=lambda info: self._keep_tag_size(
+                PaddingInfo(info.padding, info.size + audio_size)))
+            new_head = head.getvalue()
+            if tag_block_size(io.BytesIO(new_head + audio_start), self.ext) != len(new_head):
+                return None
+
+            with open(dest_path, 'wb') as dst:
+                dst.write(new_head)
+                copy_range(src, dst, head_size, audio_size)
+        return len(new_head) + audio_size
+
+    def _keep_tag_size(self, info):
+        """
+        Mutagen 的填充回调
+
+        新标签放得下时把省出的空间全部留作填充（ID3 填充 / FLAC PADDING 块 / MP4 free 原子），
+        标签总大小不变，只改写文件头部；默认策略在填充过大时会缩小填充，导致整个文件重写。
+        放不下时才按默认策略扩展。
+        """
+        if info.padding >= 0:
+            self.in_place = True
+            return info.padding
+        return info.get_default_padding()
 
 
 class LyricsProcessor:
@@ -52,9 +456,167 @@ class LyricsProcessor:
             'Orchestration by', 'Drum Programming', 'Drums by', 'Violin and Viola by',
             'Vocals recorded by', '©'
         ]
-        self.header_keywords_lower = [kw.lower() for kw in self.header_keywords]        
+        self._keyword_snapshot = None
+        self._keyword_matcher = None
+        self._ruleset_version = None
+        self._get_keyword_matcher()
         # 支持的音频格式
         self.supported_formats = {'.mp3', '.flac', '.m4a'}
+        # 清理结果缓存，默认关闭，通过 enable_cache 开启
+        self.cache = None
+        # 撤销日志，默认关闭，通过 enable_journal 开启
+        self.journal = None
+        # 内容寻址的备份库，为 None 时备份到原文件旁边的 .backup 文件
+        self.backup_store = None
+        # 性能分析时工作进程写出分析结果的目录（见 run_profile.RunProfiler），为 None 时不分析
+        self.worker_profile_dir = None
+        self._stats_lock = threading.Lock()
+        self.reset_backup_stats()
+        self.reset_write_stats()
+        # 移除规则，按开销从小到大编译；rule_timing 为 True 时统计每条规则的耗时
+        self.rules = [LyricsRule(name, cost, check, needs_bracket)
+                      for name, cost, check, needs_bracket in DEFAULT_RULES]
+        self.rule_timing = False
+        self.compile_rules()
+
+    def _get_keyword_matcher(self):
+        """
+        获取关键词匹配器
+
+        header_keywords 在运行时被修改（追加、删除或替换）后会自动重建，
+        未修改时只需一次元组比较。
+        """
+        snapshot = tuple(self.header_keywords)
+        if snapshot != self._keyword_snapshot:
+            self.header_keywords_lower = [kw.lower() for kw in snapshot]
+            self._keyword_matcher = KeywordMatcher(self.header_keywords_lower)
+            self._keyword_snapshot = snapshot
+            self._ruleset_version = None
+        return self._keyword_matcher
+
+    def compile_rules(self):
+        """
+        编译移除规则：只保留启用的规则并按开销排序
+
+        修改 rules 中规则的 enabled / cost 后需要重新调用。
+        """
+        active = sorted((rule for rule in self.rules if rule.enabled), key=lambda rule: rule.cost)
+        self._bracket_rules = tuple(active)
+        self._plain_rules = tuple(rule for rule in active if not rule.needs_bracket)
+        self._ruleset_version = None
+
+    def set_rule_enabled(self, name, enabled=True):
+        """启用或禁用指定名称的规则"""
+        for rule in self.rules:
+            if rule.name == name:
+                rule.enabled = enabled
+                self.compile_rules()
+                return
+        raise KeyError(f"未知的规则: {name}")
+
+    def rule_stats(self):
+        """
+        返回每条规则的命中次数和耗时
+
+        命中缓存的歌词不会经过规则判断，不计入统计。
+        """
+        return [rule.stats() for rule in self.rules]
+
+    def reset_rule_stats(self):
+        """清零规则统计"""
+        for rule in self.rules:
+            rule.reset_stats()
+
+    @property
+    def ruleset_version(self):
+        """当前清理规则的版本标识（规则版本号 + 启用的规则 + 关键词列表的哈希）"""
+        self._get_keyword_matcher()
+        if self._ruleset_version is None:
+            rule_names = [rule.name for rule in self._bracket_rules]
+            digest = hashlib.blake2b(
+                '\n'.join(rule_names + ['--'] + list(self._keyword_snapshot)).encode('utf-8', 'surrogatepass'),
+                digest_size=8
+            ).hexdigest()
+            self._ruleset_version = f"{RULESET_VERSION}-{digest}"
+        return self._ruleset_version
+
+    def enable_cache(self, max_entries=10000, max_bytes=64 * 1024 * 1024, path=None):
+        """
+        开启清理结果缓存
+
+        Args:
+            max_entries (int): 内存中最多缓存的条目数
+            max_bytes (int): 内存缓存的字节预算
+            path (str): 磁盘缓存文件路径，为 None 时只使用内存缓存
+
+        Returns:
+            LyricsCache: 缓存实例
+        """
+        self.cache = LyricsCache(max_entries=max_entries, max_bytes=max_bytes, path=path)
+        return self.cache
+
+    def enable_journal(self, directory, run_id=None):
+        """
+        开启撤销日志：写回清理结果之前记录原始歌词
+
+        Args:
+            directory (str): 日志目录
+            run_id (str): 运行 ID，为 None 时生成新的运行 ID
+
+        Returns:
+            UndoJournal: 日志实例
+        """
+        self.journal = UndoJournal(directory, run_id)
+        return self.journal
+
+    def enable_backup_store(self, directory):
+        """
+        把整文件备份保存到内容寻址的备份库，相同内容只保存一份
+
+        Returns:
+            BackupStore: 备份库实例
+        """
+        self.backup_store = BackupStore(directory)
+        return self.backup_store
+
+    def reset_backup_stats(self):
+        """清零备份统计"""
+        self._backups = 0
+        self._backup_bytes = 0
+        self._backup_methods = {}
+
+    def backup_stats(self):
+        """返回备份数、实际写入的字节数和各备份方式（reflink / copy_file_range / copy / dedup）的次数"""
+        return {
+            'backups': self._backups,
+            'bytes_written': self._backup_bytes,
+            'methods': dict(self._backup_methods),
+        }
+
+    def reset_write_stats(self):
+        """清零写回统计"""
+        self._writes_in_place = 0
+        self._writes_rewritten = 0
+
+    def write_stats(self):
+        """返回写回统计：原地更新的文件数和需要重写整个文件的文件数"""
+        return {'in_place': self._writes_in_place, 'rewritten': self._writes_rewritten}
+
+    def _count_write(self, audio_file):
+        with self._stats_lock:
+            if audio_file.in_place:
+                self._writes_in_place += 1
+            else:
+                self._writes_rewritten += 1
+
+    def cache_stats(self):
+        """返回缓存命中统计，未开启缓存时返回 None"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def add_header_keywords(self, *keywords):
+        """运行时追加杂项关键词"""
+        self.header_keywords.extend(keywords)
+        self._get_keyword_matcher()
     
     def clean_lyrics(self, lyrics_text, verbose=False):
         """
@@ -69,55 +631,52 @@ class LyricsProcessor:
         """
         if not lyrics_text:
             return "", []
-        
+
+        cache = self.cache
+        if cache is None:
+            return self._clean_lyrics(lyrics_text, verbose)
+
+        ruleset_version = self.ruleset_version
+        cached = cache.get(lyrics_text, ruleset_version)
+        if cached is not None:
+            clean_text, removed_lines = cached
+            if verbose:
+                for line in removed_lines:
+                    print(f"移除行: {line}")
+            return clean_text, list(removed_lines)
+
+        clean_text, removed_lines = self._clean_lyrics(lyrics_text, verbose)
+        cache.put(lyrics_text, ruleset_version, clean_text, removed_lines)
+        return clean_text, removed_lines
+
+    def _clean_lyrics(self, lyrics_text, verbose=False):
+        """不经过缓存的歌词清理"""
+        keyword_matcher = self._get_keyword_matcher()
+        if self.rule_timing:
+            is_header_line = self._is_header_line
+        else:
+            is_header_line = None
+            bracket_rules = self._bracket_rules
+            plain_rules = self._plain_rules
+
         # 兼容 \n / \r\n / \r 各种换行
         lines = lyrics_text.splitlines()
         pure_lyrics_lines = []
         removed_lines = []
         
         for line in lines:
-            line_for_match = line.lstrip('\ufeff')  # 兼容部分歌词开头 BOM
-
-            # 移除 LRC 头部标签，如 [ti:] [ar:] [al:] [by:] [offset:]
-            if re.search(r'^\s*\[(ti|ar|al|by|offset|re|ve|kana|language|length|id):.*\]\s*$', line_for_match, re.IGNORECASE):
-                removed_lines.append(line)
-                if verbose:
-                    print(f"移除行: {line}")
-                continue
-
-            timestamp_match = re.match(
-                r'^\s*\[(\d{1,2}):(\d{1,2})(?:[.:](\d{1,3}))?\]\s*(.*)$',
-                line_for_match
-            )
-
-            # 移除 00:00.xx 的标题元信息行，例如 [00:00.10]不如这样 - 陈奕迅
-            if timestamp_match:
-                minute = int(timestamp_match.group(1))
-                second = int(timestamp_match.group(2))
-                content = timestamp_match.group(4).strip()
-
-                if minute == 0 and second == 0:
-                    is_title_artist = re.search(r'.+\s*[-—–－]\s*.+', content) is not None
-                    if content == "" or is_title_artist:
-                        removed_lines.append(line)
-                        if verbose:
-                            print(f"移除行: {line}")
-                        continue
-
-            timestamp_prefix_pattern = r'^(?:\s*\[\d{1,2}:\d{1,2}(?:[.:]\d{1,3})?\])+\s*'
-            # 检查是否包含时间戳 [xx:xx.xx] / [xx:xx]
-            has_timestamp = re.search(r'\[\d{1,2}:\d{1,2}(?:[.:]\d{1,3})?\]', line_for_match) is not None
-            # 提取一个或多个前置时间戳后的内容
-            content_after_timestamp = re.sub(timestamp_prefix_pattern, '', line_for_match).strip()
-            # 检查是否以杂项关键词开头（英文大小写不敏感）
-            content_after_timestamp_lower = content_after_timestamp.lower()
-            has_header_keyword = any(
-                content_after_timestamp_lower.startswith(keyword)
-                for keyword in self.header_keywords_lower
-            )
-            
-            # 如果有时间戳且有杂项关键词，则跳过
-            if has_timestamp and has_header_keyword:
+            lrc_line = tokenize_lrc_line(line)
+            if is_header_line is not None:
+                matched = is_header_line(lrc_line, keyword_matcher)
+            else:
+                # 热点路径：直接按编译好的顺序判断规则
+                matched = False
+                for rule in (bracket_rules if lrc_line.has_bracket else plain_rules):
+                    if rule.check(lrc_line, keyword_matcher):
+                        rule.hits += 1
+                        matched = True
+                        break
+            if matched:
                 removed_lines.append(line)
                 if verbose:
                     print(f"移除行: {line}")
@@ -126,10 +685,118 @@ class LyricsProcessor:
         
         return '\n'.join(pure_lyrics_lines), removed_lines
     
+    def iter_clean_lyrics(self, lyrics_source, keep_removed=False, verbose=False):
+        """
+        流式清理歌词，适用于数 MB 的逐字歌词、拼接翻译等超大歌词标签
+
+        不会一次性拆分全部行，也不保存被移除的行（除非 keep_removed=True），
+        峰值内存只与单行长度相关。保留的行与 clean_lyrics 的结果逐行一致。
+
+        Args:
+            lyrics_source: 歌词字符串，或按块产出字符串的可迭代对象
+            keep_removed (bool): 是否保存被移除的行
+            verbose (bool): 是否显示详细信息
+
+        Returns:
+            LyricsCleanStream: 迭代得到保留的行，removed_count 为已移除的行数
+        """
+        return LyricsCleanStream(self, lyrics_source, keep_removed, verbose)
+
+    def clean_lyrics_many(self, lyrics_texts, jobs=None, chunksize=256, max_pending=None):
+        """
+        批量清理歌词，按输入顺序逐个产出结果
+
+        文本按 chunksize 分块发送给预先启动的工作进程，每个进程持有自己的
+        LyricsProcessor（使用与当前实例相同的关键词）。同时在途的分块数量
+        不超过 max_pending，输入是无限流时内存占用也保持平稳。
+
+        Args:
+            lyrics_texts (iterable): 歌词文本的可迭代对象
+            jobs (int): 工作进程数，默认为 CPU 核数；为 1 时在当前进程中处理
+            chunksize (int): 每个分块包含的文本数
+            max_pending (int): 最多同时在途的分块数，默认为 jobs 的 2 倍
+
+        Yields:
+            tuple: (清理后的歌词, 被移除的行列表)，与 clean_lyrics 的返回值相同
+        """
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        if jobs <= 1:
+            for lyrics_text in lyrics_texts:
+                yield self.clean_lyrics(lyrics_text)
+            return
+
+        if max_pending is None:
+            max_pending = jobs * 2
+
+        texts = iter(lyrics_texts)
+        pending = deque()
+        exhausted = False
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_clean_worker,
+            initargs=(type(self), list(self.header_keywords),
+                      [rule.name for rule in self.rules if not rule.enabled])
+        )
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    chunk = list(islice(texts, chunksize))
+                    if not chunk:
+                        exhausted = True
+                        break
+                    pending.append(executor.submit(_clean_chunk, chunk))
+
+                if not pending:
+                    break
+                for result in pending.popleft().result():
+                    yield result
+        finally:
+            # 调用方提前停止迭代时，丢弃尚未开始的分块
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _is_header_line(self, lrc_line, keyword_matcher):
+        """判断解析后的歌词行是否为需要移除的信息标头"""
+        rules = self._bracket_rules if lrc_line.has_bracket else self._plain_rules
+        if self.rule_timing:
+            return self._is_header_line_timed(lrc_line, keyword_matcher, rules)
+        for rule in rules:
+            if rule.check(lrc_line, keyword_matcher):
+                rule.hits += 1
+                return True
+        return False
+
+    def _is_header_line_timed(self, lrc_line, keyword_matcher, rules):
+        """同 _is_header_line，并累计每条规则的判断次数和耗时"""
+        perf_counter = time.perf_counter
+        for rule in rules:
+            started = perf_counter()
+            matched = rule.check(lrc_line, keyword_matcher)
+            rule.seconds += perf_counter() - started
+            rule.evaluations += 1
+            if matched:
+                rule.hits += 1
+                return True
+        return False
+
     def is_audio_file(self, filename):
         """检查文件是否为支持的音频格式"""
         return os.path.splitext(filename.lower())[1] in self.supported_formats
     
+    def open_audio_file(self, file_path):
+        """
+        打开音频文件，只解析一次标签
+
+        Args:
+            file_path (str): 音频文件路径
+
+        Returns:
+            AudioLyricsFile: 可读写歌词的文件句柄
+        """
+        return AudioLyricsFile(file_path)
+
     def get_lyrics_from_file(self, file_path):
         """
         从音频文件中提取歌词
@@ -140,26 +807,14 @@ class LyricsProcessor:
         Returns:
             str: 歌词文本，如果没有歌词则返回空字符串
         """
+        if not self.is_audio_file(file_path):
+            return ""
+
         try:
-            file_ext = os.path.splitext(file_path)[1].lower()
-            
-            if file_ext == '.flac':
-                audio = FLAC(file_path)
-                return audio.get('lyrics', [''])[0] if 'lyrics' in audio else ""
-                
-            elif file_ext == '.mp3':
-                audio = ID3(file_path)
-                return audio.get('USLT', USLT()).text if 'USLT' in audio else ""
-                
-            elif file_ext == '.m4a':
-                audio = MP4(file_path)
-                return audio.get('©lyr', [''])[0] if '©lyr' in audio else ""
-                
+            return self.open_audio_file(file_path).read_lyrics()
         except Exception as e:
             print(f"读取歌词时出错 {file_path}: {e}")
             return ""
-        
-        return ""
     
     def save_lyrics_to_file(self, file_path, lyrics_text):
         """
@@ -172,34 +827,62 @@ class LyricsProcessor:
         Returns:
             bool: 保存是否成功
         """
+        if not self.is_audio_file(file_path):
+            return True
+
         try:
-            file_ext = os.path.splitext(file_path)[1].lower()
-            
-            if file_ext == '.flac':
-                audio = FLAC(file_path)
-                audio['lyrics'] = [lyrics_text]
-                audio.save()
-                
-            elif file_ext == '.mp3':
-                audio = ID3(file_path)
-                if 'USLT' not in audio:
-                    audio['USLT'] = USLT(encoding=3, lang='chi', desc='', text=lyrics_text)
-                else:
-                    audio['USLT'].text = lyrics_text
-                audio.save()
-                
-            elif file_ext == '.m4a':
-                audio = MP4(file_path)
-                audio['©lyr'] = [lyrics_text]
-                audio.save()
-                
+            self.open_audio_file(file_path).write_lyrics(lyrics_text)
             return True
-            
         except Exception as e:
             print(f"保存歌词时出错 {file_path}: {e}")
             return False
     
-    def process_audio_file(self, file_path, verbose=False, dry_run=False, backup=False):
+    def save_cleaned_copy(self, source_path, dest_path, lyrics_text=None):
+        """
+        生成写入清理后歌词的副本，尽量不复制音频数据
+
+        歌词不需要修改时硬链接；否则先尝试 reflink 克隆后原地改写标签，
+        不支持时把重新生成的标签和原音频数据一次写出（MP3 / FLAC），最后才复制后写回（MP4）。
+
+        Args:
+            source_path (str): 原文件（不会被修改）
+            dest_path (str): 目标文件，已存在时先删除（可能是上次生成的硬链接）
+            lyrics_text (str): 清理后的歌词，None 表示不修改
+
+        Returns:
+            tuple: (方式, 写入目标文件的字节数)，方式为 hardlink / reflink / single_pass / copy 等
+        """
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+
+        if lyrics_text is None:
+            try:
+                os.link(source_path, dest_path)
+                return METHOD_HARDLINK, 0
+            except OSError:
+                result = clone_file(source_path, dest_path)
+                return result.method, result.bytes_written
+
+        if reflink_file(source_path, dest_path):
+            audio_file = self.open_audio_file(dest_path)
+            audio_file.write_lyrics(lyrics_text)
+            # 原地更新时只改写了元数据，其余数据块仍与原文件共享
+            written = metadata_size(dest_path) if audio_file.in_place else None
+            return METHOD_REFLINK, written if written is not None else os.path.getsize(dest_path)
+
+        audio_file = self.open_audio_file(source_path)
+        written = audio_file.write_lyrics_to(dest_path, lyrics_text)
+        if written is not None:
+            return METHOD_SINGLE_PASS, written
+
+        shutil.copyfile(source_path, dest_path)
+        audio_file = self.open_audio_file(dest_path)
+        audio_file.write_lyrics(lyrics_text)
+        copied = os.path.getsize(source_path)
+        written = metadata_size(dest_path) if audio_file.in_place else None
+        return METHOD_COPY, copied + (written if written is not None else os.path.getsize(dest_path))
+
+    def process_audio_file(self, file_path, verbose=False, dry_run=False, backup=False, probe=False, timing=None):
         """
         处理单个音频文件以清理歌词
         
@@ -208,18 +891,41 @@ class LyricsProcessor:
             verbose (bool): 是否显示详细信息
             dry_run (bool): 是否为预览模式（不修改文件）
             backup (bool): 是否创建备份文件
+            probe (bool): 是否先快速探测歌词帧，跳过没有歌词或已损坏的文件，
+                          避免完整解析标签
+            timing (FileTiming): 传入时记录文件大小和读取、清理、备份、写回各阶段的耗时
             
         Returns:
             tuple: (处理状态, 移除的行数)
             处理状态: True=成功, False=失败, None=忽略（无歌词标签）
         """
+        if timing is None:
+            timing = FileTiming()
+        timing.enter(STAGE_READ)
         try:
             if not self.is_audio_file(file_path):
                 if verbose:
                     print(f"❌ 不支持的文件类型: {file_path}")
                 return False, 0
+            timing.size = os.path.getsize(file_path)
+
+            if probe:
+                probe_result = probe_lyrics(file_path)
+                if not probe_result.valid:
+                    print(f"❌ 无效的音频文件 {file_path}: {probe_result.error}")
+                    return False, 0
+                if probe_result.has_lyrics is False:
+                    if verbose:
+                        print(f"⏭️  无歌词标签: {os.path.basename(file_path)}")
+                    return None, 0
             
-            original_lyrics = self.get_lyrics_from_file(file_path)
+            # 只解析一次标签：读取、清理、写回都通过同一个句柄
+            try:
+                audio_file = self.open_audio_file(file_path)
+                original_lyrics = audio_file.read_lyrics()
+            except Exception as e:
+                print(f"读取歌词时出错 {file_path}: {e}")
+                original_lyrics = ""
             if not original_lyrics:
                 if verbose:
                     print(f"⏭️  无歌词标签: {os.path.basename(file_path)}")
@@ -229,6 +935,7 @@ class LyricsProcessor:
                 print(f"📄 处理文件: {os.path.basename(file_path)}")
                 print(f"   原歌词长度: {len(original_lyrics)} 字符")
             
+            timing.enter(STAGE_CLEAN)
             clean_lyrics_text, removed_lines = self.clean_lyrics(original_lyrics, verbose)
             
             if len(removed_lines) == 0:
@@ -237,19 +944,34 @@ class LyricsProcessor:
                 return True, 0
             
             if not dry_run:
+                timing.enter(STAGE_BACKUP)
                 # 创建备份
                 if backup:
-                    backup_success = self.create_backup(file_path)
-                    if not backup_success:
+                    backup_result = self.create_backup(file_path)
+                    if not backup_result:
                         print(f"❌ 备份失败: {file_path}")
                         return False, 0
                     if verbose:
-                        print(f"   📦 已创建备份")
+                        print(f"   📦 已创建备份 ({backup_result.method}, 写入 {backup_result.bytes_written} 字节)")
+                
+                # 记录撤销日志（只保存原始歌词）
+                if self.journal is not None:
+                    try:
+                        self.journal.record(file_path, original_lyrics, clean_lyrics_text)
+                    except Exception as e:
+                        print(f"❌ 写入撤销日志失败: {file_path}: {e}")
+                        return False, 0
                 
                 # 保存清理后的歌词
-                success = self.save_lyrics_to_file(file_path, clean_lyrics_text)
-                if not success:
+                timing.enter(STAGE_WRITE)
+                try:
+                    audio_file.write_lyrics(clean_lyrics_text)
+                except Exception as e:
+                    print(f"保存歌词时出错 {file_path}: {e}")
                     return False, 0
+                self._count_write(audio_file)
+                if verbose and not audio_file.in_place:
+                    print(f"   ⚠️  标签空间不足，已重写整个文件")
                 
                 if verbose:
                     print(f"   ✅ 已更新歌词 (移除 {len(removed_lines)} 行)")
@@ -266,33 +988,242 @@ class LyricsProcessor:
         except Exception as e:
             print(f"❌ 处理文件时出错 {file_path}: {e}")
             return False, 0
+        finally:
+            timing.finish()
     
+    def process_audio_files(self, file_paths, jobs=None, verbose=False, dry_run=False, backup=False,
+                            probe=True, skip=None, max_pending=None, report=None):
+        """
+        并行处理多个音频文件，按输入顺序逐个产出结果
+
+        工作进程只接收文件路径，各自持有一个 LyricsProcessor（关键词、禁用的规则、
+        规则计时和缓存设置与当前实例相同）。每个文件的控制台输出在工作进程中捕获，
+        随结果一起返回，由调用方整体输出，不同文件的输出不会交错。规则统计和
+        缓存命中统计会累加回当前实例。
+
+        Args:
+            file_paths (iterable): 文件路径的可迭代对象，可以边扫描边产出
+            jobs (int): 工作进程数，默认为 CPU 核数；为 1 时在当前进程中处理
+            verbose / dry_run / backup / probe: 同 process_audio_file
+            skip (callable): 在当前进程中对每个路径调用，返回 True 时不处理该文件，
+                             结果中的处理状态为 FILE_SKIPPED
+            max_pending (int): 最多同时在途的文件数，默认为 jobs 的 4 倍
+            report (RunReport): 传入时在产出每个结果之前记录该文件的分阶段耗时
+
+        Yields:
+            tuple: (文件路径, 处理状态, 移除的行数, 捕获的输出)
+            处理状态与 process_audio_file 相同；jobs 为 1 时同样捕获输出，不同 jobs 下的输出一致
+        """
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        if jobs <= 1:
+            for file_path in file_paths:
+                if skip is not None and skip(file_path):
+                    if report is not None:
+                        report.add_file(None, skipped=True)
+                    yield file_path, FILE_SKIPPED, 0, ''
+                    continue
+                output = io.StringIO()
+                timing = FileTiming()
+                with contextlib.redirect_stdout(output):
+                    state, removed_count = self.process_audio_file(file_path, verbose, dry_run, backup, probe,
+                                                                   timing)
+                if report is not None:
+                    report.add_file(timing, file_path=file_path)
+                yield file_path, state, removed_count, output.getvalue()
+            return
+
+        if max_pending is None:
+            max_pending = jobs * 4
+
+        cache_options = None
+        if self.cache is not None:
+            # 工作进程各自打开同一个磁盘缓存文件（写入批量提交，等待其他进程的写锁）；
+            # 先提交当前进程中尚未写入的条目，让工作进程能读到
+            self.cache.flush()
+            cache_options = (self.cache.max_entries, self.cache.max_bytes, self.cache.path)
+        journal_options = None
+        if self.journal is not None:
+            # 工作进程使用同一个运行 ID，各自写自己的分片
+            journal_options = (self.journal.directory, self.journal.run_id)
+        backup_directory = self.backup_store.directory if self.backup_store is not None else None
+
+        paths = iter(file_paths)
+        pending = deque()
+        exhausted = False
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_file_worker,
+            initargs=(type(self), list(self.header_keywords),
+                      [rule.name for rule in self.rules if not rule.enabled],
+                      self.rule_timing, cache_options, journal_options, backup_directory,
+                      self.worker_profile_dir)
+        )
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    file_path = next(paths, None)
+                    if file_path is None:
+                        exhausted = True
+                        break
+                    if skip is not None and skip(file_path):
+                        pending.append((file_path, None))
+                    else:
+                        pending.append((file_path, executor.submit(
+                            _process_file, file_path, verbose, dry_run, backup, probe)))
+
+                if not pending:
+                    break
+                file_path, future = pending.popleft()
+                if future is None:
+                    if report is not None:
+                        report.add_file(None, skipped=True)
+                    yield file_path, FILE_SKIPPED, 0, ''
+                    continue
+                state, removed_count, output, timing, worker_stats = future.result()
+                self._merge_worker_stats(*worker_stats)
+                if report is not None:
+                    report.add_file(timing, file_path=file_path)
+                yield file_path, state, removed_count, output
+        finally:
+            # 调用方提前停止迭代时，丢弃尚未开始的文件
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=True)
+
+    def _merge_worker_stats(self, rule_deltas, cache_deltas, backup_deltas=None):
+        """把工作进程返回的规则统计、缓存命中统计和备份/写回统计累加到当前实例"""
+        for rule, (hits, evaluations, seconds) in zip(self.rules, rule_deltas):
+            rule.hits += hits
+            rule.evaluations += evaluations
+            rule.seconds += seconds
+        if cache_deltas is not None and self.cache is not None:
+            self.cache.add_lookups(*cache_deltas)
+        if backup_deltas is not None:
+            backups, bytes_written, methods, in_place, rewritten = backup_deltas
+            self._backups += backups
+            self._backup_bytes += bytes_written
+            for method, count in methods.items():
+                self._backup_methods[method] = self._backup_methods.get(method, 0) + count
+            self._writes_in_place += in_place
+            self._writes_rewritten += rewritten
+
+    def _take_worker_stats(self):
+        """取出并清零本进程的规则统计、缓存命中统计和备份/写回统计（工作进程中使用）"""
+        rule_deltas = tuple((rule.hits, rule.evaluations, rule.seconds) for rule in self.rules)
+        self.reset_rule_stats()
+        cache_deltas = None
+        if self.cache is not None:
+            cache_deltas = (self.cache.hits, self.cache.disk_hits, self.cache.misses)
+            self.cache.hits = self.cache.disk_hits = self.cache.misses = 0
+        backup_deltas = (self._backups, self._backup_bytes, self._backup_methods,
+                         self._writes_in_place, self._writes_rewritten)
+        self.reset_backup_stats()
+        self.reset_write_stats()
+        return rule_deltas, cache_deltas, backup_deltas
+
     def create_backup(self, file_path):
         """
         创建文件备份
+
+        开启备份库时保存到备份库，否则复制为原文件旁边的 .backup 文件；
+        都会优先使用 reflink 克隆，其次 copy_file_range，最后才是普通复制。
         
         Args:
             file_path (str): 原文件路径
             
         Returns:
-            bool: 备份是否成功
+            BackupResult: 备份方式和实际写入的字节数，失败时返回 None
         """
         try:
-            import shutil
-            backup_path = file_path + '.backup'
-            
-            # 如果备份文件已存在，添加数字后缀
-            counter = 1
-            while os.path.exists(backup_path):
-                backup_path = f"{file_path}.backup.{counter}"
-                counter += 1
-            
-            shutil.copy2(file_path, backup_path)
-            return True
+            if self.backup_store is not None:
+                result = self.backup_store.backup(file_path)
+            else:
+                backup_path = file_path + '.backup'
+                
+                # 如果备份文件已存在，添加数字后缀
+                counter = 1
+                while os.path.exists(backup_path):
+                    backup_path = f"{file_path}.backup.{counter}"
+                    counter += 1
+                
+                result = clone_file(file_path, backup_path)
+                shutil.copystat(file_path, backup_path)
+
+            # 流水线模式下多个写回线程会同时备份
+            with self._stats_lock:
+                self._backups += 1
+                self._backup_bytes += result.bytes_written
+                self._backup_methods[result.method] = self._backup_methods.get(result.method, 0) + 1
+            return result
             
         except Exception as e:
             print(f"创建备份失败 {file_path}: {e}")
-            return False
+            return None
+
+
+# 工作进程中的歌词处理器，由 _init_clean_worker 创建
+_worker_processor = None
+
+
+def _init_clean_worker(processor_class, header_keywords, disabled_rules=()):
+    """工作进程初始化：预先构建好处理器、关键词匹配器和规则"""
+    global _worker_processor
+    _worker_processor = processor_class()
+    _worker_processor.header_keywords = header_keywords
+    _worker_processor._get_keyword_matcher()
+    for name in disabled_rules:
+        _worker_processor.set_rule_enabled(name, False)
+
+
+def _clean_chunk(lyrics_texts):
+    """在工作进程中清理一个分块的歌词"""
+    clean = _worker_processor.clean_lyrics
+    return [clean(lyrics_text) for lyrics_text in lyrics_texts]
+
+
+def _clean_text(lyrics_text):
+    """在工作进程中清理一段歌词，并取出这次清理产生的规则统计和清理耗时 (墙钟秒数, CPU 秒数)"""
+    timing = FileTiming()
+    timing.enter(STAGE_CLEAN)
+    cleaned, removed_lines = _worker_processor.clean_lyrics(lyrics_text)
+    timing.finish()
+    rule_deltas, _, _ = _worker_processor._take_worker_stats()
+    return cleaned, removed_lines, rule_deltas, tuple(timing.stages[STAGE_CLEAN])
+
+
+def _init_file_worker(processor_class, header_keywords, disabled_rules=(), rule_timing=False, cache_options=None,
+                      journal_options=None, backup_directory=None, profile_directory=None):
+    """文件处理工作进程初始化：在 _init_clean_worker 的基础上设置规则计时、缓存、撤销日志、备份库和性能分析"""
+    _init_clean_worker(processor_class, header_keywords, disabled_rules)
+    _worker_processor.rule_timing = rule_timing
+    if cache_options is not None:
+        max_entries, max_bytes, path = cache_options
+        cache = _worker_processor.enable_cache(max_entries=max_entries, max_bytes=max_bytes, path=path)
+        if path:
+            # 工作进程退出时提交尚未写入的条目
+            multiprocessing.util.Finalize(cache, cache.close, exitpriority=10)
+    if journal_options is not None:
+        directory, run_id = journal_options
+        journal = _worker_processor.enable_journal(directory, run_id)
+        # 工作进程退出时把分片落盘
+        multiprocessing.util.Finalize(journal, journal.close, exitpriority=10)
+    if backup_directory is not None:
+        store = _worker_processor.enable_backup_store(backup_directory)
+        multiprocessing.util.Finalize(store, store.close, exitpriority=10)
+    if profile_directory is not None:
+        start_worker_profile(profile_directory)
+
+
+def _process_file(file_path, verbose, dry_run, backup, probe):
+    """在工作进程中处理一个文件，捕获它的控制台输出和分阶段耗时"""
+    output = io.StringIO()
+    timing = FileTiming()
+    with contextlib.redirect_stdout(output):
+        state, removed_count = _worker_processor.process_audio_file(file_path, verbose, dry_run, backup, probe,
+                                                                    timing)
+    return state, removed_count, output.getvalue(), timing, _worker_processor._take_worker_stats()
 
 
 # 创建全局实例供其他模块使用
@@ -300,8 +1231,11 @@ lyrics_processor = LyricsProcessor()
 
 # 导出常用函数
 clean_lyrics = lyrics_processor.clean_lyrics
+clean_lyrics_many = lyrics_processor.clean_lyrics_many
+iter_clean_lyrics = lyrics_processor.iter_clean_lyrics
 get_lyrics_from_file = lyrics_processor.get_lyrics_from_file
 save_lyrics_to_file = lyrics_processor.save_lyrics_to_file
 is_audio_file = lyrics_processor.is_audio_file
 process_audio_file = lyrics_processor.process_audio_file
+process_audio_files = lyrics_processor.process_audio_files
 
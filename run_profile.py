@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+CPU 性能分析
+用 cProfile 分析一次运行：当前线程、本次运行自己创建的线程（流水线的扫描和读写线程池，
+用 thread_initializer() 作为 initializer）以及工作进程（各自写出分析文件，结束后合并）
+都会被记录；同一进程中其他线程（Web 请求线程、后台任务线程）不受影响。结果保存为 pstats 文件
+（可用 snakeviz 等工具查看）和折叠栈文件（每行「帧;帧;帧 微秒数」，可直接交给
+flamegraph.pl / speedscope 生成火焰图）。
+"""
+
+import cProfile
+import glob
+import io
+import multiprocessing.util
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 折叠栈展开的最大深度，以及小于该时间（秒）的分支不再展开
+COLLAPSED_MAX_DEPTH = 64
+COLLAPSED_MIN_SECONDS = 1e-6
+
+# 当前线程所属的 RunProfiler（分析开始的线程，以及由它创建的线程池中的线程）
+_thread_state = threading.local()
+
+
+def _dump_worker_profile(profile, path):
+    """工作进程退出时写出分析结果"""
+    profile.disable()
+    profile.dump_stats(path)
+
+
+def start_worker_profile(directory):
+    """
+    在工作进程中开始分析，进程退出时写出 <directory>/worker.<进程号>.prof
+
+    Returns:
+        cProfile.Profile: 分析器
+    """
+    profile = cProfile.Profile()
+    path = os.path.join(directory, f"worker.{os.getpid()}.prof")
+    multiprocessing.util.Finalize(profile, _dump_worker_profile, args=(profile, path), exitpriority=5)
+    profile.enable()
+    return profile
+
+
+def thread_initializer():
+    """
+    线程池（或手动创建的线程）的 initializer
+
+    在正被分析的线程中调用时，返回一个在新线程中开启 cProfile 的函数，否则返回 None。
+    这些线程应在 RunProfiler.stop() 之前结束（线程池关闭），结束后分析器随线程一起停止。
+
+    Returns:
+        callable: 传给 ThreadPoolExecutor(initializer=...)，或在新线程开始时调用
+    """
+    profiler = getattr(_thread_state, 'profiler', None)
+    if profiler is None:
+        return None
+    return profiler._start_thread_profile
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # 内置函数，如 <built-in method posix.stat>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats):
+    """
+    把 pstats 的调用关系展开为折叠栈
+
+    cProfile 只记录「调用者 -> 被调用者」的边，不记录完整调用栈；这里从没有调用者的
+    入口函数出发，按每条边的累计时间占比把函数的自身时间分摊到各条调用路径上。
+    递归调用在第一次重复出现时截断。
+
+    Args:
+        stats (pstats.Stats): 分析结果
+
+    Returns:
+        dict: 折叠栈（帧之间用 ; 连接）-> 自身时间（秒）
+    """
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, on_path, budget):
+        _, _, own_seconds, cumulative_seconds, _ = entries[func]
+        scale = min(1.0, budget / cumulative_seconds) if cumulative_seconds else 0.0
+        path = path + (_function_label(func),)
+        key = ';'.join(path)
+        stacks[key] = stacks.get(key, 0.0) + own_seconds * scale
+        if len(path) >= COLLAPSED_MAX_DEPTH:
+            return
+        on_path = on_path | {func}
+        for callee, edge_seconds in callees.get(func, ()):
+            child_budget = edge_seconds * scale
+            if callee in on_path or callee not in entries or child_budget < COLLAPSED_MIN_SECONDS:
+                continue
+            walk(callee, path, on_path, child_budget)
+
+    for func, (_, _, _, cumulative_seconds, callers) in entries.items():
+        if not callers:
+            walk(func, (), frozenset(), cumulative_seconds)
+    return stacks
+
+
+def write_collapsed(stats, path):
+    """写出折叠栈文件，时间单位为微秒"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, seconds in sorted(collapsed_stacks(stats).items()):
+            microseconds = int(round(seconds * 1_000_000))
+            if microseconds:
+                f.write(f"{stack} {microseconds}\n")
+
+
+class RunProfiler:
+    """
+    分析一次运行
+
+    用作上下文管理器，或手动调用 start() / stop()。运行期间把 worker_directory 交给
+    工作进程（LyricsProcessor.worker_profile_dir），工作进程的结果会在 stop() 时合并。
+
+    Args:
+        output_prefix (str): 输出文件前缀，生成 <前缀>.pstats 和 <前缀>.collapsed
+    """
+
+    def __init__(self, output_prefix):
+        self.output_prefix = output_prefix
+        self.worker_directory = None
+        self.stats = None
+        self._profile = None
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+
+    @property
+    def pstats_path(self):
+        return f"{self.output_prefix}.pstats"
+
+    @property
+    def collapsed_path(self):
+        return f"{self.output_prefix}.collapsed"
+
+    def _start_thread_profile(self):
+        # 在线程池的新线程中运行：开启这个线程自己的 cProfile，并让它创建的线程池也被分析
+        with self._lock:
+            if self._profile is None:  # 分析已经结束
+                return
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # 该线程中已有其他分析工具
+                return
+            self._thread_profiles.append(profile)
+        _thread_state.profiler = self
+
+    def start(self):
+        self.worker_directory = tempfile.mkdtemp(prefix='lyrics-profile-')
+        self._thread_profiles = []
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        _thread_state.profiler = self
+        return self
+
+    def stop(self):
+        """
+        停止分析，合并线程和工作进程的结果并写出文件
+
+        Returns:
+            pstats.Stats: 合并后的分析结果
+        """
+        _thread_state.profiler = None
+        with self._lock:
+            profile, self._profile = self._profile, None
+            thread_profiles, self._thread_profiles = self._thread_profiles, []
+        profile.disable()
+        try:
+            stats = pstats.Stats(profile, stream=io.StringIO())
+            for profile in thread_profiles:
+                stats.add(profile)
+            for path in sorted(glob.glob(os.path.join(glob.escape(self.worker_directory), '*.prof'))):
+                stats.add(path)
+        finally:
+            shutil.rmtree(self.worker_directory, ignore_errors=True)
+            self.worker_directory = None
+
+        directory = os.path.dirname(self.output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(self.pstats_path)
+        write_collapsed(stats, self.collapsed_path)
+        self.stats = stats
+        return stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def top_functions(self, limit=15, sort='tottime'):
+        """
+        耗时最多的函数
+
+        Returns:
+            list: [{'function', 'calls', 'own_seconds', 'cumulative_seconds'}]
+        """
+        if self.stats is None:
+            return []
+        sort_index = 2 if sort == 'tottime' else 3
+        rows = sorted(self.stats.stats.items(), key=lambda item: item[1][sort_index], reverse=True)
+        return [
+            {
+                'function': _function_label(func),
+                'calls': calls,
+                'own_seconds': round(own_seconds, 6),
+                'cumulative_seconds': round(cumulative_seconds, 6),
+            }
+            for func, (_, calls, own_seconds, cumulative_seconds, _) in rows[:limit]
+        ]
+
+
+class ProfileLock:
+    """
+    同一时间只允许一个分析：进程内用线程锁，多个工作进程之间用 flock 锁住同一个锁文件
+    （不支持 fcntl 的平台上只在当前进程内互斥）
+
+    Args:
+        path (str): 锁文件路径，所在目录不存在时自动创建
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _try_flock(self):
+        """以非阻塞方式锁住锁文件，成功时返回打开的文件，已被其他进程锁住时返回 None"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def acquire(self):
+        """
+        尝试获取锁（不等待）
+
+        Returns:
+            bool: 是否获取成功
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            return True
+        try:
+            self._file = self._try_flock()
+        except BaseException:
+            self._lock.release()
+            raise
+        if self._file is None:
+            self._lock.release()
+            return False
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # 关闭文件即释放 flock
+            self._file = None
+        self._lock.release()
+
+    def locked(self):
+        """当前进程或其他工作进程是否正在分析"""
+        if self._lock.locked():
+            return True
+        if fcntl is None:
+            return False
+        lock_file = self._try_flock()
+        if lock_file is None:
+            return True
+        lock_file.close()
+        return False
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+批量处理的计时与运行报告
+记录每个文件在读取、清理、备份、写回各阶段的墙钟时间和 CPU 时间，汇总为
+各阶段耗时、吞吐量（文件/秒、MB/秒）和单文件耗时分位数，可以实时显示带预计剩余时间的
+进度行，结束后导出 JSON 报告。阶段的 CPU 时间远小于墙钟时间时说明在等待磁盘。
+"""
+
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+# 处理阶段
+STAGE_SCAN = 'scan'
+STAGE_READ = 'read'      # 探测 + 解析标签 + 读取歌词
+STAGE_CLEAN = 'clean'
+STAGE_BACKUP = 'backup'  # 整文件备份 + 撤销日志
+STAGE_WRITE = 'write'
+STAGES = (STAGE_SCAN, STAGE_READ, STAGE_CLEAN, STAGE_BACKUP, STAGE_WRITE)
+FILE_STAGES = STAGES[1:]
+
+# 这些阶段以磁盘读写为主，其余为 CPU
+IO_STAGES = (STAGE_SCAN, STAGE_READ, STAGE_BACKUP, STAGE_WRITE)
+
+
+class FileTiming:
+    """
+    单个文件的分阶段计时
+
+    enter() 结束当前阶段并开始下一个阶段，finish() 结束当前阶段；
+    阶段之间的排队等待可以在 finish() 之后再 enter()，不会计入任何阶段。
+
+    Attributes:
+        stages (dict): 阶段名 -> [墙钟秒数, CPU 秒数]
+        size (int): 文件大小（字节）
+    """
+
+    __slots__ = ('stages', 'size', '_stage', '_wall', '_cpu')
+
+    def __init__(self):
+        self.stages = {}
+        self.size = 0
+        self._stage = None
+        self._wall = 0.0
+        self._cpu = 0.0
+
+    def enter(self, stage):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if self._stage is not None:
+            self.add(self._stage, wall - self._wall, cpu - self._cpu)
+        self._stage = stage
+        self._wall = wall
+        self._cpu = cpu
+
+    def finish(self):
+        if self._stage is not None:
+            self.add(self._stage, time.perf_counter() - self._wall, time.thread_time() - self._cpu)
+            self._stage = None
+
+    def add(self, stage, wall, cpu):
+        """累加一段在别处测得的耗时（例如在清理进程中测得的时间）"""
+        totals = self.stages.get(stage)
+        if totals is None:
+            self.stages[stage] = [wall, cpu]
+        else:
+            totals[0] += wall
+            totals[1] += cpu
+
+    @property
+    def seconds(self):
+        """各阶段墙钟时间之和（不含排队等待）"""
+        return sum(wall for wall, _ in self.stages.values())
+
+
+def _percentile(sorted_values, fraction):
+    """最近秩法分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RunReport:
+    """
+    一次批量处理的汇总
+
+    扫描一方对每个文件调用 add_scanned()、结束时调用 finish_scan()，处理一方对每个结果调用 add_file()；
+    两者可以在不同线程中调用。
+
+    Args:
+        root (str): 处理的文件夹
+        options (dict): 写入报告的运行参数
+        slowest (int): 保留耗时最长的多少个文件（路径、大小、格式和各阶段耗时），0 表示不保留
+    """
+
+    def __init__(self, root=None, options=None, slowest=0):
+        self.root = root
+        self.options = dict(options or {})
+        self.started_at = time.time()
+        self.discovered = 0
+        self.scan_done = False
+        self.files = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.stage_seconds = {stage: [0.0, 0.0] for stage in STAGES}
+        self.latencies = array('d')
+        self.slowest = slowest
+        self._slowest = []  # 小顶堆：(耗时, 序号, 路径, 计时)
+        self.extra = {}
+        self._started = time.perf_counter()
+        self._elapsed = None
+        self._lock = threading.Lock()
+
+    def add_scanned(self, seconds, cpu_seconds, count=1):
+        """记录扫描出的文件数和这段扫描的墙钟时间、CPU 时间"""
+        with self._lock:
+            self.discovered += count
+            totals = self.stage_seconds[STAGE_SCAN]
+            totals[0] += seconds
+            totals[1] += cpu_seconds
+
+    def finish_scan(self, seconds=0.0, cpu_seconds=0.0):
+        """扫描结束，之后的进度行显示准确的总数和剩余时间"""
+        self.add_scanned(seconds, cpu_seconds, 0)
+        self.scan_done = True
+
+    def add_file(self, timing, skipped=False, file_path=None):
+        """
+        记录一个处理完成的文件
+
+        Args:
+            timing (FileTiming): 文件的分阶段计时，为 None 时只计数
+            skipped (bool): 是否未处理（增量模式下未变化），不计入耗时分位数
+            file_path (str): 文件路径，用于最慢文件列表
+        """
+        with self._lock:
+            self.files += 1
+            if skipped or timing is None:
+                self.skipped += 1
+                return
+            self.bytes += timing.size
+            for stage, (wall, cpu) in timing.stages.items():
+                totals = self.stage_seconds[stage]
+                totals[0] += wall
+                totals[1] += cpu
+            seconds = timing.seconds
+            self.latencies.append(seconds)
+            if self.slowest and file_path is not None:
+                entry = (seconds, len(self.latencies), file_path, timing)
+                if len(self._slowest) < self.slowest:
+                    heapq.heappush(self._slowest, entry)
+                elif seconds > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    def slowest_files(self):
+        """
+        耗时最长的文件，从慢到快
+
+        Returns:
+            list: [{'path', 'size', 'format', 'seconds', 'stages'}]，stages 为阶段名 -> 墙钟秒数
+        """
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [
+            {
+                'path': file_path,
+                'size': timing.size,
+                'format': os.path.splitext(file_path)[1].lower(),
+                'seconds': round(seconds, 6),
+                'stages': {stage: round(wall, 6) for stage, (wall, _) in timing.stages.items()},
+            }
+            for seconds, _, file_path, timing in entries
+        ]
+
+    def finish(self):
+        """结束计时，之后的 elapsed 不再增长"""
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._started
+
+    @property
+    def elapsed(self):
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+
+    def throughput(self):
+        """返回 (文件/秒, MB/秒)"""
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return self.files / elapsed, self.bytes / 1024 / 1024 / elapsed
+
+    def eta(self):
+        """预计剩余秒数；还没有处理任何文件时返回 None。扫描未完成时只是下限"""
+        files_per_second, _ = self.throughput()
+        if not files_per_second:
+            return None
+        return max(0, self.discovered - self.files) / files_per_second
+
+    def bound(self):
+        """
+        判断瓶颈：I/O 阶段的累计耗时超过清理阶段、且其中 CPU 时间不到一半时为 'disk'，否则为 'cpu'；
+        还没有处理过文件（例如全部在增量模式下跳过）时返回 None
+        """
+        if not self.latencies:
+            return None
+        io_wall = sum(self.stage_seconds[stage][0] for stage in IO_STAGES)
+        io_cpu = sum(self.stage_seconds[stage][1] for stage in IO_STAGES)
+        clean_wall = self.stage_seconds[STAGE_CLEAN][0]
+        if not io_wall and not clean_wall:
+            return None
+        if io_wall > clean_wall and io_cpu < io_wall / 2:
+            return 'disk'
+        return 'cpu'
+
+    def summary(self):
+        """返回可序列化为 JSON 的报告"""
+        files_per_second, mb_per_second = self.throughput()
+        latencies = sorted(self.latencies)
+        stages = {}
+        for stage in STAGES:
+            wall, cpu = self.stage_seconds[stage]
+            stages[stage] = {
+                'seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'cpu_ratio': round(min(1.0, cpu / wall), 3) if wall else 0.0,
+            }
+        report = {
+            'root': self.root,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(self.elapsed, 4),
+            'options': self.options,
+            'files': self.files,
+            'skipped': self.skipped,
+            'bytes': self.bytes,
+            'files_per_second': round(files_per_second, 3),
+            'mb_per_second': round(mb_per_second, 3),
+            'stages': stages,
+            'latency_seconds': {
+                'mean': round(sum(latencies) / len(latencies), 6) if latencies else 0.0,
+                'p50': round(_percentile(latencies, 0.50), 6),
+                'p95': round(_percentile(latencies, 0.95), 6),
+                'p99': round(_percentile(latencies, 0.99), 6),
+                'max': round(latencies[-1], 6) if latencies else 0.0,
+            },
+            'bound': self.bound(),
+        }
+        if self.slowest:
+            report['slowest_files'] = self.slowest_files()
+        report.update(self.extra)
+        return report
+
+    def write_json(self, path):
+        """把报告写入 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+
+def format_duration(seconds):
+    """把秒数格式化为 h:mm:ss / m:ss"""
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class ProgressLine:
+    """
+    在终端中原地刷新的进度行
+
+    Args:
+        report (RunReport): 进度来源
+        stream: 输出流，默认为标准错误，不会混进重定向的标准输出
+        interval (float): 最短刷新间隔（秒）
+    """
+
+    def __init__(self, report, stream=None, interval=0.5):
+        self.report = report
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self._last = 0.0
+        self._shown = False
+
+    def render(self):
+        report = self.report
+        files_per_second, mb_per_second = report.throughput()
+        total = f"{report.discovered}" if report.scan_done else f"{report.discovered}+"
+        line = f"⏳ {report.files}/{total}"
+        if report.scan_done and report.discovered:
+            line += f" ({report.files / report.discovered:.1%})"
+        line += f" | {files_per_second:.1f} 文件/秒 | {mb_per_second:.1f} MB/秒"
+        eta = report.eta()
+        if eta is not None:
+            line += f" | 剩余 {'' if report.scan_done else '≥'}{format_duration(eta)}"
+        return line
+
+    def update(self, force=False):
+        """按刷新间隔重绘进度行"""
+        now = time.perf_counter()
+        if not force and self._shown and now - self._last < self.interval:
+            return
+        self._last = now
+        sys.stdout.flush()
+        self.stream.write(f"\r{self.render()}\033[K")
+        self.stream.flush()
+        self._shown = True
+
+    def clear(self):
+        """擦掉进度行，之后的普通输出不会和它挤在同一行"""
+        if self._shown:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+            self._shown = False
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Web 服务启动入口
+可用时使用 gunicorn 多进程服务（配置见 gunicorn.conf.py）；Windows 或未安装 gunicorn 时使用 Flask 内置的服务器。
+"""
+
+import argparse
+import os
+import sys
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+DEFAULT_BIND = '0.0.0.0:5000'
+
+
+def run_server(bind=None, workers=None):
+    """
+    启动 Web 服务（阻塞直到服务停止）
+
+    Args:
+        bind (str): 监听地址，如 '0.0.0.0:5000'，为 None 时使用配置文件或环境变量 MUSIC_CLEANER_BIND
+        workers (int): 工作进程数，为 None 时使用配置文件或环境变量 MUSIC_CLEANER_WEB_WORKERS
+    """
+    try:
+        from gunicorn.app.wsgiapp import WSGIApplication
+    except ImportError:
+        # gunicorn 不支持 Windows
+        WSGIApplication = None
+
+    if WSGIApplication is None:
+        print("⚠️ 未找到 gunicorn，使用 Flask 内置服务器（单进程，仅适合本机使用）")
+        from app import app
+        host, _, port = (bind or os.getenv('MUSIC_CLEANER_BIND', '').strip() or DEFAULT_BIND).rpartition(':')
+        app.run(host=host or '0.0.0.0', port=int(port), threaded=True, use_reloader=False)
+        return
+
+    argv = ['gunicorn', '--config', CONFIG_PATH]
+    if bind:
+        argv += ['--bind', bind]
+    if workers:
+        argv += ['--workers', str(workers)]
+    sys.argv = argv
+    WSGIApplication("%(prog)s [OPTIONS]").run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动音频歌词清理工具的 Web 服务')
+    parser.add_argument('-b', '--bind', help=f'监听地址（默认 {DEFAULT_BIND}）')
+    parser.add_argument('-w', '--workers', type=int, help='工作进程数（默认为 CPU 核心数，至少 2）')
+    args = parser.parse_args()
+    run_server(args.bind, args.workers)
+
+
+if __name__ == '__main__':
+    main()
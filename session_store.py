@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Web界面的会话存储
+记录上传文件的内部文件名到原始文件名（含文件夹）的对应关系，保存在 SQLite（WAL 模式）中：
+重启后不丢失，多个工作进程共享同一个数据库文件；每个浏览器会话一个命名空间，记录超过有效期后自动删除。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+# 记录的默认有效期（秒）
+DEFAULT_SESSION_TTL = 24 * 3600
+
+# 一次批量查询的最大文件名数（SQLite 参数个数有上限）
+_QUERY_BATCH_SIZE = 500
+
+
+class SessionStore:
+    """
+    会话存储
+
+    Args:
+        path (str): 数据库文件路径，所在目录不存在时自动创建
+        ttl (float): 记录的有效期（秒），每次写入时重新计时
+    """
+
+    def __init__(self, path, ttl=DEFAULT_SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS names ('
+            'namespace TEXT NOT NULL, name TEXT NOT NULL, original TEXT NOT NULL, expires REAL NOT NULL, '
+            'PRIMARY KEY (namespace, name))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS names_expires ON names (expires)')
+        self._db.commit()
+
+    def set_many(self, namespace, mapping):
+        """
+        记录一批文件名（已过期的记录由 expire 删除，调用方据此删除对应的文件）
+
+        Args:
+            namespace (str): 会话命名空间
+            mapping (dict): {内部文件名: 原始文件名}
+        """
+        now = time.time()
+        rows = [(namespace, name, original, now + self.ttl) for name, original in mapping.items()]
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO names (namespace, name, original, expires) '
+                                 'VALUES (?, ?, ?, ?)', rows)
+            self._db.commit()
+
+    def get(self, namespace, name):
+        """内部文件名对应的原始文件名；没有记录或已过期时返回 None"""
+        return self.get_many(namespace, [name]).get(name)
+
+    def get_many(self, namespace, names):
+        """
+        批量查询原始文件名
+
+        Returns:
+            dict: {内部文件名: 原始文件名}，只包含有记录且未过期的文件名
+        """
+        names = list(dict.fromkeys(names))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(names), _QUERY_BATCH_SIZE):
+                batch = names[start:start + _QUERY_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                found.update(self._db.execute(
+                    f'SELECT name, original FROM names WHERE namespace = ? AND expires > ? '
+                    f'AND name IN ({placeholders})', (namespace, now, *batch)
+                ).fetchall())
+        return found
+
+    def names(self, namespace):
+        """一个命名空间中记录的全部内部文件名（包括已过期但尚未删除的记录）"""
+        with self._lock:
+            rows = self._db.execute('SELECT name FROM names WHERE namespace = ?', (namespace,)).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, namespace=None):
+        """删除一个命名空间的记录；namespace 为 None 时删除全部"""
+        with self._lock:
+            if namespace is None:
+                self._db.execute('DELETE FROM names')
+            else:
+                self._db.execute('DELETE FROM names WHERE namespace = ?', (namespace,))
+            self._db.commit()
+
+    def expire(self):
+        """
+        删除已过期的记录
+
+        Returns:
+            list: 被删除记录的内部文件名
+        """
+        now = time.time()
+        with self._lock:
+            with self._db:
+                names = [row[0] for row in self._db.execute(
+                    'SELECT name FROM names WHERE expires <= ?', (now,)).fetchall()]
+                self._db.execute('DELETE FROM names WHERE expires <= ?', (now,))
+        return names
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -29,4 +29,4 @@ echo "📱 请在浏览器中访问: http://localhost:5000"
 echo "🛑 按 Ctrl+C 停止服务器"
 echo ""
 
-$PYTHON_CMD app.py
\ No newline at end of file
+$PYTHON_CMD serve.py
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+抽样估计：小分层合并、样本数上限和置信区间
+运行: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import write_mp3  # noqa: E402
+from library_estimate import StratumSample, _stratified_estimate, estimate_library  # noqa: E402
+from lyrics_utils import LyricsProcessor  # noqa: E402
+
+LYRICS = [
+    '[00:00.00]作词：某人\n[00:00.50]作曲：某人\n[00:01.00]第一句\n[00:05.00]第二句',
+    '[00:01.00]第一句\n[00:05.00]第二句',
+    '',
+]
+
+
+class LibraryEstimateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp(prefix='estimate_')
+        # 300 个只有一首歌的文件夹 + 2 个大文件夹
+        for index in range(300):
+            folder = os.path.join(cls.root, f'album{index:03d}')
+            os.makedirs(folder)
+            write_mp3(os.path.join(folder, 'song.mp3'), LYRICS[index % 3], audio_bytes=1024)
+        for name in ('big1', 'big2'):
+            folder = os.path.join(cls.root, name)
+            os.makedirs(folder)
+            for index in range(60):
+                write_mp3(os.path.join(folder, f'{index:02d}.mp3'), LYRICS[index % 3], audio_bytes=1024)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def test_small_folders_are_pooled(self):
+        report = estimate_library(LyricsProcessor(), self.root, sample_size=40, seed=1)
+        self.assertEqual(report['files'], 420)
+        self.assertLessEqual(report['strata'], 20)
+        self.assertLessEqual(report['sampled'], 42)
+
+    def test_interval_is_not_degenerate(self):
+        report = estimate_library(LyricsProcessor(), self.root, sample_size=40, seed=1)
+        for name in ('has_lyrics', 'needs_cleaning', 'removed_lines'):
+            interval = report[name]
+            self.assertLess(interval['low'], interval['estimate'], name)
+            self.assertLess(interval['estimate'], interval['high'], name)
+
+    def test_single_sample_strata_use_collapsed_variance(self):
+        strata = []
+        for removed in (0, 2, 0, 3):
+            stratum = StratumSample()
+            stratum.population = 10
+            stratum.results = [{'removed': removed}]
+            strata.append(stratum)
+        mean, standard_error = _stratified_estimate(strata, lambda r: r['removed'])
+        self.assertAlmostEqual(mean, 1.25)
+        self.assertGreater(standard_error, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+MP3 的 USLT 帧：按帧类型查找（键名带语言，如 USLT::chi），有多个帧时只读取和清理第一个
+运行: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from mutagen.id3 import ID3, USLT
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import write_mp3  # noqa: E402
+from lyrics_utils import AudioLyricsFile, process_audio_file  # noqa: E402
+
+FIRST = '[00:00.00]作词：某人\n[00:01.00]第一句'
+SECOND = '[00:00.00]Lyrics by: someone\n[00:01.00]first line'
+
+
+class Mp3LyricsFramesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='mp3_frames_')
+        self.path = os.path.join(self.root, 'song.mp3')
+        write_mp3(self.path, FIRST, audio_bytes=1024)
+        tags = ID3(self.path)
+        tags.add(USLT(encoding=3, lang='eng', desc='', text=SECOND))
+        tags.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_reads_first_frame(self):
+        self.assertEqual(AudioLyricsFile(self.path).read_lyrics(), FIRST)
+
+    def test_cleans_first_frame_only(self):
+        state, removed_lines = process_audio_file(self.path)
+        self.assertIs(state, True)
+        self.assertEqual(removed_lines, 1)
+        frames = {frame.lang: frame.text for frame in ID3(self.path).getall('USLT')}
+        self.assertEqual(frames, {'chi': '[00:01.00]第一句', 'eng': SECOND})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+并行处理（jobs > 1）时的磁盘缓存：工作进程读写同一个缓存文件，结果在多次运行之间保留
+运行: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import write_mp3  # noqa: E402
+from lyrics_utils import LyricsProcessor  # noqa: E402
+
+FILES = 12
+
+
+class ParallelCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='parallel_cache_')
+        self.cache_path = os.path.join(self.root, 'cache.db')
+        self.paths = []
+        for index in range(FILES):
+            path = os.path.join(self.root, f'{index:02d}.mp3')
+            write_mp3(path, f'[00:00.00]作词：某人{index}\n[00:01.00]第 {index} 首的歌词', audio_bytes=1024)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _run(self):
+        processor = LyricsProcessor()
+        cache = processor.enable_cache(path=self.cache_path)
+        results = list(processor.process_audio_files(self.paths, jobs=2, dry_run=True))
+        stats = processor.cache_stats()
+        cache.close()
+        return results, stats
+
+    def _rows(self):
+        with sqlite3.connect(self.cache_path) as db:
+            return db.execute('SELECT COUNT(*) FROM lyrics_cache').fetchone()[0]
+
+    def test_workers_persist_results(self):
+        results, stats = self._run()
+        self.assertTrue(all(state is True for _, state, _, _ in results))
+        self.assertEqual(stats['misses'], FILES)
+        self.assertEqual(self._rows(), FILES)
+
+    def test_next_run_reads_disk_tier(self):
+        self._run()
+        _, stats = self._run()
+        self.assertEqual(stats['disk_hits'], FILES)
+        self.assertEqual(stats['misses'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+性能分析锁：同一时间只有一个进程能开始分析
+运行: python -m unittest discover tests
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_profile import ProfileLock, fcntl  # noqa: E402
+
+
+def _try_acquire(path, results):
+    lock = ProfileLock(path)
+    acquired = lock.acquire()
+    results.put((acquired, lock.locked()))
+    if acquired:
+        lock.release()
+
+
+class ProfileLockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='profile_lock_')
+        self.path = os.path.join(self.root, 'profiles', '.profile.lock')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_same_process(self):
+        lock = ProfileLock(self.path)
+        self.assertFalse(lock.locked())
+        self.assertTrue(lock.acquire())
+        self.assertTrue(lock.locked())
+        self.assertFalse(lock.acquire())
+        lock.release()
+        self.assertFalse(lock.locked())
+        self.assertTrue(lock.acquire())
+        lock.release()
+
+    @unittest.skipIf(fcntl is None, '不支持 fcntl 时只在进程内互斥')
+    def test_other_process(self):
+        lock = ProfileLock(self.path)
+        results = multiprocessing.Queue()
+        self.assertTrue(lock.acquire())
+        try:
+            process = multiprocessing.Process(target=_try_acquire, args=(self.path, results))
+            process.start()
+            process.join()
+            self.assertEqual(results.get(timeout=10), (False, True))
+        finally:
+            lock.release()
+        process = multiprocessing.Process(target=_try_acquire, args=(self.path, results))
+        process.start()
+        process.join()
+        self.assertEqual(results.get(timeout=10), (True, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
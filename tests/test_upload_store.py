@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+上传库回收：删除文件名记录后，不再被引用的对象被删除，仍被引用的对象保留
+运行: python -m unittest discover tests
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_store import UploadStore  # noqa: E402
+
+
+class UploadStoreGarbageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='upload_store_')
+        self.uploads = os.path.join(self.root, 'uploads')
+        os.makedirs(self.uploads)
+        self.store = UploadStore(os.path.join(self.root, 'store'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _upload(self, name, data):
+        key, _ = self.store.save(io.BytesIO(data), '.mp3')
+        self.store.link(key, os.path.join(self.uploads, name), name)
+        return key
+
+    def _forget(self, *names):
+        for name in names:
+            os.remove(os.path.join(self.uploads, name))
+        self.store.forget_names(list(names))
+
+    def test_unreferenced_objects_are_removed(self):
+        shared = self._upload('a.mp3', b'shared' * 100)
+        self._upload('b.mp3', b'shared' * 100)
+        only_a = self._upload('c.mp3', b'only a' * 100)
+        self._forget('a.mp3', 'c.mp3')
+
+        removed, freed = self.store.collect_garbage(grace=0)
+        self.assertEqual((removed, freed), (1, 600))
+        self.assertFalse(os.path.exists(self.store.object_path(only_a)))
+        self.assertTrue(os.path.exists(self.store.object_path(shared)))
+        self.assertEqual(self.store.stats()['objects'], 1)
+
+    def test_recent_uploads_are_kept(self):
+        key = self._upload('a.mp3', b'recent' * 100)
+        self._forget('a.mp3')
+        self.assertEqual(self.store.collect_garbage(), (0, 0))
+        self.assertTrue(os.path.exists(self.store.object_path(key)))
+
+    def test_objects_still_linked_are_kept(self):
+        key = self._upload('a.mp3', b'linked' * 100)
+        self.store.forget_names(['a.mp3'])
+        self.assertEqual(self.store.collect_garbage(grace=0), (0, 0))
+        self.assertTrue(os.path.exists(self.store.object_path(key)))
+
+
+if __name__ == '__main__':
+    unittest.main()
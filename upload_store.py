@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+内容寻址的上传库
+Web界面上传的文件边写入磁盘边计算哈希，按内容保存在 objects/ 中，uploads/ 下的文件只是指向它的硬链接。
+同一首歌再次上传时不再占用磁盘，也不再解析标签：歌词和清理结果随内容一起保存在索引中。
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import sqlite3
+import threading
+import time
+
+from backup_store import COPY_BUFFER_SIZE, clone_file
+
+# 最近这么多秒内上传过（包括重复上传）的对象不回收，避免与正在创建链接的上传竞争
+GC_GRACE_SECONDS = 60
+
+
+class UploadStore:
+    """
+    上传库
+
+    对象保存在 objects/<哈希前两位>/<哈希><扩展名> 中（保留扩展名，按格式解析标签）；
+    index.db 记录每个对象的歌词、清理结果，以及上传文件名到对象的对应关系。
+    上传文件名记录删除后，不再被任何文件名引用的对象由 collect_garbage 回收。
+
+    Args:
+        directory (str): 上传库目录，不存在时自动创建
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.db'), timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS blobs ('
+            'key TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL NOT NULL, lyrics TEXT, '
+            'ruleset_version TEXT, cleaned TEXT, removed TEXT)'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, key TEXT NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS names_key ON names (key)')
+        self._db.commit()
+
+        self.uploads = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self.lyrics_hits = 0
+        self.clean_hits = 0
+
+    def object_path(self, key):
+        return os.path.join(self.directory, 'objects', key[:2], key[2:])
+
+    def save(self, stream, ext):
+        """
+        保存上传的文件内容，写入的同时计算哈希
+
+        Args:
+            stream: 可读的二进制流（如 werkzeug FileStorage.stream）
+            ext (str): 扩展名（小写，带点）
+
+        Returns:
+            tuple: (对象键, 是否重复)；重复时临时写入的数据会被删除
+        """
+        temp_path = os.path.join(self.directory, 'objects', f".upload-{os.getpid()}-{secrets.token_hex(6)}")
+        digest = hashlib.blake2b(digest_size=20)
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            key = digest.hexdigest() + ext
+            object_path = self.object_path(key)
+            with self._lock:
+                self.uploads += 1
+                duplicate = os.path.exists(object_path)
+                if duplicate:
+                    self.duplicates += 1
+                    self.bytes_saved += size
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    os.replace(temp_path, object_path)
+                # created 记录最近一次上传的时间，重复上传时刷新（回收时据此留出宽限期）
+                self._db.execute('INSERT INTO blobs (key, size, created) VALUES (?, ?, ?) '
+                                 'ON CONFLICT (key) DO UPDATE SET created = excluded.created',
+                                 (key, size, time.time()))
+                self._db.commit()
+            return key, duplicate
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def link(self, key, dest_path, name):
+        """
+        在 dest_path 创建指向对象的文件（硬链接，不支持时 reflink / 复制），并记录上传文件名
+
+        Args:
+            key (str): 对象键
+            dest_path (str): 上传目录中的文件路径，已存在时覆盖
+            name (str): 上传文件名（相对上传目录），之后可按它查询歌词和清理结果
+        """
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(self.object_path(key), dest_path)
+        except OSError:
+            clone_file(self.object_path(key), dest_path)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO names (name, key) VALUES (?, ?)', (name, key))
+            self._db.commit()
+
+    def lookup(self, name):
+        """上传文件名对应的对象键，未记录时返回 None"""
+        with self._lock:
+            row = self._db.execute('SELECT key FROM names WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def get_lyrics(self, key):
+        """
+        对象中已解析过的歌词
+
+        Returns:
+            str: 歌词（没有歌词时为空字符串）；尚未解析时返回 None
+        """
+        with self._lock:
+            row = self._db.execute('SELECT lyrics FROM blobs WHERE key = ?', (key,)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            self.lyrics_hits += 1
+            return row[0]
+
+    def set_lyrics(self, key, lyrics):
+        with self._lock:
+            self._db.execute('UPDATE blobs SET lyrics = ? WHERE key = ?', (lyrics, key))
+            self._db.commit()
+
+    def get_cleaned(self, key, ruleset_version):
+        """
+        对象的歌词在当前规则下的清理结果
+
+        Returns:
+            tuple: (清理后的歌词, 被移除的行列表)；没有或规则已变化时返回 None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT cleaned, removed FROM blobs WHERE key = ? AND ruleset_version = ?', (key, ruleset_version)
+            ).fetchone()
+            if row is None or row[0] is None:
+                return None
+            self.clean_hits += 1
+            return row[0], json.loads(row[1])
+
+    def set_cleaned(self, key, ruleset_version, cleaned, removed_lines):
+        with self._lock:
+            self._db.execute(
+                'UPDATE blobs SET ruleset_version = ?, cleaned = ?, removed = ? WHERE key = ?',
+                (ruleset_version, cleaned, json.dumps(list(removed_lines), ensure_ascii=False), key)
+            )
+            self._db.commit()
+
+    def forget_names(self, names=None):
+        """
+        删除上传文件名记录（对象和已解析的结果保留，不再被引用的对象由 collect_garbage 删除）
+
+        Args:
+            names (iterable): 要删除的上传文件名，为 None 时清空全部
+        """
+        with self._lock:
+            if names is None:
+                self._db.execute('DELETE FROM names')
+            else:
+                self._db.executemany('DELETE FROM names WHERE name = ?', [(name,) for name in names])
+            self._db.commit()
+
+    def collect_garbage(self, grace=GC_GRACE_SECONDS):
+        """
+        删除不再被任何上传文件名引用的对象（最近 grace 秒内上传过的除外）
+
+        uploads/ 中仍有硬链接指向的对象（文件名记录已丢失的遗留文件）保留。
+
+        Returns:
+            tuple: (删除的对象数, 释放的字节数)
+        """
+        removed = freed = 0
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key, size FROM blobs WHERE created < ? AND key NOT IN (SELECT key FROM names)',
+                (time.time() - grace,)
+            ).fetchall()
+            for key, size in rows:
+                object_path = self.object_path(key)
+                try:
+                    if os.stat(object_path).st_nlink > 1:
+                        continue
+                    os.remove(object_path)
+                except FileNotFoundError:
+                    pass  # 其他工作进程已经删除
+                self._db.execute('DELETE FROM blobs WHERE key = ?', (key,))
+                removed += 1
+                freed += size
+            self._db.commit()
+        return removed, freed
+
+    def purge(self):
+        """删除全部对象和记录"""
+        with self._lock:
+            self._db.execute('DELETE FROM names')
+            self._db.execute('DELETE FROM blobs')
+            self._db.commit()
+            shutil.rmtree(os.path.join(self.directory, 'objects'), ignore_errors=True)
+            os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+
+    def stats(self):
+        """返回去重和复用统计"""
+        with self._lock:
+            objects, stored_bytes = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            return {
+                'uploads': self.uploads,
+                'duplicates': self.duplicates,
+                'bytes_saved': self.bytes_saved,
+                'lyrics_hits': self.lyrics_hits,
+                'clean_hits': self.clean_hits,
+                'objects': objects,
+                'stored_bytes': stored_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
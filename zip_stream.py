@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+流式生成 ZIP 压缩包
+边读文件边产出压缩包的字节，不写临时文件，内存占用只与读取块大小有关。
+音频本身已经压缩，按 STORED 原样存入，不再浪费 CPU 做 deflate；大文件和大压缩包自动使用 zip64。
+"""
+
+import io
+import os
+import zipfile
+
+# 读取源文件的块大小
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# 已经压缩过的格式，按 STORED 存入
+STORED_EXTENSIONS = frozenset({
+    '.mp3', '.flac', '.m4a', '.mp4', '.aac', '.ogg', '.opus', '.wma', '.ape', '.wv', '.dsf', '.dff',
+    '.wav', '.aiff', '.aif',
+    '.jpg', '.jpeg', '.png', '.webp', '.zip',
+})
+
+
+class _StreamSink(io.RawIOBase):
+    """zipfile 写入的目标：收集写入的字节，由生成器取走后清空"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        # 不可定位时 zipfile 把 CRC 和大小写在数据之后的数据描述符中，不需要回头改本地文件头
+        return False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """取走目前收集到的字节"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    逐块产出 ZIP 压缩包
+
+    Args:
+        entries (iterable): (文件路径, 压缩包内的名称)；打不开的文件会被跳过
+        chunk_size (int): 每次读取的字节数
+
+    Yields:
+        bytes: 压缩包的下一段数据（文件头、文件数据或结尾的中央目录）
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for file_path, archive_name in entries:
+            try:
+                source = open(file_path, 'rb')
+            except OSError:
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(file_path, archive_name)
+                if os.path.splitext(file_path)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                # 文件大小已知，超过 zip64 阈值时 zipfile 会写 zip64 扩展字段
+                with archive.open(info, 'w') as target:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()